@@ -0,0 +1,288 @@
+"""Throughput and latency benchmarks of the tokenizers.
+
+Every tokenizer runs on generated Chinese, English and mixed corpora, and reports tokens/sec,
+p50/p99 latency per call and the peak memory allocated by Python during the run (tracemalloc).
+The cold `import naivenlp` time is measured in fresh interpreters, it is not asserted anywhere.
+Results are written as JSON, and compared with a previous run if `--baseline` is given.
+
+Usage:
+    python benchmarks/tokenizer_benchmark.py --output bench.json
+    python benchmarks/tokenizer_benchmark.py --output new.json --baseline bench.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from naivenlp.tokenizers.bert_tokenizer import BertTokenizer  # noqa: E402
+from naivenlp.tokenizers.jieba_tokenizer import JiebaTokenizer  # noqa: E402
+from naivenlp.tokenizers.tokenizer import BasicTokenizer, WordpieceTokenizer, load_vocab  # noqa: E402
+from naivenlp.tokenizers.transformer_tokenizer import TransformerTokenizer  # noqa: E402
+
+DEFAULT_VOCAB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'testdata', 'vocab_chinese.txt')
+
+CORPORA = ['chinese', 'english', 'mixed']
+TOKENIZERS = ['basic', 'wordpiece', 'transformer', 'bert', 'jieba']
+
+_ENGLISH_SYLLABLES = [
+    'the', 'in', 'on', 'at', 'to', 'ing', 'tion', 'pre', 'con', 'ex', 'per', 'ly', 'er', 'es', 'a', 'o',
+    'str', 'com', 'pro', 'able', 'ment', 'ness', 'un', 're', 'de', 'ize', 'al', 'ic', 'ous', 'http', 'www',
+]
+_PUNCTUATIONS = [',', '.', '!', '?', ';', ':', '(', ')', '，', '。', '！', '？', '、']
+
+
+def _chinese_chars(vocab_file):
+    return [t for t in load_vocab(vocab_file).keys() if len(t) == 1 and '一' <= t <= '鿿']
+
+
+def _english_word(rnd):
+    word = ''.join(rnd.choice(_ENGLISH_SYLLABLES) for _ in range(rnd.randint(1, 4)))
+    r = rnd.random()
+    if r < 0.1:
+        word = word.capitalize()
+    elif r < 0.15:
+        word += str(rnd.randint(0, 99999))
+    return word
+
+
+def generate_corpus(kind, num_lines, vocab_file=DEFAULT_VOCAB_FILE, seed=42, min_len=10, max_len=80):
+    """Generate a deterministic corpus of `num_lines` lines, `kind` is one of chinese, english and mixed."""
+    rnd = random.Random(seed)
+    chars = _chinese_chars(vocab_file)
+    lines = []
+    for _ in range(num_lines):
+        length = rnd.randint(min_len, max_len)
+        pieces = []
+        size = 0
+        while size < length:
+            if kind == 'chinese' or (kind == 'mixed' and rnd.random() < 0.6):
+                piece = ''.join(rnd.choice(chars) for _ in range(rnd.randint(1, 6)))
+            elif kind in ['english', 'mixed']:
+                piece = ' ' + _english_word(rnd) + ' '
+            else:
+                raise ValueError('Invalid corpus: {}'.format(kind))
+            if rnd.random() < 0.1:
+                piece += rnd.choice(_PUNCTUATIONS)
+            pieces.append(piece)
+            size += len(piece)
+        lines.append(''.join(pieces).strip())
+    return lines
+
+
+def build_tokenizer(name, vocab_file=DEFAULT_VOCAB_FILE):
+    """Build a tokenizer by name.
+
+    Returns:
+        A tuple (tokenize_fn, prepare_fn), `tokenize_fn` tokenizes one line into a list of tokens and is
+        measured, `prepare_fn` converts a corpus line into the input of `tokenize_fn`, or is None.
+    """
+    if name == 'basic':
+        return BasicTokenizer().tokenize, None
+    if name == 'wordpiece':
+        # the input of word piece is the output of basic tokenization, which is not measured
+        basic = BasicTokenizer()
+        wordpiece = WordpieceTokenizer(vocab=load_vocab(vocab_file), unk_token='[UNK]')
+        return wordpiece.tokenize, lambda line: ' '.join(basic.tokenize(line))
+    if name == 'transformer':
+        return TransformerTokenizer(vocab_file).tokenize, None
+    if name == 'bert':
+        return BertTokenizer(vocab_file).tokenize, None
+    if name == 'jieba':
+        return JiebaTokenizer(vocab_file).tokenize, None
+    raise ValueError('Invalid tokenizer: {}'.format(name))
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_one(tokenize_fn, lines, warmup=10, repeat=1):
+    """Run `tokenize_fn` over `lines`, returns the metrics."""
+    for line in lines[:warmup]:
+        tokenize_fn(line)
+
+    latencies = []
+    num_tokens = 0
+    num_chars = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            t0 = time.perf_counter()
+            tokens = tokenize_fn(line)
+            latencies.append(time.perf_counter() - t0)
+            num_tokens += len(tokens)
+            num_chars += len(line)
+    total = time.perf_counter() - start
+
+    # tracing slows down allocations, so the memory is measured by a separate pass
+    tracemalloc.start()
+    for line in lines:
+        tokenize_fn(line)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'calls': len(latencies),
+        'tokens': num_tokens,
+        'chars': num_chars,
+        'seconds': total,
+        'tokens_per_sec': num_tokens / total if total > 0 else 0.0,
+        'chars_per_sec': num_chars / total if total > 0 else 0.0,
+        'p50_latency_us': _percentile(latencies, 50) * 1e6,
+        'p99_latency_us': _percentile(latencies, 99) * 1e6,
+        'peak_memory_bytes': peak,
+    }
+
+
+_IMPORT_SCRIPT = '''
+import time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+'''
+
+
+def measure_import_time(statement='import naivenlp', repeat=5):
+    """Wall-clock seconds of `statement` in `repeat` fresh interpreters, e.g. the startup cost of the package."""
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    seconds = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', _IMPORT_SCRIPT.format(statement=statement)], cwd=root)
+        seconds.append(float(output.decode('utf8').strip().splitlines()[-1]))
+    seconds.sort()
+    return {
+        'statement': statement,
+        'repeat': repeat,
+        'best_ms': seconds[0] * 1e3,
+        'median_ms': _percentile(seconds, 50) * 1e3,
+    }
+
+
+def _git_commit():
+    try:
+        output = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL)
+        return output.decode('utf8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(tokenizers=None,
+                   corpora=None,
+                   num_lines=1000,
+                   repeat=1,
+                   vocab_file=DEFAULT_VOCAB_FILE,
+                   seed=42,
+                   import_repeat=5):
+    """Run the benchmarks, returns a JSON serializable dict."""
+    tokenizers = tokenizers or TOKENIZERS
+    corpora = corpora or CORPORA
+    data = {c: generate_corpus(c, num_lines, vocab_file=vocab_file, seed=seed) for c in corpora}
+    results = []
+    for name in tokenizers:
+        tokenize_fn, prepare_fn = build_tokenizer(name, vocab_file=vocab_file)
+        for corpus in corpora:
+            lines = data[corpus]
+            if prepare_fn is not None:
+                lines = [prepare_fn(line) for line in lines]
+            metrics = run_one(tokenize_fn, lines, repeat=repeat)
+            metrics.update({'tokenizer': name, 'corpus': corpus})
+            results.append(metrics)
+    return {
+        'commit': _git_commit(),
+        'time': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'num_lines': num_lines,
+        'repeat': repeat,
+        'seed': seed,
+        'results': results,
+        'import_time': measure_import_time(repeat=import_repeat) if import_repeat > 0 else None,
+    }
+
+
+def compare(current, baseline):
+    """Relative change of tokens/sec and p99 latency of every (tokenizer, corpus) against a baseline."""
+    base = {(r['tokenizer'], r['corpus']): r for r in baseline['results']}
+    rows = []
+    for r in current['results']:
+        b = base.get((r['tokenizer'], r['corpus']))
+        if b is None:
+            continue
+        rows.append({
+            'tokenizer': r['tokenizer'],
+            'corpus': r['corpus'],
+            'tokens_per_sec_change': r['tokens_per_sec'] / b['tokens_per_sec'] - 1 if b['tokens_per_sec'] else None,
+            'p99_latency_change': r['p99_latency_us'] / b['p99_latency_us'] - 1 if b['p99_latency_us'] else None,
+        })
+    return rows
+
+
+def _print_results(report):
+    print('{:12s} {:8s} {:>14s} {:>12s} {:>12s} {:>14s}'.format(
+        'tokenizer', 'corpus', 'tokens/sec', 'p50(us)', 'p99(us)', 'peak mem(KB)'))
+    for r in report['results']:
+        print('{:12s} {:8s} {:14.0f} {:12.1f} {:12.1f} {:14.1f}'.format(
+            r['tokenizer'], r['corpus'], r['tokens_per_sec'], r['p50_latency_us'], r['p99_latency_us'],
+            r['peak_memory_bytes'] / 1024))
+    if report.get('import_time'):
+        print('{}: best {:.1f}ms, median {:.1f}ms'.format(
+            report['import_time']['statement'], report['import_time']['best_ms'], report['import_time']['median_ms']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the tokenizers.')
+    parser.add_argument('--tokenizers', type=str, nargs='+', default=TOKENIZERS, choices=TOKENIZERS)
+    parser.add_argument('--corpora', type=str, nargs='+', default=CORPORA, choices=CORPORA)
+    parser.add_argument('--num_lines', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument(
+        '--import_repeat', type=int, default=5, help='Fresh interpreters timing `import naivenlp`, 0 skips it.')
+    parser.add_argument('--vocab_file', type=str, default=DEFAULT_VOCAB_FILE)
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON into this file.')
+    parser.add_argument('--baseline', type=str, default=None, help='Compare with the JSON results of a previous run.')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        tokenizers=args.tokenizers,
+        corpora=args.corpora,
+        num_lines=args.num_lines,
+        repeat=args.repeat,
+        vocab_file=args.vocab_file,
+        seed=args.seed,
+        import_repeat=args.import_repeat)
+    _print_results(report)
+
+    if args.baseline:
+        with open(args.baseline, mode='rt', encoding='utf8') as fin:
+            baseline = json.load(fin)
+        report['baseline'] = {'commit': baseline.get('commit'), 'changes': compare(report, baseline)}
+        if report['import_time'] and baseline.get('import_time'):
+            print('{}: best {:+.1%}'.format(
+                report['import_time']['statement'],
+                report['import_time']['best_ms'] / baseline['import_time']['best_ms'] - 1))
+        for row in report['baseline']['changes']:
+            print('{:12s} {:8s} tokens/sec {:+.1%}  p99 latency {:+.1%}'.format(
+                row['tokenizer'], row['corpus'], row['tokens_per_sec_change'] or 0.0, row['p99_latency_change'] or 0.0))
+
+    if args.output:
+        with open(args.output, mode='wt', encoding='utf8') as fout:
+            json.dump(report, fout, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import json
+import os
+import tempfile
+import unittest
+
+import tokenizer_benchmark
+
+
+class TokenizerBenchmarkTest(unittest.TestCase):
+
+    def testGenerateCorpus(self):
+        for kind in tokenizer_benchmark.CORPORA:
+            lines = tokenizer_benchmark.generate_corpus(kind, 5, seed=1)
+            self.assertEqual(5, len(lines))
+            self.assertEqual(lines, tokenizer_benchmark.generate_corpus(kind, 5, seed=1))
+        with self.assertRaises(ValueError):
+            tokenizer_benchmark.generate_corpus('french', 1)
+
+    def testMain(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, 'bench.json')
+            tokenizer_benchmark.main(['--num_lines', '5', '--output', output])
+            with open(output, mode='rt', encoding='utf8') as fin:
+                report = json.load(fin)
+            self.assertEqual(
+                len(tokenizer_benchmark.TOKENIZERS) * len(tokenizer_benchmark.CORPORA), len(report['results']))
+            for r in report['results']:
+                self.assertGreater(r['tokens'], 0)
+                self.assertGreaterEqual(r['p99_latency_us'], r['p50_latency_us'])
+                self.assertGreater(r['peak_memory_bytes'], 0)
+            self.assertEqual('import naivenlp', report['import_time']['statement'])
+            self.assertGreater(report['import_time']['median_ms'], 0)
+
+            report = tokenizer_benchmark.main(
+                ['--num_lines', '5', '--tokenizers', 'basic', '--corpora', 'english', '--baseline', output,
+                 '--import_repeat', '0'])
+            self.assertEqual(1, len(report['baseline']['changes']))
+            self.assertIsNone(report['import_time'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,36 +1,46 @@
-import logging
-
-from naivenlp.similarity import (
-    cosine_distance,
-    cosine_similarity,
-    damerau_distance,
-    jaccard_distance,
-    jaccard_similarity,
-    lcs_distance,
-    lcs_length,
-    levenshtein_distance,
-    levenshtein_distance_normalized,
-    levenshtein_similarity,
-    longest_common_subsequence_distance,
-    longest_common_subsequence_length,
-    optimal_string_alignment_distance,
-    osa_distance,
-    sorense_dice_distance,
-    sorense_dice_similarity,
-    weighted_levenshtein_distance,
-)
-from naivenlp.structures.trie import AbstractTrie, Node, Trie
-from naivenlp.tokenizers.abstract_tokenizer import AbstractTokenizer, CustomTokenizer, VocabBasedTokenizer
-from naivenlp.tokenizers.bert_tokenizer import BertTokenizer
-from naivenlp.tokenizers.tokenizer import BasicTokenizer, WordpieceTokenizer
-from naivenlp.tokenizers.transformer_tokenizer import TransformerTokenizer
-from naivenlp.utils.texts import b2q, q2b, split_sentence
+from naivenlp.utils.lazy import lazy_module_attributes
 
 __version__ = "0.0.9"
 __name__ = "naivenlp"
 
+# Everything is imported on first access, `import naivenlp` does not pay for the heavy dependencies.
+_LAZY_ATTRIBUTES = {
+    'cosine_distance': 'naivenlp.similarity',
+    'cosine_similarity': 'naivenlp.similarity',
+    'damerau_distance': 'naivenlp.similarity',
+    'jaccard_distance': 'naivenlp.similarity',
+    'jaccard_similarity': 'naivenlp.similarity',
+    'lcs_distance': 'naivenlp.similarity',
+    'lcs_length': 'naivenlp.similarity',
+    'levenshtein_distance': 'naivenlp.similarity',
+    'levenshtein_distance_normalized': 'naivenlp.similarity',
+    'levenshtein_similarity': 'naivenlp.similarity',
+    'longest_common_subsequence_distance': 'naivenlp.similarity',
+    'longest_common_subsequence_length': 'naivenlp.similarity',
+    'optimal_string_alignment_distance': 'naivenlp.similarity',
+    'osa_distance': 'naivenlp.similarity',
+    'sorense_dice_distance': 'naivenlp.similarity',
+    'sorense_dice_similarity': 'naivenlp.similarity',
+    'weighted_levenshtein_distance': 'naivenlp.similarity',
+    'AhoCorasick': 'naivenlp.structures.aho_corasick',
+    'DoubleArrayTrie': 'naivenlp.structures.double_array_trie',
+    'AbstractTrie': 'naivenlp.structures.trie',
+    'Node': 'naivenlp.structures.trie',
+    'Trie': 'naivenlp.structures.trie',
+    'TrieMap': 'naivenlp.structures.trie',
+    'TrieNode': 'naivenlp.structures.trie',
+    'AbstractTokenizer': 'naivenlp.tokenizers.abstract_tokenizer',
+    'CustomTokenizer': 'naivenlp.tokenizers.abstract_tokenizer',
+    'VocabBasedTokenizer': 'naivenlp.tokenizers.abstract_tokenizer',
+    'BertTokenizer': 'naivenlp.tokenizers.bert_tokenizer',
+    'BasicTokenizer': 'naivenlp.tokenizers.tokenizer',
+    'WordpieceTokenizer': 'naivenlp.tokenizers.tokenizer',
+    'TransformerTokenizer': 'naivenlp.tokenizers.transformer_tokenizer',
+    'b2q': 'naivenlp.utils.texts',
+    'q2b': 'naivenlp.utils.texts',
+    'split_sentence': 'naivenlp.utils.texts',
+}
+
+_SUBMODULES = ['correctors', 'data', 'datasource', 'similarity', 'structures', 'tokenizers', 'utils']
 
-logging.basicConfig(
-    format="%(asctime)s %(levelname)7s %(filename)20s %(lineno)4d] %(message)s",
-    level=logging.INFO
-)
+__getattr__, __dir__ = lazy_module_attributes(__name__, globals(), _LAZY_ATTRIBUTES, _SUBMODULES)
@@ -1,3 +1,9 @@
-from .abstract_corrector import AbstractCorrector
-from .deep_corrector import DeepCorrector, TransformerCorrector
-from .kenlm_corrector import KenLMCorrector
+from naivenlp.utils.lazy import lazy_module_attributes
+
+# tensorflow and pycorrector are imported only when a corrector is used
+__getattr__, __dir__ = lazy_module_attributes(__name__, globals(), {
+    'AbstractCorrector': '.abstract_corrector',
+    'DeepCorrector': '.deep_corrector',
+    'TransformerCorrector': '.deep_corrector',
+    'KenLMCorrector': '.kenlm_corrector',
+})
@@ -0,0 +1,7 @@
+from naivenlp.utils.lazy import lazy_module_attributes
+
+__getattr__, __dir__ = lazy_module_attributes(__name__, globals(), {
+    'EncodedCorpus': '.corpus_encoder',
+    'encode_file': '.corpus_encoder',
+    'TextDataLoader': '.loader',
+})
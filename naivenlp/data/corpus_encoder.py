@@ -0,0 +1,198 @@
+"""Encode large text corpora into memory-mappable token id files.
+
+Every line of the input file is encoded as one sequence, so sequence i is line i and blank lines are empty
+sequences. For an `output_prefix`, these files are written:
+
+    <output_prefix>.bin     flat token ids, `uint16` if the vocab fits, otherwise `uint32`
+    <output_prefix>.idx     `int64` offsets of `num_sequences + 1` entries,
+                            sequence i is tokens[offsets[i]:offsets[i + 1]]
+    <output_prefix>.json    metadata, e.g. dtype, number of sequences and tokens
+
+Usage:
+    python -m naivenlp.data.corpus_encoder \\
+        --tokenizer bert --vocab_file vocab.txt --input_file corpus.txt --output_prefix corpus --num_workers 8
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+
+import numpy as np
+
+from naivenlp.utils.parallel import ChunkPool, read_chunks
+
+FORMAT_VERSION = 1
+
+
+class _ChunkEncoder(object):
+
+    def __init__(self, tokenizer, dtype, add_bos=False, add_eos=False, **kwargs):
+        self.tokenizer = tokenizer
+        self.dtype = dtype
+        self.add_bos = add_bos
+        self.add_eos = add_eos
+        self.kwargs = kwargs
+
+    def __call__(self, lines):
+        ids = [self._encode(line) for line in lines]
+        lengths = np.fromiter((len(x) for x in ids), dtype=np.int64, count=len(ids))
+        tokens = np.fromiter(itertools.chain.from_iterable(ids), dtype=self.dtype, count=int(lengths.sum()))
+        return tokens, lengths
+
+    def _encode(self, line):
+        if not line.strip():
+            # no bos nor eos either, an empty sequence keeps the line numbers aligned
+            return []
+        return self.tokenizer.encode(line, add_bos=self.add_bos, add_eos=self.add_eos, **self.kwargs)
+
+
+def _choose_dtype(vocab_size):
+    return np.uint16 if vocab_size <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+
+def encode_file(tokenizer,
+                input_file,
+                output_prefix,
+                num_workers=None,
+                chunk_size=1000,
+                max_pending_chunks=None,
+                add_bos=False,
+                add_eos=False,
+                skip_empty_lines=False,
+                **kwargs):
+    """Encode a text file line by line into `<output_prefix>.bin` and `<output_prefix>.idx`.
+
+    The input is streamed in chunks of `chunk_size` lines, at most `max_pending_chunks` chunks are
+    in flight at the same time, so the peak memory does not grow with the size of the corpus.
+
+    Args:
+        tokenizer: A `VocabBasedTokenizer`, it is sent to every worker process once
+        input_file: The text file, one sequence per line
+        output_prefix: Prefix of the output files
+        num_workers: Number of worker processes, defaults to the number of CPUs. 1 encodes in this process.
+        chunk_size: Number of lines in a chunk of work
+        max_pending_chunks: Max number of chunks in flight, defaults to 2 * num_workers
+        add_bos: Add `bos_id` to every sequence
+        add_eos: Add `eos_id` to every sequence
+        skip_empty_lines: Skip blank lines. By default they are kept as empty sequences, so sequence i is
+            line i of the input. Skipping them shifts the sequences after a blank line.
+
+    Returns:
+        The metadata dict, which is also written to `<output_prefix>.json`
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    max_pending_chunks = max_pending_chunks or 2 * num_workers
+    dtype = _choose_dtype(tokenizer.vocab_size)
+    encoder = _ChunkEncoder(tokenizer, dtype, add_bos=add_bos, add_eos=add_eos, **kwargs)
+    chunks = read_chunks(input_file, chunk_size, skip_empty_lines=skip_empty_lines)
+
+    output_dir = os.path.dirname(os.path.abspath(output_prefix))
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    num_sequences, num_tokens = 0, 0
+    with open(output_prefix + '.bin', mode='wb') as fbin, open(output_prefix + '.idx', mode='wb') as fidx:
+        fidx.write(np.zeros(1, dtype=np.int64).tobytes())
+
+        def _write(result):
+            nonlocal num_sequences, num_tokens
+            tokens, lengths = result
+            fbin.write(tokens.tobytes())
+            fidx.write((num_tokens + np.cumsum(lengths)).astype(np.int64).tobytes())
+            num_sequences += len(lengths)
+            num_tokens += len(tokens)
+
+        if num_workers <= 1:
+            for chunk in chunks:
+                _write(encoder(chunk))
+        else:
+            with ChunkPool(encoder, num_workers) as pool:
+                for result in pool.imap(chunks, max_pending=max_pending_chunks):
+                    _write(result)
+
+    meta = {
+        'version': FORMAT_VERSION,
+        'dtype': np.dtype(dtype).name,
+        'num_sequences': num_sequences,
+        'num_tokens': num_tokens,
+        'vocab_size': tokenizer.vocab_size,
+        'input_file': input_file,
+    }
+    with open(output_prefix + '.json', mode='wt', encoding='utf8') as fout:
+        json.dump(meta, fout, ensure_ascii=False, indent=2)
+    logging.info('Encoded %d sequences, %d tokens into %s.bin', num_sequences, num_tokens, output_prefix)
+    return meta
+
+
+class EncodedCorpus(object):
+    """Read-only, memory-mapped view of the files written by `encode_file`."""
+
+    def __init__(self, prefix):
+        with open(prefix + '.json', mode='rt', encoding='utf8') as fin:
+            self.meta = json.load(fin)
+        if self.meta['version'] != FORMAT_VERSION:
+            raise ValueError('Unsupported format version: {}'.format(self.meta['version']))
+        self.offsets = np.memmap(prefix + '.idx', dtype=np.int64, mode='r')
+        if self.meta['num_tokens']:
+            self.tokens = np.memmap(prefix + '.bin', dtype=np.dtype(self.meta['dtype']), mode='r')
+        else:
+            # empty files can not be memory-mapped
+            self.tokens = np.zeros(0, dtype=np.dtype(self.meta['dtype']))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('Index out of range: {}'.format(index))
+        return self.tokens[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def _build_tokenizer(name, vocab_file, **kwargs):
+    if name == 'bert':
+        from naivenlp.tokenizers.bert_tokenizer import BertTokenizer
+        return BertTokenizer(vocab_file, **kwargs)
+    if name == 'transformer':
+        from naivenlp.tokenizers.transformer_tokenizer import TransformerTokenizer
+        return TransformerTokenizer(vocab_file, **kwargs)
+    if name == 'jieba':
+        from naivenlp.tokenizers.jieba_tokenizer import JiebaTokenizer
+        return JiebaTokenizer(vocab_file, **kwargs)
+    raise ValueError('Invalid tokenizer: {}'.format(name))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Encode a text corpus into memory-mappable token id files.')
+    parser.add_argument('--tokenizer', type=str, default='bert', choices=['bert', 'transformer', 'jieba'])
+    parser.add_argument('--vocab_file', type=str, required=True)
+    parser.add_argument('--input_file', type=str, required=True)
+    parser.add_argument('--output_prefix', type=str, required=True)
+    parser.add_argument('--num_workers', type=int, default=None)
+    parser.add_argument('--chunk_size', type=int, default=1000)
+    parser.add_argument('--add_bos', action='store_true')
+    parser.add_argument('--add_eos', action='store_true')
+    parser.add_argument('--skip_empty_lines', action='store_true')
+    args = parser.parse_args(argv)
+
+    tokenizer = _build_tokenizer(args.tokenizer, args.vocab_file)
+    meta = encode_file(
+        tokenizer,
+        args.input_file,
+        args.output_prefix,
+        num_workers=args.num_workers,
+        chunk_size=args.chunk_size,
+        add_bos=args.add_bos,
+        add_eos=args.add_eos,
+        skip_empty_lines=args.skip_empty_lines)
+    print(json.dumps(meta, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
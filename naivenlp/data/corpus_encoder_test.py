@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from naivenlp.tokenizers.bert_tokenizer import BertTokenizer
+
+from .corpus_encoder import EncodedCorpus, encode_file, main
+
+
+class CorpusEncoderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.tmp_dir.name, 'corpus.txt')
+        self.lines = ['我在上海工作', 'hello world!', '中国科学技术大学', '乒乓球拍卖完了'] * 50
+        # every line of the file, with blank lines and windows line breaks
+        self.file_lines = []
+        with open(self.input_file, mode='wt', encoding='utf8', newline='') as fout:
+            for i, line in enumerate(self.lines):
+                fout.write(line + ('\r\n' if i % 5 == 0 else '\n'))
+                self.file_lines.append(line)
+                if i % 7 == 0:
+                    fout.write('\n')
+                    self.file_lines.append('')
+        self.tokenizer = BertTokenizer(vocab_file='testdata/vocab_chinese.txt')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def testEncodeFile(self):
+        for num_workers in [1, 2]:
+            prefix = os.path.join(self.tmp_dir.name, 'out', 'corpus-{}'.format(num_workers))
+            meta = encode_file(
+                self.tokenizer, self.input_file, prefix,
+                num_workers=num_workers, chunk_size=7, max_pending_chunks=3, add_bos=True)
+            self.assertEqual('uint16', meta['dtype'])
+            self.assertEqual(len(self.file_lines), meta['num_sequences'])
+
+            # sequence i is line i, blank lines are empty sequences
+            corpus = EncodedCorpus(prefix)
+            self.assertEqual(len(self.file_lines), len(corpus))
+            self.assertIsInstance(corpus.tokens, np.memmap)
+            self.assertEqual(meta['num_tokens'], len(corpus.tokens))
+            for line, ids in zip(self.file_lines, corpus):
+                expected = self.tokenizer.encode(line, add_bos=True) if line else []
+                self.assertEqual(expected, ids.tolist())
+            self.assertEqual([], corpus[1].tolist())
+            self.assertEqual(self.tokenizer.encode(self.lines[-1], add_bos=True), corpus[-1].tolist())
+
+        prefix = os.path.join(self.tmp_dir.name, 'out', 'skipped')
+        meta = encode_file(self.tokenizer, self.input_file, prefix, num_workers=1, skip_empty_lines=True)
+        self.assertEqual(len(self.lines), meta['num_sequences'])
+        self.assertEqual([self.tokenizer.encode(x) for x in self.lines], [x.tolist() for x in EncodedCorpus(prefix)])
+
+    def testMain(self):
+        prefix = os.path.join(self.tmp_dir.name, 'cli')
+        main([
+            '--vocab_file', 'testdata/vocab_chinese.txt',
+            '--input_file', self.input_file,
+            '--output_prefix', prefix,
+            '--num_workers', '1',
+        ])
+        corpus = EncodedCorpus(prefix)
+        self.assertEqual(self.tokenizer.encode(self.lines[0]), corpus[0].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
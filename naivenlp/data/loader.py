@@ -0,0 +1,234 @@
+"""Prefetching data loader that turns text files into padded training batches.
+
+The files are read line by line and cut into chunks, the chunks are encoded in a pool of background
+threads or processes, the encoded sequences go through a shuffle buffer and are padded into
+`EncodedBatch`es, which are put into a bounded queue by a background thread. The training loop only
+takes ready batches from the queue, so tokenization overlaps with the training step.
+
+The chunks are encoded in parallel but collected in order, so for a fixed `seed` the batches of an
+epoch do not depend on the number of workers nor on their timing. The worker pool is created on the
+first epoch and reused by the later ones, until `close` is called.
+"""
+import functools
+import itertools
+import queue
+import random
+import threading
+
+from naivenlp.tokenizers.abstract_tokenizer import PADDING_LONGEST, pad_sequences
+from naivenlp.utils.parallel import ChunkPool, read_chunks
+
+_END = object()
+
+
+class _Error(object):
+
+    def __init__(self, error):
+        self.error = error
+
+
+class TextDataLoader(object):
+    """Iterate over text files as padded batches, one sequence per line.
+
+    Every `iter(loader)` is a new epoch. With a `seed`, epoch `k` uses the seed `seed + k`, so the
+    shuffled order differs between epochs but is reproducible across runs, see `set_epoch`.
+
+    Usage:
+        with TextDataLoader(['train-0.txt', 'train-1.txt'], tokenizer, batch_size=32, max_length=128,
+                            shuffle_buffer_size=10000, seed=42, num_workers=4) as loader:
+            for epoch in range(10):
+                for batch in loader:
+                    model(batch.ids, batch.mask)
+    """
+
+    def __init__(self,
+                 files,
+                 tokenizer,
+                 batch_size=32,
+                 max_length=None,
+                 padding=PADDING_LONGEST,
+                 truncation=True,
+                 add_bos=False,
+                 add_eos=False,
+                 pad_id=None,
+                 shuffle_buffer_size=0,
+                 shuffle_files=None,
+                 seed=None,
+                 num_workers=1,
+                 executor='thread',
+                 chunk_size=256,
+                 prefetch=4,
+                 drop_last=False,
+                 skip_empty_lines=True,
+                 **kwargs):
+        """Init.
+
+        Args:
+            files: An iterable of text files, one sequence per line
+            tokenizer: A `VocabBasedTokenizer`
+            batch_size: Number of sequences of a batch
+            max_length: Max length of the sequences, including bos and eos
+            padding: `longest` pads to the longest sequence of a batch, `max_length` pads to `max_length`
+            truncation: Truncate sequences longer than `max_length`, bos and eos are kept
+            add_bos: Add `bos_id` to the start of every sequence
+            add_eos: Add `eos_id` to the end of every sequence
+            pad_id: The id used for padding, defaults to `pad_id` of the tokenizer
+            shuffle_buffer_size: Size of the shuffle buffer, 0 or 1 keeps the order of the files
+            shuffle_files: Shuffle the order of the files every epoch, defaults to `shuffle_buffer_size > 1`
+            seed: (`optional`) Seed of the shuffling, `None` shuffles differently on every run
+            num_workers: Number of background workers that encode chunks of lines. 0 encodes in the
+                prefetching thread.
+            executor: `thread` or `process`. A `process` pool sends the tokenizer to every worker once.
+            chunk_size: Number of lines in a chunk sent to a worker
+            prefetch: Max number of ready batches waiting in the queue
+            drop_last: Drop the last batch if it has less than `batch_size` sequences
+            skip_empty_lines: Skip blank lines
+        """
+        self.files = list(files)
+        if batch_size <= 0:
+            raise ValueError('batch_size must be positive, got {}'.format(batch_size))
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive, got {}'.format(chunk_size))
+        if prefetch <= 0:
+            raise ValueError('prefetch must be positive, got {}'.format(prefetch))
+        if num_workers < 0:
+            raise ValueError('num_workers must not be negative, got {}'.format(num_workers))
+        if executor not in ('thread', 'process'):
+            raise ValueError('Invalid executor: {}'.format(executor))
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.padding = padding
+        self.pad_id = tokenizer.pad_id if pad_id is None else pad_id
+        self.shuffle_buffer_size = shuffle_buffer_size
+        self.shuffle_files = shuffle_buffer_size > 1 if shuffle_files is None else shuffle_files
+        self.seed = seed
+        self.num_workers = num_workers
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch
+        self.drop_last = drop_last
+        self.skip_empty_lines = skip_empty_lines
+        self.encode_kwargs = dict(
+            max_length=max_length, truncation=truncation, add_bos=add_bos, add_eos=add_eos, **kwargs)
+        self.epoch = 0
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def set_epoch(self, epoch):
+        """Set the epoch of the next iteration, e.g. to resume a training."""
+        self.epoch = epoch
+
+    def _rng(self, epoch):
+        if self.seed is None:
+            return random.Random()
+        return random.Random(self.seed + epoch)
+
+    def _chunks(self, rng):
+        files = list(self.files)
+        if self.shuffle_files:
+            rng.shuffle(files)
+        return read_chunks(files, self.chunk_size, skip_empty_lines=self.skip_empty_lines)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                fn = functools.partial(self.tokenizer._encode_chunk, **self.encode_kwargs)
+                self._pool = ChunkPool(fn, self.num_workers, executor=self.executor)
+            return self._pool
+
+    def _encoded_chunks(self, chunks, stop):
+        chunks = itertools.takewhile(lambda _: not stop.is_set(), chunks)
+        if self.num_workers == 0:
+            for chunk in chunks:
+                yield self.tokenizer._encode_chunk(chunk, **self.encode_kwargs)
+            return
+        # a bounded number of chunks in flight, collected in order
+        yield from self._get_pool().imap(chunks, max_pending=2 * self.num_workers)
+
+    def close(self):
+        """Shut down the worker pool, a later epoch starts a new one."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _shuffled(self, sequences, rng):
+        if self.shuffle_buffer_size <= 1:
+            yield from sequences
+            return
+        buffer = []
+        for seq in sequences:
+            if len(buffer) < self.shuffle_buffer_size:
+                buffer.append(seq)
+                continue
+            # emit a random element of the full buffer, and put the new one in its slot
+            i = rng.randrange(len(buffer))
+            yield buffer[i]
+            buffer[i] = seq
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def _batches(self, epoch, stop):
+        rng = self._rng(epoch)
+        sequences = (seq for ids in self._encoded_chunks(self._chunks(rng), stop) for seq in ids)
+        batch = []
+        for seq in self._shuffled(sequences, rng):
+            batch.append(seq)
+            if len(batch) == self.batch_size:
+                yield self._pad(batch)
+                batch = []
+        if batch and not self.drop_last:
+            yield self._pad(batch)
+
+    def _pad(self, batch):
+        return pad_sequences(batch, pad_id=self.pad_id, max_length=self.max_length, padding=self.padding)
+
+    def _produce(self, epoch, out, stop):
+
+        def _put(item):
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        batches = self._batches(epoch, stop)
+        try:
+            for batch in batches:
+                if not _put(batch):
+                    return
+            _put(_END)
+        except Exception as e:  # pylint: disable=broad-except
+            _put(_Error(e))
+        finally:
+            # stops reading the files, the chunks still in flight are dropped
+            batches.close()
+
+    def __iter__(self):
+        epoch = self.epoch
+        self.epoch += 1
+        out = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(epoch, out, stop), daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = out.get()
+                if item is _END:
+                    return
+                if isinstance(item, _Error):
+                    raise item.error
+                yield item
+        finally:
+            # also reached when the consumer stops early, the producer exits at its next put
+            stop.set()
+            producer.join()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from naivenlp.tokenizers.bert_tokenizer import BertTokenizer
+
+from .loader import TextDataLoader
+
+
+class TextDataLoaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        words = ['我在上海工作', 'hello world!', '中国科学技术大学', '乒乓球拍卖完了']
+        self.files, self.lines = [], []
+        for i in range(3):
+            path = os.path.join(self.tmp_dir.name, 'train-{}.txt'.format(i))
+            with open(path, mode='wt', encoding='utf8') as fout:
+                for j in range(40):
+                    line = '{} {}'.format(words[(i + j) % len(words)], j)
+                    fout.write(line + '\n')
+                    self.lines.append(line)
+                fout.write('\n')
+            self.files.append(path)
+        self.tokenizer = BertTokenizer(vocab_file='testdata/vocab_chinese.txt')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _sequences(self, loader):
+        sequences = []
+        for batch in loader:
+            for row, length in zip(batch.ids, batch.lengths):
+                sequences.append(tuple(row[:length].tolist()))
+        return sequences
+
+    def testInOrder(self):
+        expected = [tuple(self.tokenizer.encode(x, add_bos=True)) for x in self.lines]
+        for num_workers in [0, 1, 3]:
+            loader = TextDataLoader(
+                self.files, self.tokenizer, batch_size=7, num_workers=num_workers, chunk_size=5, add_bos=True)
+            batches = list(loader)
+            self.assertEqual(18, len(batches))
+            self.assertEqual((7, max(batches[0].lengths)), batches[0].ids.shape)
+            self.assertEqual(1, len(batches[-1].lengths))
+            self.assertEqual(expected, self._sequences(loader))
+
+    def testPaddingAndTruncation(self):
+        loader = TextDataLoader(
+            self.files, self.tokenizer, batch_size=8, max_length=6, padding='max_length', add_eos=True, drop_last=True)
+        batches = list(loader)
+        self.assertEqual(15, len(batches))
+        for batch in batches:
+            self.assertEqual((8, 6), batch.ids.shape)
+            self.assertTrue(np.all(batch.ids[batch.mask == 0] == self.tokenizer.pad_id))
+            self.assertTrue(np.all(batch.ids[np.arange(8), batch.lengths - 1] == self.tokenizer.eos_id))
+
+    def testShuffle(self):
+        expected = sorted(tuple(self.tokenizer.encode(x)) for x in self.lines)
+        runs = []
+        for num_workers in [0, 2]:
+            loader = TextDataLoader(
+                self.files, self.tokenizer, batch_size=4, shuffle_buffer_size=16, seed=42,
+                num_workers=num_workers, chunk_size=3)
+            first, second = self._sequences(loader), self._sequences(loader)
+            self.assertEqual(expected, sorted(first))
+            self.assertEqual(expected, sorted(second))
+            self.assertNotEqual(first, second)
+            runs.append((first, second))
+        # the same seed gives the same batches, whatever the number of workers
+        self.assertEqual(runs[0], runs[1])
+
+        loader = TextDataLoader(self.files, self.tokenizer, shuffle_buffer_size=16, seed=42)
+        loader.set_epoch(1)
+        self.assertEqual(runs[0][1], self._sequences(loader))
+
+    def testProcessExecutor(self):
+        expected = [tuple(self.tokenizer.encode(x)) for x in self.lines]
+        with TextDataLoader(
+                self.files, self.tokenizer, batch_size=16, num_workers=2, executor='process', chunk_size=10) as loader:
+            self.assertEqual(expected, self._sequences(loader))
+            # the pool of the first epoch is reused
+            pool = loader._pool
+            self.assertEqual(expected, self._sequences(loader))
+            self.assertIs(pool, loader._pool)
+        self.assertIsNone(loader._pool)
+        # a new pool is started after close
+        self.assertEqual(expected, self._sequences(loader))
+        loader.close()
+
+    def testStopEarly(self):
+        loader = TextDataLoader(self.files, self.tokenizer, batch_size=2, num_workers=2, chunk_size=2, prefetch=1)
+        for i, batch in enumerate(loader):
+            self.assertEqual(2, len(batch.lengths))
+            if i == 2:
+                break
+        self.assertEqual(60, len(list(loader)))
+
+    def testError(self):
+        loader = TextDataLoader(self.files + ['not-exists.txt'], self.tokenizer, batch_size=16)
+        with self.assertRaises(FileNotFoundError):
+            list(loader)
+        with self.assertRaises(ValueError):
+            TextDataLoader(self.files, self.tokenizer, batch_size=0)
+        with self.assertRaises(ValueError):
+            TextDataLoader(self.files, self.tokenizer, executor='fork')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+import naivenlp
+from naivenlp.utils.lazy import lazy_module_attributes
+
+HEAVY_MODULES = ['jieba', 'numpy', 'pycorrector', 'strsimpy', 'tensorflow']
+
+_SCRIPT = '''
+import json, sys
+{statement}
+print(json.dumps(sorted(sys.modules)))
+'''
+
+
+def _loaded_modules(statement):
+    """Modules loaded by `statement` in a fresh interpreter, this process has imported everything already."""
+    output = subprocess.check_output([sys.executable, '-c', _SCRIPT.format(statement=statement)], cwd='.')
+    return json.loads(output.decode('utf8').strip().splitlines()[-1])
+
+
+def _heavy_modules(modules):
+    return [m for m in modules if m.split('.')[0] in HEAVY_MODULES or m.startswith('naivenlp.tokenizers.')]
+
+
+class LazyImportTest(unittest.TestCase):
+
+    def testImport(self):
+        modules = _loaded_modules('import naivenlp')
+        self.assertIn('naivenlp', modules)
+        for name in ['jieba', 'numpy', 'naivenlp.tokenizers.bert_tokenizer', 'naivenlp.tokenizers.jieba_tokenizer']:
+            self.assertNotIn(name, modules)
+        self.assertEqual([], _heavy_modules(modules))
+
+        for statement in ['from naivenlp import q2b; q2b("ＡＢ")', 'from naivenlp import Trie; Trie().put("ab")']:
+            self.assertEqual([], _heavy_modules(_loaded_modules(statement)))
+
+        modules = _loaded_modules('from naivenlp.correctors import AbstractCorrector')
+        self.assertEqual([], _heavy_modules(modules))
+
+        # the tokenizers are loaded on first access
+        modules = _loaded_modules('import naivenlp; naivenlp.tokenizers.JiebaTokenizer')
+        self.assertIn('naivenlp.tokenizers.jieba_tokenizer', modules)
+        self.assertIn('jieba', modules)
+
+    def testLazyAttributes(self):
+        from naivenlp.tokenizers.bert_tokenizer import BertTokenizer
+        self.assertIs(BertTokenizer, naivenlp.BertTokenizer)
+        self.assertIs(BertTokenizer, naivenlp.tokenizers.BertTokenizer)
+        self.assertEqual('AB', naivenlp.q2b('ＡＢ'))
+        self.assertIn('Trie', dir(naivenlp))
+        self.assertIn('tokenizers', dir(naivenlp))
+        with self.assertRaises(AttributeError):
+            naivenlp.not_exists
+
+    def testEagerFallback(self):
+        # python 3.6 ignores a module level __getattr__, the attributes must be there after the package is imported
+        from naivenlp.structures.trie import Trie
+        package_globals = {}
+        with mock.patch.object(sys, 'version_info', (3, 6, 15)):
+            lazy_module_attributes('naivenlp.structures', package_globals, {'Trie': '.trie'}, ['trie'])
+        self.assertEqual({'Trie': Trie}, package_globals)
+
+        package_globals = {}
+        lazy_module_attributes('naivenlp.structures', package_globals, {'Trie': '.trie'}, ['trie'])
+        self.assertEqual({}, package_globals)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,435 @@
+"""Serve a tokenizer or a corrector over HTTP or a Unix socket.
+
+Concurrent requests are coalesced into micro-batches: a batch is run as soon as it has `max_batch_size`
+items, or `max_wait` seconds after its first item arrived. Batches run in an executor, so the event loop
+keeps accepting requests while the CPU work is done.
+
+Endpoints, request and response bodies are JSON:
+    POST /tokenize  {"text": "..."} or {"texts": [...]} -> {"tokens": [...]} or {"tokens": [[...], ...]}
+    POST /encode    {"text": "..."} or {"texts": [...]} -> {"ids": [...]} or {"ids": [[...], ...]}
+    POST /correct   {"text": "..."} or {"texts": [...]} -> {"results": ...}
+    GET  /metrics   queue depth and batch size counters of every operation
+    GET  /health
+
+Usage:
+    python -m naivenlp.serve --tokenizer bert --vocab_file vocab.txt --port 8000
+    python -m naivenlp.serve --tokenizer jieba --vocab_file vocab.txt --unix_socket /tmp/naivenlp.sock
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import logging
+import time
+
+import numpy as np
+
+OP_TOKENIZE = 'tokenize'
+OP_ENCODE = 'encode'
+OP_CORRECT = 'correct'
+
+_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def run_batch(model, op, texts):
+    """Run an operation on a batch of texts, returns a list of results."""
+    if op == OP_TOKENIZE:
+        tokenize_batch = getattr(model, 'tokenize_batch', None)
+        if tokenize_batch is not None:
+            return tokenize_batch(texts)
+        return [model.tokenize(x) for x in texts]
+    if op == OP_ENCODE:
+        return [model.encode(x) for x in texts]
+    if op == OP_CORRECT:
+        return [model.correct(x) for x in texts]
+    raise ValueError('Invalid op: {}'.format(op))
+
+
+def _ping():
+    return True
+
+
+def _run_batch_in_worker(op, texts):
+    return run_batch(_worker_model, op, texts)
+
+
+def supported_ops(model):
+    """Operations the model supports, i.e. tokenizers tokenize and encode, correctors correct."""
+    from naivenlp.correctors.abstract_corrector import AbstractCorrector
+    from naivenlp.tokenizers.abstract_tokenizer import AbstractTokenizer
+    if isinstance(model, AbstractTokenizer):
+        return [OP_TOKENIZE, OP_ENCODE]
+    if isinstance(model, AbstractCorrector):
+        return [OP_CORRECT]
+    raise TypeError('Can not serve {}, expected a tokenizer or a corrector.'.format(type(model).__name__))
+
+
+class MicroBatcher(object):
+    """Coalesce concurrent items of one operation into batches."""
+
+    def __init__(self, fn, max_batch_size=32, max_wait=0.005, max_concurrency=1):
+        """Constructs a MicroBatcher.
+
+        Args:
+            fn: A coroutine function that takes a list of items and returns a list of results
+            max_batch_size: Max number of items of a batch
+            max_wait: Max seconds a batch waits for more items after its first item
+            max_concurrency: Max number of batches running at the same time. When all of them are
+                busy, new items queue up and form larger batches.
+        """
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be positive, got {}'.format(max_batch_size))
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        # created on first use, inside the event loop
+        self.queue = None
+        self.num_batches = 0
+        self.num_items = 0
+        self.max_seen_batch_size = 0
+        self.batch_sizes = collections.Counter()
+        self._task = None
+        self._running = set()
+
+    async def submit(self, item):
+        if self._task is None:
+            self.queue = asyncio.Queue()
+            self._task = asyncio.ensure_future(self._run())
+        future = asyncio.get_event_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        slots = asyncio.Semaphore(self.max_concurrency)
+        while True:
+            await slots.acquire()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    # take what has already arrived, without waiting
+                    if self.queue.empty():
+                        break
+                    batch.append(self.queue.get_nowait())
+                    continue
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.num_batches += 1
+            self.num_items += len(batch)
+            self.max_seen_batch_size = max(self.max_seen_batch_size, len(batch))
+            self.batch_sizes[len(batch)] += 1
+            task = asyncio.ensure_future(self._run_batch(batch, slots))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch, slots):
+        try:
+            results = await self.fn([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            slots.release()
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def metrics(self):
+        return {
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'batches': self.num_batches,
+            'items': self.num_items,
+            'avg_batch_size': self.num_items / self.num_batches if self.num_batches else 0.0,
+            'max_batch_size': self.max_seen_batch_size,
+            'running_batches': len(self._running),
+            'batch_sizes': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+
+def _json_default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('{} is not JSON serializable'.format(type(obj).__name__))
+
+
+class BatchingServer(object):
+    """Serve a tokenizer or a corrector, see the module docstring for the endpoints."""
+
+    def __init__(self, model, max_batch_size=32, max_wait=0.005, executor=None, num_workers=1, max_body_bytes=1 << 20):
+        """Constructs a BatchingServer.
+
+        Args:
+            model: An `AbstractTokenizer` or an `AbstractCorrector`
+            max_batch_size: Max number of texts of a batch
+            max_wait: Max seconds a batch waits for more texts after its first text
+            executor: `thread`, `process`, or a `concurrent.futures.Executor`, defaults to `thread`.
+                A `process` executor sends the model to every worker once.
+            num_workers: Number of workers of a `thread` or `process` executor
+            max_body_bytes: Max size of a request body, larger requests are rejected with 413
+        """
+        self.model = model
+        self.ops = supported_ops(model)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_body_bytes = max_body_bytes
+        self._own_executor = executor is None or isinstance(executor, str)
+        if executor is None or executor == 'thread':
+            self.executor = concurrent.futures.ThreadPoolExecutor(num_workers)
+            self._in_process = True
+        elif executor == 'process':
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                num_workers, initializer=_init_worker, initargs=(model,))
+            # start the workers now, workers forked later would inherit the sockets of open connections
+            for f in [self.executor.submit(_ping) for _ in range(num_workers)]:
+                f.result()
+            self._in_process = False
+        elif isinstance(executor, str):
+            raise ValueError('Invalid executor: {}'.format(executor))
+        else:
+            self.executor = executor
+            self._in_process = not isinstance(executor, concurrent.futures.ProcessPoolExecutor)
+        self.batchers = {
+            op: MicroBatcher(
+                self._batch_fn(op), max_batch_size=max_batch_size, max_wait=max_wait, max_concurrency=num_workers)
+            for op in self.ops
+        }
+        self.num_requests = 0
+        self.num_errors = 0
+        self.started_at = time.time()
+        self.server = None
+
+    def _batch_fn(self, op):
+        async def fn(texts):
+            loop = asyncio.get_event_loop()
+            if self._in_process:
+                return await loop.run_in_executor(self.executor, run_batch, self.model, op, texts)
+            return await loop.run_in_executor(self.executor, _run_batch_in_worker, op, texts)
+        return fn
+
+    async def start(self, host='127.0.0.1', port=8000, unix_socket=None):
+        """Start listening on a TCP port, or a Unix socket if `unix_socket` is set. Port 0 picks a free port."""
+        if unix_socket:
+            self.server = await asyncio.start_unix_server(self._handle_connection, path=unix_socket)
+        else:
+            self.server = await asyncio.start_server(self._handle_connection, host=host, port=port)
+        return self.server
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for batcher in self.batchers.values():
+            await batcher.close()
+        if self._own_executor:
+            self.executor.shutdown(wait=True)
+
+    def metrics(self):
+        return {
+            'requests': self.num_requests,
+            'errors': self.num_errors,
+            'uptime': time.time() - self.started_at,
+            'max_batch_size': self.max_batch_size,
+            'max_wait': self.max_wait,
+            'ops': {op: batcher.metrics() for op, batcher in self.batchers.items()},
+        }
+
+    async def handle(self, method, path, body):
+        """Handle a request, returns a tuple of (status, response dict)."""
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/metrics':
+            return 200, self.metrics()
+        op = path.strip('/')
+        if op not in [OP_TOKENIZE, OP_ENCODE, OP_CORRECT]:
+            return 404, {'error': 'Not found: {}'.format(path)}
+        if op not in self.batchers:
+            return 404, {'error': '{} does not support {}'.format(type(self.model).__name__, op)}
+        if method != 'POST':
+            return 405, {'error': 'Use POST for {}'.format(path)}
+        try:
+            request = json.loads(body.decode('utf8')) if body else {}
+        except ValueError as e:
+            return 400, {'error': 'Invalid JSON: {}'.format(e)}
+        if not isinstance(request, dict) or ('text' not in request and 'texts' not in request):
+            return 400, {'error': 'The body must be a JSON object of `text` or `texts`.'}
+
+        texts = [request['text']] if 'text' in request else request['texts']
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            return 400, {'error': '`text` must be a string, `texts` must be a list of strings.'}
+
+        batcher = self.batchers[op]
+        key = {OP_TOKENIZE: 'tokens', OP_ENCODE: 'ids', OP_CORRECT: 'results'}[op]
+        if 'text' in request:
+            return 200, {key: await batcher.submit(request['text'])}
+        # the texts of a request are queued one by one, so they can be batched with other requests
+        results = await asyncio.gather(*[batcher.submit(t) for t in texts])
+        return 200, {key: list(results)}
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin1').split()
+                except ValueError:
+                    await self._write_response(writer, 400, {'error': 'Bad request line'}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0 or length > self.max_body_bytes:
+                    # the body is not read, so the connection can not be reused
+                    self.num_requests += 1
+                    self.num_errors += 1
+                    if length < 0:
+                        status, response = 400, {'error': 'Invalid Content-Length'}
+                    else:
+                        error = 'The body is larger than {} bytes'.format(self.max_body_bytes)
+                        status, response = 413, {'error': error}
+                    await self._write_response(writer, status, response, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                self.num_requests += 1
+                try:
+                    status, response = await self.handle(method, target.split('?')[0], body)
+                except Exception as e:
+                    logging.exception('Failed to handle %s %s', method, target)
+                    status, response = 500, {'error': str(e)}
+                if status != 200:
+                    self.num_errors += 1
+                await self._write_response(writer, status, response, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write_response(self, writer, status, response, keep_alive=True):
+        data = json.dumps(response, ensure_ascii=False, default=_json_default).encode('utf8')
+        head = 'HTTP/1.1 {} {}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {}\r\n'.format(
+            status, _REASONS.get(status, ''), len(data))
+        head += 'Connection: {}\r\n\r\n'.format('keep-alive' if keep_alive else 'close')
+        writer.write(head.encode('latin1') + data)
+        await writer.drain()
+
+
+def _build_model(args):
+    if args.tokenizer == 'bert':
+        from naivenlp.tokenizers.bert_tokenizer import BertTokenizer
+        return BertTokenizer(args.vocab_file)
+    if args.tokenizer == 'transformer':
+        from naivenlp.tokenizers.transformer_tokenizer import TransformerTokenizer
+        return TransformerTokenizer(args.vocab_file)
+    if args.tokenizer == 'jieba':
+        from naivenlp.tokenizers.jieba_tokenizer import JiebaTokenizer
+        return JiebaTokenizer(args.vocab_file)
+    if args.tokenizer == 'compiled':
+        from naivenlp.tokenizers.compiled import load_compiled
+        return load_compiled(args.vocab_file)
+    if args.corrector == 'kenlm':
+        from naivenlp.correctors.kenlm_corrector import KenLMCorrector
+        return KenLMCorrector(kenlm_model_path=args.model_path)
+    if args.corrector == 'transformer':
+        from naivenlp.correctors.deep_corrector import TransformerCorrector
+        return TransformerCorrector(args.model_path)
+    raise ValueError('One of --tokenizer and --corrector must be set.')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a tokenizer or a corrector with micro-batching.')
+    parser.add_argument('--tokenizer', type=str, default=None, choices=['bert', 'transformer', 'jieba', 'compiled'])
+    parser.add_argument(
+        '--vocab_file', type=str, default=None, help='The vocab file, or the file of a compiled tokenizer.')
+    parser.add_argument('--corrector', type=str, default=None, choices=['kenlm', 'transformer'])
+    parser.add_argument('--model_path', type=str, default=None)
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix_socket', type=str, default=None)
+    parser.add_argument('--max_batch_size', type=int, default=32)
+    parser.add_argument('--max_wait_ms', type=float, default=5.0)
+    parser.add_argument('--executor', type=str, default='thread', choices=['thread', 'process'])
+    parser.add_argument('--num_workers', type=int, default=1)
+    parser.add_argument('--max_body_bytes', type=int, default=1 << 20)
+    args = parser.parse_args(argv)
+
+    server = BatchingServer(
+        _build_model(args),
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000.0,
+        executor=args.executor,
+        num_workers=args.num_workers,
+        max_body_bytes=args.max_body_bytes)
+
+    async def serve():
+        await server.start(host=args.host, port=args.port, unix_socket=args.unix_socket)
+        logging.info('Serving on %s', args.unix_socket or '{}:{}'.format(args.host, server.port))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.close()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
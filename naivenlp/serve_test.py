@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from naivenlp.correctors.abstract_corrector import AbstractCorrector
+from naivenlp.serve import BatchingServer, MicroBatcher
+from naivenlp.tokenizers.abstract_tokenizer import CustomTokenizer
+
+
+class UpperCorrector(AbstractCorrector):
+
+    def correct(self, text, **kwargs):
+        return text.upper(), []
+
+
+async def _request(method, path, body=None, port=None, unix_socket=None):
+    data = json.dumps(body).encode('utf8') if body is not None else b''
+    head = '{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(
+        method, path, len(data))
+    return await _send(head.encode('latin1') + data, port=port, unix_socket=unix_socket)
+
+
+async def _send(data, port=None, unix_socket=None):
+    if unix_socket:
+        reader, writer = await asyncio.open_unix_connection(unix_socket)
+    else:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ')[1])
+    return status, json.loads(body.decode('utf8'))
+
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class MicroBatcherTest(unittest.TestCase):
+
+    def testBatching(self):
+        async def double(items):
+            await asyncio.sleep(0.01)
+            return [x * 2 for x in items]
+
+        async def run():
+            batcher = MicroBatcher(double, max_batch_size=4, max_wait=0.05)
+            results = await asyncio.gather(*[batcher.submit(i) for i in range(10)])
+            metrics = batcher.metrics()
+            await batcher.close()
+            return results, metrics
+
+        results, metrics = _run(run())
+        self.assertEqual([i * 2 for i in range(10)], results)
+        self.assertEqual(10, metrics['items'])
+        self.assertEqual(4, metrics['max_batch_size'])
+        self.assertEqual(3, metrics['batches'])
+        self.assertEqual(0, metrics['queue_depth'])
+
+    def testErrors(self):
+        async def fail(items):
+            raise ValueError('failed')
+
+        async def run():
+            batcher = MicroBatcher(fail, max_batch_size=2, max_wait=0.0)
+            with self.assertRaises(ValueError):
+                await batcher.submit(1)
+            await batcher.close()
+
+        _run(run())
+
+
+class BatchingServerTest(unittest.TestCase):
+
+    def testTokenizer(self):
+        tokenizer = CustomTokenizer(vocab_file='testdata/vocab_chinese.txt', tokenize_fn=str.split)
+
+        async def run():
+            server = BatchingServer(tokenizer, max_batch_size=8, max_wait=0.05)
+            await server.start(port=0)
+            port = server.port
+            try:
+                texts = ['a b', '上 海', 'hello world'] * 4
+                responses = await asyncio.gather(
+                    *[_request('POST', '/tokenize', {'text': t}, port=port) for t in texts])
+                self.assertEqual([(200, {'tokens': t.split()}) for t in texts], responses)
+
+                status, response = await _request('POST', '/encode', {'texts': ['a b', 'c']}, port=port)
+                self.assertEqual(200, status)
+                self.assertEqual([tokenizer.encode('a b'), tokenizer.encode('c')], response['ids'])
+
+                self.assertEqual(404, (await _request('POST', '/correct', {'text': 'a'}, port=port))[0])
+                self.assertEqual(404, (await _request('GET', '/nothing', port=port))[0])
+                self.assertEqual(405, (await _request('GET', '/tokenize', port=port))[0])
+                self.assertEqual(400, (await _request('POST', '/tokenize', {'texts': [1]}, port=port))[0])
+                self.assertEqual((200, {'status': 'ok'}), await _request('GET', '/health', port=port))
+
+                status, metrics = await _request('GET', '/metrics', port=port)
+                self.assertEqual(200, status)
+                self.assertEqual(len(texts), metrics['ops']['tokenize']['items'])
+                self.assertGreater(metrics['ops']['tokenize']['max_batch_size'], 1)
+                self.assertEqual(0, metrics['ops']['tokenize']['queue_depth'])
+                self.assertEqual(4, metrics['errors'])
+            finally:
+                await server.close()
+
+        _run(run())
+
+    def testInvalidContentLength(self):
+        tokenizer = CustomTokenizer(vocab_file='testdata/vocab_chinese.txt', tokenize_fn=str.split)
+
+        async def run():
+            server = BatchingServer(tokenizer, max_body_bytes=64)
+            await server.start(port=0)
+            port = server.port
+            try:
+                for length in ['abc', '-1']:
+                    head = 'POST /tokenize HTTP/1.1\r\nContent-Length: {}\r\n\r\n'.format(length)
+                    status, response = await _send(head.encode('latin1'), port=port)
+                    self.assertEqual(400, status)
+                    self.assertIn('Content-Length', response['error'])
+                # the server still serves after a bad request
+                status, response = await _request('POST', '/tokenize', {'text': 'a b'}, port=port)
+                self.assertEqual((200, {'tokens': ['a', 'b']}), (status, response))
+            finally:
+                await server.close()
+
+        _run(run())
+
+    def testBodyTooLarge(self):
+        tokenizer = CustomTokenizer(vocab_file='testdata/vocab_chinese.txt', tokenize_fn=str.split)
+
+        async def run():
+            server = BatchingServer(tokenizer, max_body_bytes=64)
+            await server.start(port=0)
+            port = server.port
+            try:
+                status, _ = await _request('POST', '/tokenize', {'text': 'a ' * 100}, port=port)
+                self.assertEqual(413, status)
+                # the body is rejected by its Content-Length, before it is sent
+                head = 'POST /tokenize HTTP/1.1\r\nContent-Length: {}\r\n\r\n'.format(1 << 30)
+                self.assertEqual(413, (await _send(head.encode('latin1'), port=port))[0])
+                self.assertEqual(200, (await _request('POST', '/tokenize', {'text': 'a ' * 10}, port=port))[0])
+                self.assertEqual(2, server.metrics()['errors'])
+            finally:
+                await server.close()
+
+        _run(run())
+
+    def testCorrectorOverUnixSocket(self):
+        async def run(path):
+            server = BatchingServer(UpperCorrector(), max_batch_size=4, max_wait=0.01, executor='process')
+            await server.start(unix_socket=path)
+            try:
+                status, response = await _request('POST', '/correct', {'texts': ['abc', 'x']}, unix_socket=path)
+                self.assertEqual(200, status)
+                self.assertEqual([['ABC', []], ['X', []]], response['results'])
+            finally:
+                await server.close()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            _run(run(os.path.join(tmpdir, 'naivenlp.sock')))
+
+    def testInvalidModel(self):
+        with self.assertRaises(TypeError):
+            BatchingServer(object())
+
+
+if __name__ == "__main__":
+    unittest.main()
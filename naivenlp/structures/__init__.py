@@ -1 +1,12 @@
-from .trie import AbstractTrie, Node, Trie
+from naivenlp.utils.lazy import lazy_module_attributes
+
+__getattr__, __dir__ = lazy_module_attributes(__name__, globals(), {
+    'AhoCorasick': '.aho_corasick',
+    'DoubleArrayTrie': '.double_array_trie',
+    'LRUCache': '.lru_cache',
+    'AbstractTrie': '.trie',
+    'Node': '.trie',
+    'Trie': '.trie',
+    'TrieMap': '.trie',
+    'TrieNode': '.trie',
+})
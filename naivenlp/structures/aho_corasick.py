@@ -0,0 +1,205 @@
+import collections
+
+from .trie import _path_key
+
+# report every occurrence of every key, overlaps included
+OVERLAPPING_MODE = 0
+# scan from left to right, take the longest key at the leftmost start, matches do not overlap
+LEFTMOST_LONGEST_MODE = 1
+
+Match = collections.namedtuple('Match', ['start', 'end', 'key', 'payload'])
+
+
+class AhoCorasick(object):
+    """An Aho-Corasick automaton, finds all the keys in a text in a single pass.
+
+    Keys and texts are sequences of hashable symbols, usually strings. Matching takes time linear in the
+    length of the text plus the number of matches, however many keys there are.
+
+    Usage:
+        >>> ac = AhoCorasick({'上海': 'LOC', '上海市': 'LOC', '海市蜃楼': 'IDIOM'})
+        >>> ac.find_all('上海市', mode=LEFTMOST_LONGEST_MODE)
+        [Match(start=0, end=3, key='上海市', payload='LOC')]
+    """
+
+    def __init__(self, keys=None):
+        """Constructs an AhoCorasick.
+
+        Args:
+            keys: (`optional`) A dict of key -> payload, or an iterable of keys whose payloads are None
+        """
+        # states are ints, 0 is the root
+        self._goto = [{}]
+        self._depth = [0]
+        # index of the key that ends at a state, -1 if none
+        self._key_ids = [-1]
+        self._fail = [0]
+        # the nearest state on the failure chain where a key ends, 0 if none
+        self._output = [0]
+        self._built = True
+        self.keys = []
+        self.payloads = []
+        if keys is not None:
+            items = keys.items() if isinstance(keys, dict) else ((k, None) for k in keys)
+            for key, payload in items:
+                self.add(key, payload)
+
+    @classmethod
+    def from_trie(cls, trie):
+        """Build from the keys of a `Trie` or a `TrieMap`, the payloads are the values of a `TrieMap`."""
+        ac = cls()
+        # iterative, the keys can be longer than the recursion limit
+        stack = [(trie.root, [])]
+        while stack:
+            node, path = stack.pop()
+            if node.terminal and path:
+                # `Trie` nodes have no values
+                ac.add(_path_key(path), getattr(node, 'value', None))
+            for symbol, child in node.children.items():
+                stack.append((child, path + [symbol]))
+        return ac
+
+    def add(self, key, payload=None):
+        """Add a key and its payload, the payload of an existing key is replaced."""
+        if not key:
+            raise ValueError('Keys must be non-empty, got: {!r}'.format(key))
+        goto = self._goto
+        state = 0
+        for symbol in key:
+            nxt = goto[state].get(symbol)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][symbol] = nxt
+                goto.append({})
+                self._depth.append(self._depth[state] + 1)
+                self._key_ids.append(-1)
+                self._built = False
+            state = nxt
+        if self._key_ids[state] >= 0:
+            self.payloads[self._key_ids[state]] = payload
+            return
+        self._key_ids[state] = len(self.keys)
+        self.keys.append(key)
+        self.payloads.append(payload)
+        self._built = False
+
+    def build(self):
+        """Compute the failure links, called by the searches after keys were added."""
+        goto, key_ids = self._goto, self._key_ids
+        fail = [0] * len(goto)
+        output = [0] * len(goto)
+        queue = collections.deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, child in goto[state].items():
+                # the longest proper suffix of the child that is a prefix of some key
+                f = fail[state]
+                while f and symbol not in goto[f]:
+                    f = fail[f]
+                f = goto[f].get(symbol, 0)
+                fail[child] = f
+                output[child] = f if key_ids[f] >= 0 else output[f]
+                queue.append(child)
+        self._fail = fail
+        self._output = output
+        self._built = True
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find_all(self, text, mode=OVERLAPPING_MODE):
+        """All the matches in text, a list of `Match(start, end, key, payload)` ordered by `end`."""
+        return list(self.iter_stream([text], mode=mode))
+
+    def iter_matches(self, text, mode=OVERLAPPING_MODE):
+        """Iterate the matches in text, see `find_all`."""
+        return self.iter_stream([text], mode=mode)
+
+    def iter_stream(self, chunks, mode=OVERLAPPING_MODE):
+        """Iterate the matches in a text that comes in chunks, e.g. the lines or blocks of a large file.
+
+        Matches can cross the boundaries of the chunks, `start` and `end` are offsets in the whole text.
+        Nothing but the state of the automaton is kept, so the chunks are not buffered.
+
+        Args:
+            chunks: An iterable of the pieces of the text
+            mode: `OVERLAPPING_MODE` or `LEFTMOST_LONGEST_MODE`
+
+        Returns:
+            A generator of `Match(start, end, key, payload)`
+        """
+        if mode == OVERLAPPING_MODE:
+            return self._iter_overlapping(chunks)
+        if mode == LEFTMOST_LONGEST_MODE:
+            return self._iter_leftmost_longest(chunks)
+        raise ValueError('Invalid mode: {}'.format(mode))
+
+    def _iter_overlapping(self, chunks):
+        if not self._built:
+            self.build()
+        goto, fail, depth, key_ids, output = self._goto, self._fail, self._depth, self._key_ids, self._output
+        keys, payloads = self.keys, self.payloads
+        state, end = 0, 0
+        for chunk in chunks:
+            for symbol in chunk:
+                end += 1
+                while True:
+                    nxt = goto[state].get(symbol)
+                    if nxt is not None:
+                        state = nxt
+                        break
+                    if not state:
+                        break
+                    state = fail[state]
+                s = state if key_ids[state] >= 0 else output[state]
+                # from the longest key that ends here to the shortest one
+                while s:
+                    k = key_ids[s]
+                    yield Match(end - depth[s], end, keys[k], payloads[k])
+                    s = output[s]
+
+    def _iter_leftmost_longest(self, chunks):
+        if not self._built:
+            self.build()
+        goto, fail, depth, key_ids, output = self._goto, self._fail, self._depth, self._key_ids, self._output
+        keys, payloads = self.keys, self.payloads
+        state, end = 0, 0
+        # the longest match of every start that is not settled yet, start -> (end, key id)
+        pending = {}
+        # starts before it are settled, the end of the last reported match
+        next_start, last_end = 0, 0
+        for chunk in chunks:
+            for symbol in chunk:
+                end += 1
+                while True:
+                    nxt = goto[state].get(symbol)
+                    if nxt is not None:
+                        state = nxt
+                        break
+                    if not state:
+                        break
+                    state = fail[state]
+                s = state if key_ids[state] >= 0 else output[state]
+                while s:
+                    start = end - depth[s]
+                    # matches are found in the order of their ends, a later one of a start is longer
+                    if start >= last_end:
+                        pending[start] = (end, key_ids[s])
+                    s = output[s]
+                # a key that starts before the current state can not match any more
+                frontier = end - depth[state]
+                if not pending:
+                    next_start = frontier
+                    continue
+                while next_start < frontier:
+                    m = pending.pop(next_start, None)
+                    if m is not None and next_start >= last_end:
+                        k = m[1]
+                        yield Match(next_start, m[0], keys[k], payloads[k])
+                        last_end = m[0]
+                    next_start += 1
+        for start in sorted(pending):
+            if start >= last_end:
+                e, k = pending[start]
+                yield Match(start, e, keys[k], payloads[k])
+                last_end = e
@@ -0,0 +1,93 @@
+import random
+import unittest
+
+from .aho_corasick import LEFTMOST_LONGEST_MODE, AhoCorasick, Match
+from .trie import Trie
+
+
+def _brute_force(keys, text):
+    matches = []
+    for end in range(1, len(text) + 1):
+        for start in range(end):
+            if text[start:end] in keys:
+                matches.append((start, end, text[start:end]))
+    return matches
+
+
+def _brute_force_leftmost_longest(keys, text):
+    matches, i = [], 0
+    while i < len(text):
+        ends = [j for j in range(i + 1, len(text) + 1) if text[i:j] in keys]
+        if ends:
+            matches.append((i, ends[-1], text[i:ends[-1]]))
+            i = ends[-1]
+        else:
+            i += 1
+    return matches
+
+
+class AhoCorasickTest(unittest.TestCase):
+
+    def testFindAll(self):
+        ac = AhoCorasick({'he': 1, 'she': 2, 'his': 3, 'hers': 4})
+        self.assertEqual(4, len(ac))
+        self.assertEqual(
+            [Match(1, 4, 'she', 2), Match(2, 4, 'he', 1), Match(2, 6, 'hers', 4)],
+            ac.find_all('ushers'))
+        self.assertEqual([Match(1, 4, 'she', 2)], ac.find_all('ushers', mode=LEFTMOST_LONGEST_MODE))
+        self.assertEqual([], ac.find_all(''))
+
+        ac = AhoCorasick(['上海', '上海市', '海市蜃楼', '浦东'])
+        self.assertEqual(
+            [(0, 3, '上海市'), (3, 5, '浦东')],
+            [m[:3] for m in ac.find_all('上海市浦东', mode=LEFTMOST_LONGEST_MODE)])
+        # the leftmost match wins over a longer one that starts later
+        self.assertEqual(
+            [(0, 3, '上海市')], [m[:3] for m in ac.find_all('上海市蜃楼', mode=LEFTMOST_LONGEST_MODE)])
+
+        # keys added later are found, payloads are replaced
+        ac.add('浦东', 'LOC')
+        ac.add('东新')
+        self.assertEqual([Match(3, 5, '浦东', 'LOC'), Match(4, 6, '东新', None)], ac.find_all('上海市浦东新区')[2:])
+
+        with self.assertRaises(ValueError):
+            ac.add('')
+        with self.assertRaises(ValueError):
+            ac.find_all('上海', mode=2)
+
+    def testStream(self):
+        ac = AhoCorasick({'abc': 'x', 'bcd': 'y', 'cdefg': 'z', 'a': None})
+        text = 'xabcdefgabcdx'
+        for mode in [0, LEFTMOST_LONGEST_MODE]:
+            expected = ac.find_all(text, mode=mode)
+            for size in range(1, len(text) + 1):
+                chunks = [text[i:i + size] for i in range(0, len(text), size)]
+                self.assertEqual(expected, list(ac.iter_stream(iter(chunks), mode=mode)))
+
+    def testFromTrie(self):
+        trie = Trie()
+        for key in ['上海', '上海市', '北京']:
+            trie.put(key)
+        trie.put(['上海市', '浦东新区'])
+        ac = AhoCorasick.from_trie(trie)
+        self.assertEqual(['上海', '上海市'], [m.key for m in ac.find_all('在上海市')])
+        # a trie of token sequences matches token sequences
+        self.assertEqual(
+            [Match(1, 3, ('上海市', '浦东新区'), None)], ac.find_all(['在', '上海市', '浦东新区']))
+
+    def testRandomKeys(self):
+        rng = random.Random(7)
+        for _ in range(20):
+            keys = set(''.join(rng.choice('abc') for _ in range(rng.randint(1, 5))) for _ in range(rng.randint(1, 15)))
+            ac = AhoCorasick(keys)
+            for _ in range(20):
+                text = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 30)))
+                self.assertEqual(_brute_force(keys, text), sorted(
+                    [m[:3] for m in ac.find_all(text)], key=lambda m: (m[1], m[0])))
+                self.assertEqual(
+                    _brute_force_leftmost_longest(keys, text),
+                    [m[:3] for m in ac.find_all(text, mode=LEFTMOST_LONGEST_MODE)])
+
+
+if __name__ == "__main__":
+    unittest.main()
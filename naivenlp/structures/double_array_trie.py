@@ -0,0 +1,414 @@
+import bisect
+import mmap
+import os
+import pickle
+import struct
+
+import numpy as np
+
+from .trie import AbstractTrie
+
+MAGIC = b'NNLPDATR'
+VERSION = 1
+
+# magic, version, kind of values, number of states, size of the char code table, number of keys,
+# size of the blob, size of the values section
+_HEADER = struct.Struct('<8sIIQQQQQ')
+
+# the values section is empty, an int64 array, or a pickled list, it is also empty if every value is None
+_NO_VALUES = 0
+_INT_VALUES = 1
+_PICKLED_VALUES = 2
+_NONE_VALUES = 3
+
+# code of the transition to the terminal state of a key, chars have codes from 1
+_TERMINAL = 0
+_FREE = -1
+
+
+def _align(n, alignment=8):
+    return (n + alignment - 1) // alignment * alignment
+
+
+class _SortedKeys(object):
+    """Sorted keys as utf-8 bytes in one blob, supports bisect by bytes."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+        self._offsets_view = memoryview(offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return bytes(self.blob[self._offsets_view[index]:self._offsets_view[index + 1]])
+
+
+class _NoneValues(object):
+    """Values of keys that are all None, without storing them."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return None
+
+
+class DoubleArrayTrie(AbstractTrie):
+    """An immutable trie of string keys, stored in flat `numpy` arrays instead of Python objects.
+
+    The transition from state `s` by char `c` goes to `t = base[s] + code[c]` if `check[t] == s`.
+    Every key ends with a transition by the terminal code 0, whose `base` is `-(id + 1)`, where the id
+    of a key is its index in the sorted keys.
+
+    Layout:
+        base: int32, base of every state, or the negative id of a key for terminal states
+        check: int32, parent of every state, -1 if the state is free
+        char_codes: int32, code of every char indexed by its code point, -1 if the char is not used
+        blob: utf-8 bytes of all keys in sorted order
+        offsets: int64, key i of the sorted order is blob[offsets[i]:offsets[i + 1]]
+
+    Build it with `DoubleArrayTrie.build(keys)`. Unlike `Trie`, only whole keys are contained, and the
+    keys can not be changed after building.
+
+    The arrays can be saved into one file and loaded with mmap in O(1) time, lookups read the mapped
+    pages directly, so processes loading the same file share them.
+    """
+
+    def __init__(self, base, check, char_codes, blob, offsets, values=None):
+        # path of the mapped file, if loaded by `load`
+        self.path = None
+        self.base = base
+        self.check = check
+        self.char_codes = char_codes
+        self.blob = blob
+        self.offsets = offsets
+        self.values = values
+        self._keys = _SortedKeys(blob, offsets)
+        # memoryviews index into the arrays much faster than numpy scalars
+        self._base_view = memoryview(base)
+        self._check_view = memoryview(check)
+        self._codes_view = memoryview(char_codes)
+        # int values are an int64 array, e.g. from a mapped file
+        self._values = memoryview(values) if isinstance(values, np.ndarray) else values
+
+    @classmethod
+    def build(cls, keys, values=None):
+        """Build from keys, and optionally a value of every key.
+
+        Args:
+            keys: An iterable of strings, sorted keys are built without sorting again.
+                For duplicate keys, the last value wins.
+            values: (`optional`) A list of values of the keys, `get` returns the id of a key by default
+
+        Returns:
+            A `DoubleArrayTrie`
+        """
+        keys = list(keys)
+        if values is not None:
+            values = list(values)
+            if len(values) != len(keys):
+                raise ValueError('Got {} values for {} keys.'.format(len(values), len(keys)))
+            items = dict(zip(keys, values))
+            keys = sorted(items)
+            values = [items[k] for k in keys]
+        elif any(keys[i] >= keys[i + 1] for i in range(len(keys) - 1)):
+            keys = sorted(set(keys))
+        for key in keys:
+            if not isinstance(key, str) or not key:
+                raise ValueError('Keys must be non-empty strings, got: {!r}'.format(key))
+
+        # frequent chars get small codes, which keeps the arrays dense
+        char_counts = {}
+        for key in keys:
+            for c in key:
+                char_counts[c] = char_counts.get(c, 0) + 1
+        chars = sorted(char_counts, key=lambda c: (-char_counts[c], c))
+        codes = {c: i + 1 for i, c in enumerate(chars)}
+        char_codes = np.full(max((ord(c) for c in chars), default=-1) + 1, _FREE, dtype=np.int32)
+        for c, code in codes.items():
+            char_codes[ord(c)] = code
+
+        base, check = _build_arrays(keys, codes)
+        encoded = [k.encode('utf8') for k in keys]
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(k) for k in encoded], out=offsets[1:])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(base, check, char_codes, blob, offsets, values=values)
+
+    def _walk(self, key):
+        """State reached by the chars of key, -1 if there is none."""
+        base, check, codes = self._base_view, self._check_view, self._codes_view
+        num_codes, num_states = len(codes), len(check)
+        state = 0
+        # transitions are inlined, lookups are dominated by this loop
+        for c in key:
+            cp = ord(c)
+            code = codes[cp] if cp < num_codes else -1
+            if code < 0:
+                return -1
+            t = base[state] + code
+            if t >= num_states or check[t] != state:
+                return -1
+            state = t
+        return state
+
+    def _key_id(self, state):
+        """Id of the key that ends at state, -1 if no key ends at state."""
+        t = self._base_view[state] + _TERMINAL
+        if t < len(self._check_view) and self._check_view[t] == state:
+            return -self._base_view[t] - 1
+        return -1
+
+    def get(self, key, **kwargs):
+        """Value of the key, which is the id of the key if no values were given, None if the key is absent."""
+        state = self._walk(key)
+        if state < 0:
+            return None
+        _id = self._key_id(state)
+        if _id < 0:
+            return None
+        return self._values[_id] if self._values is not None else _id
+
+    def contains(self, key, **kwargs):
+        state = self._walk(key)
+        return state >= 0 and self._key_id(state) >= 0
+
+    def is_empty(self, **kwargs):
+        return len(self._keys) == 0
+
+    def longest_prefix_of(self, sequence, **kwargs):
+        """The longest key that is a prefix of the sequence, an empty string if there is none."""
+        base, check, codes = self._base_view, self._check_view, self._codes_view
+        num_codes, num_states = len(codes), len(check)
+        state, end = 0, 0
+        for i, c in enumerate(sequence):
+            cp = ord(c)
+            code = codes[cp] if cp < num_codes else -1
+            if code < 0:
+                break
+            t = base[state] + code
+            if t >= num_states or check[t] != state:
+                break
+            state = t
+            # a key ends here if the terminal transition exists
+            t = base[state] + _TERMINAL
+            if t < num_states and check[t] == state:
+                end = i + 1
+        return sequence[:end]
+
+    def prefix_ends(self, sequence, start=0, **kwargs):
+        """Ends of the keys that are prefixes of sequence[start:], in ascending order."""
+        base, check, codes = self._base_view, self._check_view, self._codes_view
+        num_codes, num_states = len(codes), len(check)
+        state, ends = 0, []
+        for i in range(start, len(sequence)):
+            cp = ord(sequence[i])
+            code = codes[cp] if cp < num_codes else -1
+            if code < 0:
+                break
+            t = base[state] + code
+            if t >= num_states or check[t] != state:
+                break
+            state = t
+            t = base[state] + _TERMINAL
+            if t < num_states and check[t] == state:
+                ends.append(i + 1)
+        return ends
+
+    def _prefix_range(self, prefix):
+        data = prefix.encode('utf8')
+        lo = bisect.bisect_left(self._keys, data)
+        # 0xff never occurs in utf-8, so every key that starts with the prefix is less than this
+        hi = bisect.bisect_left(self._keys, data + b'\xff', lo)
+        return lo, hi
+
+    def keys_with_prefix(self, prefix, **kwargs):
+        """All the keys that start with the prefix, in sorted order."""
+        lo, hi = self._prefix_range(prefix)
+        return [self._keys[i].decode('utf8') for i in range(lo, hi)]
+
+    def iter_keys_with_prefix(self, prefix, limit=None, **kwargs):
+        """Iterate the keys that start with the prefix in sorted order, at most `limit` of them."""
+        lo, hi = self._prefix_range(prefix)
+        if limit is not None:
+            hi = min(hi, lo + max(limit, 0))
+        for i in range(lo, hi):
+            yield self._keys[i].decode('utf8')
+
+    def size(self, **kwargs):
+        """Number of keys."""
+        return len(self._keys)
+
+    def nbytes(self):
+        """Bytes of the arrays."""
+        return sum(a.nbytes for a in [self.base, self.check, self.char_codes, self.blob, self.offsets])
+
+    def _values_section(self):
+        values = self.values
+        if values is None:
+            return _NO_VALUES, None
+        if isinstance(values, np.ndarray):
+            return _INT_VALUES, values
+        if isinstance(values, _NoneValues) or all(v is None for v in values):
+            return _NONE_VALUES, None
+        # ints are mapped in place, other values are pickled and loaded eagerly
+        if all(type(v) is int for v in values):
+            try:
+                return _INT_VALUES, np.array(values, dtype=np.int64)
+            except OverflowError:
+                pass
+        return _PICKLED_VALUES, np.frombuffer(pickle.dumps(list(values), protocol=pickle.HIGHEST_PROTOCOL), np.uint8)
+
+    def to_bytes(self):
+        kind, values = self._values_section()
+        values_size = values.nbytes if values is not None else 0
+        header = _HEADER.pack(
+            MAGIC, VERSION, kind, len(self.base), len(self.char_codes), self.size(), len(self.blob), values_size)
+        parts = [header]
+        size = len(header)
+        for array in [self.base, self.check, self.char_codes, self.offsets, values, self.blob]:
+            if array is None:
+                continue
+            padding = _align(size) - size
+            parts.append(b'\0' * padding)
+            parts.append(array.tobytes())
+            size += padding + array.nbytes
+        return b''.join(parts)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        """Load from a buffer, e.g. a `bytes` or a `mmap`, without copying the arrays."""
+        magic, version, kind, num_states, num_codes, num_keys, blob_size, values_size = _HEADER.unpack_from(
+            buffer, offset)
+        if magic != MAGIC:
+            raise ValueError('Invalid double array trie: bad magic {}'.format(magic))
+        if version != VERSION:
+            raise ValueError('Unsupported double array trie version: {}'.format(version))
+        sections = [(np.int32, num_states), (np.int32, num_states), (np.int32, num_codes), (np.int64, num_keys + 1)]
+        if kind == _INT_VALUES:
+            sections.append((np.int64, num_keys))
+        elif kind == _PICKLED_VALUES:
+            sections.append((np.uint8, values_size))
+        sections.append((np.uint8, blob_size))
+        pos = offset + _HEADER.size
+        arrays = []
+        for dtype, count in sections:
+            pos = offset + _align(pos - offset)
+            arrays.append(np.frombuffer(buffer, dtype=dtype, count=count, offset=pos))
+            pos += arrays[-1].nbytes
+        base, check, char_codes, offsets = arrays[:4]
+        values = None
+        if kind == _INT_VALUES:
+            values = arrays[4]
+        elif kind == _PICKLED_VALUES:
+            values = pickle.loads(arrays[4])
+        elif kind == _NONE_VALUES:
+            values = _NoneValues(num_keys)
+        return cls(base, check, char_codes, arrays[-1], offsets, values=values)
+
+    def save(self, path):
+        with open(path, mode='wb') as fout:
+            fout.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path, use_mmap=True):
+        """Load a saved trie. With `use_mmap`, the file is mapped read-only and shared between processes."""
+        with open(path, mode='rb') as fin:
+            if not use_mmap:
+                return cls.from_buffer(fin.read())
+            if os.fstat(fin.fileno()).st_size == 0:
+                raise ValueError('Empty double array trie file: {}'.format(path))
+            buffer = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        trie = cls.from_buffer(buffer)
+        trie.path = path
+        return trie
+
+    def __getstate__(self):
+        # a mapped trie is mapped again by the receiver, e.g. a worker process, so the pages are shared
+        if self.path is not None:
+            return {'path': self.path}
+        return {'bytes': self.to_bytes()}
+
+    def __setstate__(self, state):
+        if 'path' in state:
+            other = DoubleArrayTrie.load(state['path'])
+        else:
+            other = DoubleArrayTrie.from_buffer(state['bytes'])
+        self.__dict__.update(other.__dict__)
+
+
+def _build_arrays(keys, codes):
+    """Place the states of the sorted keys into base and check arrays, returns the two int32 arrays.
+
+    The free slots are searched from `next_check_pos`, which skips the regions that are almost full,
+    as in darts. The arrays are Python lists while building, which index much faster than numpy.
+    """
+    # a trie has at most one state per char plus one terminal state per key, holes need some more
+    capacity = 2 * (sum(len(k) for k in keys) + len(keys)) + max(codes.values(), default=0) + 2
+    base = [0] * capacity
+    check = [_FREE] * capacity
+    check[0] = 0
+    next_check_pos = 1
+    size = 1
+
+    # a stack of (lo, hi, depth, state), keys[lo:hi] share the prefix of length depth that leads to state
+    stack = [(0, len(keys), 0, 0)] if keys else []
+    while stack:
+        lo, hi, depth, state = stack.pop()
+        # children of the state, in the order of the keys, a key that ends here comes first
+        children = []
+        last_code = -1
+        for i in range(lo, hi):
+            key = keys[i]
+            code = codes[key[depth]] if len(key) > depth else _TERMINAL
+            if code == last_code:
+                children[-1][2] = i + 1
+            else:
+                children.append([code, i, i + 1])
+                last_code = code
+        child_codes = [c[0] for c in children]
+        first_code = child_codes[0]
+        other_codes = child_codes[1:]
+        max_code = max(child_codes)
+
+        # the first base that puts every child into a free slot
+        pos = max(first_code + 1, next_check_pos) - 1
+        num_occupied, first_free = 0, True
+        while True:
+            pos += 1
+            if pos - first_code + max_code >= capacity:
+                n = capacity
+                base.extend([0] * n)
+                check.extend([_FREE] * n)
+                capacity += n
+            if check[pos] != _FREE:
+                num_occupied += 1
+                continue
+            if first_free:
+                next_check_pos = pos
+                first_free = False
+            b = pos - first_code
+            for code in other_codes:
+                if check[b + code] != _FREE:
+                    break
+            else:
+                break
+        # skip the region next time if it is almost full
+        if num_occupied >= 0.95 * (pos - next_check_pos + 1):
+            next_check_pos = pos
+
+        base[state] = b
+        for code, c_lo, c_hi in reversed(children):
+            check[b + code] = state
+            if code == _TERMINAL:
+                base[b] = -(c_lo + 1)
+            else:
+                stack.append((c_lo, c_hi, depth + 1, b + code))
+        size = max(size, b + max_code + 1)
+
+    return np.array(base[:size], dtype=np.int32), np.array(check[:size], dtype=np.int32)
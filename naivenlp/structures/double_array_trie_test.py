@@ -0,0 +1,102 @@
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+from .double_array_trie import DoubleArrayTrie
+
+
+class DoubleArrayTrieTest(unittest.TestCase):
+
+    def testDoubleArrayTrie(self):
+        keys = ['上海', '上海市', '上海市浦东新区', '上海市黄浦区', '北京', 'a', 'ab', 'abc', 'b']
+        t = DoubleArrayTrie.build(keys)
+        self.assertEqual(len(keys), t.size())
+        self.assertFalse(t.is_empty())
+        for key in keys:
+            self.assertTrue(t.contains(key))
+            self.assertEqual(sorted(keys).index(key), t.get(key))
+        # only whole keys are contained
+        for key in ['上', '上海市浦东', '上海市浦东新区哈', '', 'abcd', 'c', '北']:
+            self.assertFalse(t.contains(key))
+            self.assertIsNone(t.get(key))
+
+        self.assertEqual('上海市浦东新区', t.longest_prefix_of('上海市浦东新区哈哈哈'))
+        self.assertEqual('上海市', t.longest_prefix_of('上海市浦东'))
+        self.assertEqual('', t.longest_prefix_of('下海'))
+        self.assertEqual('abc', t.longest_prefix_of('abcd'))
+        self.assertEqual([2, 3, 7], t.prefix_ends('上海市浦东新区哈'))
+        self.assertEqual([3], t.prefix_ends('x上海', start=1))
+
+        self.assertEqual(['上海市', '上海市浦东新区', '上海市黄浦区'], t.keys_with_prefix('上海市'))
+        self.assertEqual(['a', 'ab', 'abc'], t.keys_with_prefix('a'))
+        self.assertEqual(sorted(keys), t.keys_with_prefix(''))
+        self.assertEqual([], t.keys_with_prefix('上海市浦西'))
+        self.assertEqual(['上海', '上海市'], list(t.iter_keys_with_prefix('上', limit=2)))
+        self.assertEqual(['a', 'ab', 'abc', 'b'], list(t.iter_keys_with_prefix('', limit=4)))
+
+    def testValues(self):
+        t = DoubleArrayTrie.build(['b', 'a', 'c', 'a'], values=[2, 1, 3, 4])
+        self.assertEqual(3, t.size())
+        self.assertEqual(4, t.get('a'))
+        self.assertEqual(2, t.get('b'))
+        with self.assertRaises(ValueError):
+            DoubleArrayTrie.build(['a'], values=[])
+        with self.assertRaises(ValueError):
+            DoubleArrayTrie.build(['a', ''])
+
+        empty = DoubleArrayTrie.build([])
+        self.assertTrue(empty.is_empty())
+        self.assertFalse(empty.contains('a'))
+        self.assertEqual([], empty.keys_with_prefix(''))
+
+    def testRandomKeys(self):
+        rng = random.Random(3)
+        chars = 'abcdefg中国上海市区😀'
+        keys = set(''.join(rng.choice(chars) for _ in range(rng.randint(1, 8))) for _ in range(3000))
+        t = DoubleArrayTrie.build(keys)
+        self.assertEqual(len(keys), t.size())
+        self.assertTrue(all(t.contains(k) for k in keys))
+        for _ in range(1000):
+            s = ''.join(rng.choice(chars) for _ in range(rng.randint(0, 10)))
+            self.assertEqual(s in keys, t.contains(s))
+            prefixes = [s[:i] for i in range(len(s) + 1) if s[:i] in keys]
+            self.assertEqual(prefixes[-1] if prefixes else '', t.longest_prefix_of(s))
+            prefix = s[:2]
+            self.assertEqual(sorted(k for k in keys if k.startswith(prefix)), t.keys_with_prefix(prefix))
+
+    def testSaveAndLoad(self):
+        keys = ['上海', '上海市', '北京', 'a', 'ab']
+        tries = [
+            DoubleArrayTrie.build(keys),
+            DoubleArrayTrie.build(keys, values=[1, 2, 3, -4, 2**40]),
+            DoubleArrayTrie.build(keys, values=['x', None, {'f': 1}, 1.5, 2**70]),
+            DoubleArrayTrie.build([]),
+        ]
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'trie.dat')
+            for t in tries:
+                t.save(path)
+                for use_mmap in [True, False]:
+                    loaded = DoubleArrayTrie.load(path, use_mmap=use_mmap)
+                    for other in [loaded, pickle.loads(pickle.dumps(loaded))]:
+                        self.assertEqual(t.size(), other.size())
+                        self.assertEqual(t.keys_with_prefix(''), other.keys_with_prefix(''))
+                        for key in keys + ['上', 'abc']:
+                            self.assertEqual(t.get(key), other.get(key))
+                            self.assertEqual(t.longest_prefix_of(key + '哈'), other.longest_prefix_of(key + '哈'))
+                self.assertEqual(path, pickle.loads(pickle.dumps(DoubleArrayTrie.load(path))).path)
+            # int values are mapped in place
+            tries[1].save(path)
+            self.assertEqual(-4, DoubleArrayTrie.load(path).get('a'))
+            self.assertIs(int, type(DoubleArrayTrie.load(path).get('a')))
+
+            with open(path, 'wb') as fout:
+                fout.write(b'NOTATRIE' + b'\0' * 64)
+            with self.assertRaises(ValueError):
+                DoubleArrayTrie.load(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
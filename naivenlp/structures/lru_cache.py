@@ -0,0 +1,72 @@
+import collections
+import threading
+
+
+class LRUCache:
+    """A bounded, thread-safe cache that evicts the least recently used entries."""
+
+    def __init__(self, max_size=10000):
+        if max_size is None or max_size <= 0:
+            raise ValueError('max_size must be a positive integer, got: {}'.format(max_size))
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get the value of key, and mark it as the most recently used one."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Put a value into the cache, evicting the least recently used entry if the cache is full."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self._data[key] = value
+                return
+            self._data[key] = value
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Counters of this cache."""
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getstate__(self):
+        # entries and counters are local to a process, a pickled cache starts empty
+        return {'max_size': self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(max_size=state['max_size'])
@@ -0,0 +1,49 @@
+import pickle
+import threading
+import unittest
+
+from .lru_cache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def testLRUCache(self):
+        cache = LRUCache(max_size=2)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual(2, len(cache))
+        self.assertEqual({'size': 2, 'max_size': 2, 'hits': 3, 'misses': 1, 'evictions': 1}, cache.stats())
+
+        cache = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(0, len(cache))
+        self.assertEqual(2, cache.max_size)
+
+        with self.assertRaises(ValueError):
+            LRUCache(max_size=0)
+
+    def testThreadSafety(self):
+        cache = LRUCache(max_size=100)
+
+        def _run():
+            for i in range(2000):
+                if cache.get(i % 150) is None:
+                    cache.put(i % 150, i)
+
+        threads = [threading.Thread(target=_run) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = cache.stats()
+        self.assertEqual(8000, stats['hits'] + stats['misses'])
+        self.assertEqual(100, stats['size'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import abc
+import types
 
 
 class Node:
@@ -6,6 +7,8 @@ class Node:
     def __init__(self):
         self.val = None
         self.children = {}
+        # a key ends at this node
+        self.terminal = False
 
 
 class AbstractTrie(abc.ABC):
@@ -39,6 +42,14 @@ class AbstractTrie(abc.ABC):
         """Collect all of the sequence in the trie that has this prefix"""
         raise NotImplementedError()
 
+    def iter_keys_with_prefix(self, prefix, limit=None, **kwargs):
+        """Iterate the keys that have this prefix in sorted order, at most `limit` of them"""
+        raise NotImplementedError()
+
+    def prefix_ends(self, sequence, start=0, **kwargs):
+        """Ends of the keys that are prefixes of sequence[start:], in ascending order"""
+        raise NotImplementedError()
+
     def size(self, **kwargs):
         """Number of leaf nodes of this trie"""
         raise NotImplementedError()
@@ -48,6 +59,59 @@ class AbstractTrie(abc.ABC):
         raise NotImplementedError()
 
 
+def _walk(node, path, sort=False):
+    """Visit the subtree of node in pre-order, without recursion.
+
+    The symbols from node to the visited node are appended to `path` in place, so nothing is copied
+    per node, copy the path to keep it. With `sort`, children are visited in the order of their symbols,
+    and only the children of the visited nodes are sorted.
+    """
+    yield node
+    stack = [iter(sorted(node.children.items()) if sort else node.children.items())]
+    while stack:
+        for x, child in stack[-1]:
+            path.append(x)
+            yield child
+            if child.children:
+                stack.append(iter(sorted(child.children.items()) if sort else child.children.items()))
+                break
+            path.pop()
+        else:
+            stack.pop()
+            # the symbol of the node whose children are done
+            if stack:
+                path.pop()
+
+
+def _put_sorted(root, keys, new_node):
+    """Insert sorted keys, yields the node of every key.
+
+    The nodes of the previous key are kept, so the common prefix with it is not looked up again.
+    """
+    # nodes[i] is the node of the first i symbols of the previous key
+    nodes, previous = [root], None
+    for key in keys:
+        n = 0
+        if previous is not None:
+            if key < previous:
+                raise ValueError('Keys are not sorted: {!r} comes after {!r}'.format(key, previous))
+            m = min(len(key), len(previous))
+            while n < m and key[n] == previous[n]:
+                n += 1
+            del nodes[n + 1:]
+        node = nodes[-1]
+        # the remaining symbols are new, an earlier key with them would come after the previous key
+        for x in key[n:]:
+            child = new_node(x)
+            if not node.children:
+                node.children = {}
+            node.children[x] = child
+            nodes.append(child)
+            node = child
+        previous = key
+        yield node
+
+
 class Trie(AbstractTrie):
 
     def __init__(self):
@@ -56,6 +120,7 @@ class Trie(AbstractTrie):
 
     def _put(self, node, sequence, depth):
         if depth == len(sequence):
+            node.terminal = True
             return
         v = sequence[depth]
         if v not in node.children:
@@ -109,21 +174,20 @@ class Trie(AbstractTrie):
     def longest_prefix_of(self, sequence, **kwargs):
         return self._search(self.root, sequence, 0)
 
+    def prefix_ends(self, sequence, start=0, **kwargs):
+        node, ends = self.root, []
+        for i in range(start, len(sequence)):
+            node = node.children.get(sequence[i])
+            if node is None:
+                break
+            if node.terminal:
+                ends.append(i + 1)
+        return ends
+
     def _collect(self, node, prefix):
         prefix = list(prefix)
-        results = []
-
-        def _traversal(n, arr):
-            if not n.children:
-                results.append(prefix + arr)
-                return
-            for k, c in n.children.items():
-                arr.append(k)
-                _traversal(c, arr[:])
-                arr.pop()
-
-        _traversal(node, [])
-        return results
+        path = []
+        return [prefix + path for n in _walk(node, path) if not n.children]
 
     def keys_with_prefix(self, prefix, **kwargs):
         node = self.get(prefix)
@@ -131,6 +195,46 @@ class Trie(AbstractTrie):
             return []
         return self._collect(node, prefix)
 
+    def iter_keys_with_prefix(self, prefix, limit=None, **kwargs):
+        """Iterate the keys that start with the prefix, as lists of symbols, in sorted order.
+
+        Unlike `keys_with_prefix`, every inserted key is a result, not only the ones that end at leaves.
+        Nodes are visited lazily, so the first results of a short prefix do not walk the whole subtree.
+
+        Args:
+            prefix: The prefix
+            limit: (`optional`) Max number of keys
+        """
+        node = self.get(prefix)
+        if node is None or (limit is not None and limit <= 0):
+            return
+        prefix = list(prefix)
+        path, count = [], 0
+        for n in _walk(node, path, sort=True):
+            if n.terminal:
+                yield prefix + path
+                count += 1
+                if count == limit:
+                    return
+
+    @classmethod
+    def from_sorted(cls, keys):
+        """Build from keys in sorted order, e.g. the lines of a sorted word list file.
+
+        The keys are streamed, and the nodes of the common prefix with the previous key are reused
+        without lookups. Raises `ValueError` if the keys are not sorted.
+        """
+        trie = cls()
+
+        def _new_node(x):
+            node = Node()
+            node.val = x
+            return node
+
+        for node in _put_sorted(trie.root, keys, _new_node):
+            node.terminal = True
+        return trie
+
     def size(self, **kwargs):
 
         def _count(node):
@@ -156,3 +260,244 @@ class Trie(AbstractTrie):
 
     def show(self, max_depth=None):
         self._show(self.root, 0, max_depth=max_depth)
+
+
+# children of the nodes without children, shared and read-only, a node gets its own dict on the first child
+_NO_CHILDREN = types.MappingProxyType({})
+
+
+def _path_key(path):
+    # a path of chars is a string key, a path of tokens, e.g. from `put(['上海市', '浦东新区'])`, is a tuple
+    if all(isinstance(x, str) and len(x) == 1 for x in path):
+        return ''.join(path)
+    return tuple(path)
+
+
+class TrieNode:
+    """A node of `TrieMap`, slotted to save memory."""
+
+    __slots__ = ('children', 'terminal', 'value')
+
+    def __init__(self):
+        self.children = _NO_CHILDREN
+        # a key ends at this node
+        self.terminal = False
+        self.value = None
+
+
+class TrieMap(AbstractTrie):
+    """A trie of keys and their values, e.g. ids or frequencies.
+
+    Unlike `Trie`, only whole keys are contained, `size` is the number of keys, and every method is
+    iterative, so keys can be longer than the recursion limit. Keys are strings or sequences of tokens.
+    """
+
+    def __init__(self):
+        self.root = TrieNode()
+        self._size = 0
+
+    def put(self, sequence, value=None, **kwargs):
+        """Insert a key and its value, the value of an existing key is replaced."""
+        node = self.root
+        for x in sequence:
+            children = node.children
+            child = children.get(x)
+            if child is None:
+                if not children:
+                    children = node.children = {}
+                child = children[x] = TrieNode()
+            node = child
+        if not node.terminal:
+            node.terminal = True
+            self._size += 1
+        node.value = value
+
+    @classmethod
+    def from_sorted(cls, keys, values=None):
+        """Build from keys in sorted order, e.g. the lines of a sorted word list file.
+
+        The keys are streamed, and the nodes of the common prefix with the previous key are reused
+        without lookups. For duplicate keys, the last value wins.
+
+        Args:
+            keys: An iterable of sorted keys, raises `ValueError` if they are not sorted
+            values: (`optional`) An iterable of the values of the keys, in the same order
+
+        Returns:
+            A `TrieMap`
+        """
+        trie = cls()
+        values = iter(values) if values is not None else None
+        missing = object()
+        for node in _put_sorted(trie.root, keys, lambda x: TrieNode()):
+            value = None
+            if values is not None:
+                value = next(values, missing)
+                if value is missing:
+                    raise ValueError('Got fewer values than keys.')
+            if not node.terminal:
+                node.terminal = True
+                trie._size += 1
+            node.value = value
+        return trie
+
+    def _find(self, sequence):
+        node = self.root
+        for x in sequence:
+            node = node.children.get(x)
+            if node is None:
+                return None
+        return node
+
+    def get(self, key, default=None, **kwargs):
+        """Value of the key, `default` if the key is absent."""
+        node = self._find(key)
+        if node is None or not node.terminal:
+            return default
+        return node.value
+
+    def delete(self, key, **kwargs):
+        """Delete a key, returns False if the key is absent."""
+        path = []
+        node = self.root
+        for x in key:
+            child = node.children.get(x)
+            if child is None:
+                return False
+            path.append((node, x))
+            node = child
+        if not node.terminal:
+            return False
+        node.terminal = False
+        node.value = None
+        self._size -= 1
+        # remove the nodes that lead to no key any more
+        while path and not node.children and not node.terminal:
+            parent, x = path.pop()
+            del parent.children[x]
+            if not parent.children:
+                parent.children = _NO_CHILDREN
+            node = parent
+        return True
+
+    def contains(self, key, **kwargs):
+        node = self._find(key)
+        return node is not None and node.terminal
+
+    def __contains__(self, key):
+        return self.contains(key)
+
+    def __len__(self):
+        return self._size
+
+    def is_empty(self, **kwargs):
+        return self._size == 0
+
+    def longest_prefix_of(self, sequence, **kwargs):
+        """The longest key that is a prefix of the sequence, an empty sequence if there is none."""
+        node, end = self.root, 0
+        for i, x in enumerate(sequence):
+            node = node.children.get(x)
+            if node is None:
+                break
+            if node.terminal:
+                end = i + 1
+        return sequence[:end]
+
+    def prefix_ends(self, sequence, start=0, **kwargs):
+        """Ends of the keys that are prefixes of sequence[start:], in ascending order."""
+        node, ends = self.root, []
+        for i in range(start, len(sequence)):
+            node = node.children.get(sequence[i])
+            if node is None:
+                break
+            if node.terminal:
+                ends.append(i + 1)
+        return ends
+
+    def iter_items_with_prefix(self, prefix, limit=None, **kwargs):
+        """Iterate the (key, value) pairs whose keys start with the prefix, in sorted order.
+
+        Nodes are visited lazily, so the first results of a short prefix do not walk the whole subtree.
+
+        Args:
+            prefix: The prefix
+            limit: (`optional`) Max number of pairs
+        """
+        node = self._find(prefix)
+        if node is None or (limit is not None and limit <= 0):
+            return
+        prefix = list(prefix)
+        path, count = [], 0
+        for n in _walk(node, path, sort=True):
+            if n.terminal:
+                yield _path_key(prefix + path), n.value
+                count += 1
+                if count == limit:
+                    return
+
+    def iter_keys_with_prefix(self, prefix, limit=None, **kwargs):
+        """Iterate the keys that start with the prefix, in sorted order, see `iter_items_with_prefix`."""
+        for key, _ in self.iter_items_with_prefix(prefix, limit=limit):
+            yield key
+
+    def items_with_prefix(self, prefix, **kwargs):
+        """All the (key, value) pairs whose keys start with the prefix, in sorted order."""
+        return list(self.iter_items_with_prefix(prefix))
+
+    def keys_with_prefix(self, prefix, **kwargs):
+        """All the keys that start with the prefix, in sorted order."""
+        return list(self.iter_keys_with_prefix(prefix))
+
+    def items(self):
+        """All the (key, value) pairs, in sorted order."""
+        return self.items_with_prefix([])
+
+    def size(self, **kwargs):
+        """Number of keys."""
+        return self._size
+
+    def show(self, max_depth=None, **kwargs):
+        print('.')
+        stack = [(x, child, 0) for x, child in reversed(list(self.root.children.items()))]
+        while stack:
+            x, node, depth = stack.pop()
+            print("|    " * depth + '+----' + str(x))
+            if max_depth is not None and depth == max_depth:
+                continue
+            for k, child in reversed(list(node.children.items())):
+                stack.append((k, child, depth + 1))
+
+    def save(self, path):
+        """Save into a file of flat arrays, see `open`. Keys must be non-empty strings.
+
+        Int values are mapped in place, values that are all None are saved without a values section.
+        """
+        # imported here, double_array_trie imports this module
+        from .double_array_trie import DoubleArrayTrie
+
+        items = self.items()
+        DoubleArrayTrie.build([k for k, _ in items], values=[v for _, v in items]).save(path)
+
+    @classmethod
+    def open(cls, path):
+        """Open a file saved by `save`, in O(1) time.
+
+        The file is mapped read-only and lookups read the mapped pages, so processes opening the same file
+        share the memory.
+
+        Returns:
+            A read-only `DoubleArrayTrie`, its `get` returns the saved values like `TrieMap.get`
+        """
+        from .double_array_trie import DoubleArrayTrie
+
+        return DoubleArrayTrie.load(path)
+
+    def __getstate__(self):
+        # pickled as the key value pairs, nested nodes would hit the recursion limit of pickle
+        return {'items': self.items()}
+
+    def __setstate__(self, state):
+        self.__init__()
+        for key, value in state['items']:
+            self.put(key, value)
@@ -1,6 +1,10 @@
+import os
+import pickle
+import sys
+import tempfile
 import unittest
 
-from .trie import Trie
+from .trie import Trie, TrieMap
 
 
 class TrieTest(unittest.TestCase):
@@ -35,6 +39,10 @@ class TrieTest(unittest.TestCase):
             print('=' * 80)
         self.assertEqual(3, t.size())
 
+        self.assertEqual(
+            [['上', '海', '市', '浦', '东', '新', '区'], ['上', '海', '市', '黄', '浦', '区']],
+            t.keys_with_prefix('上海市'))
+
         t.delete('上海市浦东')
         t.show()
 
@@ -49,6 +57,143 @@ class TrieTest(unittest.TestCase):
         t.show()
         self.assertEqual(True, t.is_empty())
 
+    def testIterKeysWithPrefix(self):
+        t = Trie()
+        for key in ['上海市黄浦区', '上海', '上海市浦东新区', '上海市', '北京']:
+            t.put(key)
+        # every key in sorted order, not only the ones that end at leaves
+        self.assertEqual(
+            ['上海', '上海市', '上海市浦东新区', '上海市黄浦区'], [''.join(k) for k in t.iter_keys_with_prefix('上')])
+        self.assertEqual(['上海市', '上海市浦东新区'], [''.join(k) for k in t.iter_keys_with_prefix('上海市', limit=2)])
+        self.assertEqual([], list(t.iter_keys_with_prefix('上海', limit=0)))
+        self.assertEqual([], list(t.iter_keys_with_prefix('南京')))
+
+    def testFromSorted(self):
+        keys = ['上海', '上海', '上海市', '上海市浦东新区', '上海市黄浦区', '北京']
+        t = Trie.from_sorted(iter(keys))
+        self.assertEqual(keys[1:], [''.join(k) for k in t.iter_keys_with_prefix('')])
+        self.assertEqual(['上海市浦东新区', '上海市黄浦区'], [''.join(k) for k in t.keys_with_prefix('上')])
+        self.assertEqual('区', t.get('上海市黄浦区').val)
+        with self.assertRaises(ValueError):
+            Trie.from_sorted(['上海市', '上海'])
+
+
+class TrieMapTest(unittest.TestCase):
+
+    def testTrieMap(self):
+        t = TrieMap()
+        self.assertTrue(t.is_empty())
+        t.put('上海市浦东新区', 1)
+        t.put('上海市', 2)
+        t.put('上海市黄浦区')
+        t.put('上海市', 3)
+        t.put(['上海市', '浦东新区'], 4)
+        t.show()
+
+        self.assertEqual(4, t.size())
+        self.assertEqual(4, len(t))
+        self.assertEqual(3, t.get('上海市'))
+        self.assertEqual(4, t.get(['上海市', '浦东新区']))
+        self.assertIsNone(t.get('上海市黄浦区'))
+        # only whole keys are contained
+        self.assertTrue(t.contains('上海市黄浦区'))
+        self.assertFalse(t.contains('上海'))
+        self.assertNotIn('上海市浦东', t)
+        self.assertEqual(-1, t.get('上海市浦东', default=-1))
+
+        self.assertEqual('上海市浦东新区', t.longest_prefix_of('上海市浦东新区哈哈哈'))
+        self.assertEqual('上海市', t.longest_prefix_of('上海市浦东'))
+        self.assertEqual('', t.longest_prefix_of('上'))
+        self.assertEqual([3, 7], t.prefix_ends('上海市浦东新区哈'))
+        self.assertEqual([4], t.prefix_ends('x上海市', start=1))
+        self.assertEqual(['上海市', '上海市浦东新区', '上海市黄浦区'], t.keys_with_prefix('上海'))
+        self.assertEqual([('上海市浦东新区', 1)], t.items_with_prefix('上海市浦'))
+        self.assertEqual([], t.keys_with_prefix('北京'))
+        self.assertEqual([(('上海市', '浦东新区'), 4)], t.items_with_prefix(['上海市']))
+
+        self.assertFalse(t.delete('上海'))
+        self.assertTrue(t.delete('上海市浦东新区'))
+        self.assertFalse(t.contains('上海市浦东新区'))
+        self.assertEqual('上海市', t.longest_prefix_of('上海市浦东新区'))
+        # the nodes of the deleted key are removed
+        node = t.root.children['上'].children['海'].children['市']
+        self.assertEqual(['黄'], list(node.children))
+        self.assertEqual(3, t.size())
+        for key in ['上海市', '上海市黄浦区', ['上海市', '浦东新区']]:
+            self.assertTrue(t.delete(key))
+        self.assertTrue(t.is_empty())
+        self.assertEqual(0, len(t.root.children))
+
+    def testLongKeys(self):
+        t = TrieMap()
+        key = 'a' * (sys.getrecursionlimit() * 2)
+        t.put(key, 1)
+        t.put('ab', 2)
+        self.assertEqual(1, t.get(key))
+        self.assertEqual(key, t.longest_prefix_of(key + 'b'))
+        self.assertEqual([key, 'ab'], t.keys_with_prefix('a'))
+
+        t = pickle.loads(pickle.dumps(t))
+        self.assertEqual(2, t.size())
+        self.assertEqual(1, t.get(key))
+        self.assertTrue(t.delete(key))
+        self.assertEqual(['ab'], t.keys_with_prefix(''))
+
+    def testSaveAndOpen(self):
+        t = TrieMap()
+        for i, key in enumerate(['上海市浦东新区', '上海市', '北京']):
+            t.put(key, i * 10)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'trie.dat')
+            t.save(path)
+            opened = TrieMap.open(path)
+            self.assertEqual(3, opened.size())
+            self.assertEqual(10, opened.get('上海市'))
+            self.assertFalse(opened.contains('上海'))
+            self.assertEqual('上海市', opened.longest_prefix_of('上海市黄浦区'))
+            self.assertEqual(t.keys_with_prefix('上海'), opened.keys_with_prefix('上海'))
+
+    def testSaveAndOpenNoneValues(self):
+        t = TrieMap.from_sorted(['上海市', '北京'])
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'trie.dat')
+            t.save(path)
+            opened = TrieMap.open(path)
+            self.assertEqual(2, opened.size())
+            self.assertIsNone(t.get('北京'))
+            self.assertIsNone(opened.get('北京'))
+            self.assertTrue(opened.contains('北京'))
+            # pickled and sent to a worker, the values are still None
+            self.assertIsNone(pickle.loads(pickle.dumps(opened)).get('上海市'))
+
+    def testIterKeysWithPrefix(self):
+        t = TrieMap()
+        for i in range(1000):
+            t.put(str(i), i)
+        self.assertEqual(['1', '10', '100', '101'], list(t.iter_keys_with_prefix('1', limit=4)))
+        self.assertEqual([('99', 99), ('990', 990)], list(t.iter_items_with_prefix('99', limit=2)))
+        self.assertEqual(sorted(str(i) for i in range(1000)), list(t.iter_keys_with_prefix('')))
+        self.assertEqual([], list(t.iter_keys_with_prefix('1000')))
+
+    def testFromSorted(self):
+        words = sorted(set(str(i * 7) for i in range(500)))
+        t = TrieMap.from_sorted(words, values=range(len(words)))
+        expected = TrieMap()
+        for i, w in enumerate(words):
+            expected.put(w, i)
+        self.assertEqual(expected.items(), t.items())
+        self.assertEqual(len(words), t.size())
+
+        # streamed from lines, the last value of a duplicate key wins
+        lines = iter(['上海\n', '上海\n', '上海市\n'])
+        t = TrieMap.from_sorted((line.strip() for line in lines), values=[1, 2, 3])
+        self.assertEqual([('上海', 2), ('上海市', 3)], t.items())
+
+        with self.assertRaises(ValueError):
+            TrieMap.from_sorted(['b', 'a'])
+        with self.assertRaises(ValueError):
+            TrieMap.from_sorted(['a', 'b'], values=[1])
+
 
 if __name__ == "__main__":
     unittest.main()
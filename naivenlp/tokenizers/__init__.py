@@ -1,4 +1,22 @@
-from .abstract_tokenizer import AbstractTokenizer, CustomTokenizer
-from .bert_tokenizer import BertTokenizer
-from .jieba_tokenizer import JiebaTokenizer
-from .transformer_tokenizer import TransformerTokenizer
+from naivenlp.utils.lazy import lazy_module_attributes
+
+__getattr__, __dir__ = lazy_module_attributes(__name__, globals(), {
+    'AbstractTokenizer': '.abstract_tokenizer',
+    'CustomTokenizer': '.abstract_tokenizer',
+    'VocabBasedTokenizer': '.abstract_tokenizer',
+    'BertTokenizer': '.bert_tokenizer',
+    'BPETokenizer': '.bpe_tokenizer',
+    'Bucket': '.bucketing',
+    'bucket_by_length': '.bucketing',
+    'restore_order': '.bucketing',
+    'JiebaTokenizer': '.jieba_tokenizer',
+    'MaxMatchTokenizer': '.max_match_tokenizer',
+    'AddedTokenMatcher': '.tokenizer',
+    'BasicTokenizer': '.tokenizer',
+    'WordpieceTokenizer': '.tokenizer',
+    'TransformerTokenizer': '.transformer_tokenizer',
+    'CompactVocab': '.vocab',
+    'count_words': '.wordpiece_trainer',
+    'train_vocab': '.wordpiece_trainer',
+    'train_wordpiece': '.wordpiece_trainer',
+})
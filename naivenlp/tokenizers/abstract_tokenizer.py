@@ -1,7 +1,54 @@
 import abc
+import collections
+import functools
 import logging
 import os
 
+import numpy as np
+
+from naivenlp.utils.parallel import ChunkPool
+
+from .compiled import load_compiled, save_compiled
+from .vocab import CompactVocab, ReverseCompactVocab
+
+EncodedBatch = collections.namedtuple('EncodedBatch', ['ids', 'mask', 'lengths'])
+
+PADDING_LONGEST = 'longest'
+PADDING_MAX_LENGTH = 'max_length'
+
+
+def pad_sequences(sequences, pad_id=0, max_length=None, padding=PADDING_LONGEST, dtype=np.int32):
+    """Pad a list of id sequences into an `EncodedBatch` of (ids, mask, lengths) arrays.
+
+    Args:
+        sequences: A list of id lists
+        pad_id: The id used to fill the padding positions
+        max_length: Width of the matrix when `padding` is `max_length`
+        padding: `longest` pads to the longest sequence, `max_length` pads to `max_length`
+        dtype: dtype of the ids matrix
+
+    Returns:
+        An `EncodedBatch`, ids and mask are of shape [batch_size, width], lengths is of shape [batch_size]
+    """
+    lengths = np.fromiter((len(x) for x in sequences), dtype=np.int32, count=len(sequences))
+    longest = int(lengths.max()) if len(sequences) else 0
+    if padding == PADDING_LONGEST:
+        width = longest
+    elif padding == PADDING_MAX_LENGTH:
+        if max_length is None:
+            raise ValueError('max_length must be set when padding is `{}`.'.format(PADDING_MAX_LENGTH))
+        if longest > max_length:
+            raise ValueError('Sequence of length {} is longer than max_length {}.'.format(longest, max_length))
+        width = max_length
+    else:
+        raise ValueError('Invalid padding: {}'.format(padding))
+
+    ids = np.full((len(sequences), width), pad_id, dtype=dtype)
+    for i, seq in enumerate(sequences):
+        ids[i, :len(seq)] = seq
+    mask = (np.arange(width, dtype=np.int32)[None, :] < lengths[:, None]).astype(np.int32)
+    return EncodedBatch(ids=ids, mask=mask, lengths=lengths)
+
 
 class AbstractTokenizer(abc.ABC):
 
@@ -23,8 +70,17 @@ class AbstractTokenizer(abc.ABC):
 
 class VocabBasedTokenizer(AbstractTokenizer):
 
-    def __init__(self, vocab_file, **kwargs):
+    def __init__(self, vocab_file, compact_vocab=False, **kwargs):
+        """Constructs a VocabBasedTokenizer.
+
+        Args:
+            vocab_file: A text file of one token per line, or a file saved by `CompactVocab.save`
+            compact_vocab: Store the vocab in a `CompactVocab` instead of dicts, a saved `CompactVocab`
+                file is memory-mapped and shared by all the processes that load it
+            kwargs: Special tokens, e.g. `unk_token='[UNK]'` sets `unk_token` and `unk_id`
+        """
         self.vocab_file = vocab_file
+        self.compact_vocab = compact_vocab
 
         self._special_tokens = []
         for k, v in kwargs.items():
@@ -42,18 +98,25 @@ class VocabBasedTokenizer(AbstractTokenizer):
     def _build_vocab(self, file):
         if not file:
             logging.warning('vocab_file is empty or None.')
-            return {}
-        words = []
-        with open(file, mode='rt', encoding='utf8') as fin:
-            for line in fin:
-                line = line.strip('\n').strip()
-                if not line:
-                    continue
-                word = line.strip()
-                words.append(word)
+            return CompactVocab.from_dict({}) if self.compact_vocab else {}
+        special_tokens = [v for _, v in self._special_tokens]
+        if CompactVocab.is_compact_file(file):
+            vocab = CompactVocab.load(file)
+            if all(t in vocab for t in special_tokens) and self.compact_vocab:
+                return vocab
+            # special tokens are appended, which needs a mutable copy
+            words = list(vocab)
+        else:
+            words = []
+            with open(file, mode='rt', encoding='utf8') as fin:
+                for line in fin:
+                    line = line.strip('\n').strip()
+                    if not line:
+                        continue
+                    word = line.strip()
+                    words.append(word)
 
         vocab = set(words)
-        special_tokens = [v for _, v in self._special_tokens]
         for t in special_tokens:
             if t not in vocab:
                 words.append(t)
@@ -61,9 +124,13 @@ class VocabBasedTokenizer(AbstractTokenizer):
         d = {}
         for i in range(len(words)):
             d[words[i]] = i
+        if self.compact_vocab:
+            return CompactVocab.from_dict(d)
         return d
 
     def _reverse_vocab(self):
+        if isinstance(self.vocab, CompactVocab):
+            return self.vocab.reverse()
         reverse_vocabs = {}
         for k, v in self.vocab.items():
             reverse_vocabs[v] = k
@@ -73,6 +140,33 @@ class VocabBasedTokenizer(AbstractTokenizer):
     def vocab_size(self):
         return len(self.vocab)
 
+    def save_compiled(self, path):
+        """Save the ready-to-use state of this tokenizer into a single versioned binary file."""
+        save_compiled(self, path)
+
+    @classmethod
+    def load_compiled(cls, path):
+        """Load a tokenizer saved by `save_compiled`, the vocab is used in place from a read-only mmap."""
+        return load_compiled(path, base_class=cls)
+
+    def __getstate__(self):
+        return self.__dict__.copy()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def _compiled_state(self):
+        """State persisted by `save_compiled`, the vocab is saved separately."""
+        state = self.__getstate__()
+        state.pop('vocab', None)
+        state.pop('reverse_vocab', None)
+        state.pop('_token_table_cache', None)
+        return state
+
+    def _restore_compiled_state(self, state, vocab):
+        self.__setstate__(dict(state, vocab=vocab, compact_vocab=True))
+        self.reverse_vocab = self._reverse_vocab()
+
     def special_tokens(self):
         return self._special_tokens
 
@@ -88,22 +182,161 @@ class VocabBasedTokenizer(AbstractTokenizer):
         return ids
 
     def ids2tokens(self, ids, drop_bos=False, drop_eos=False, **kwargs):
-        tokens = [self.reverse_vocab.get(t, self.unk_token) for t in ids]
-        if drop_bos and tokens[0] == self.bos_token:
+        if isinstance(ids, np.ndarray):
+            tokens = self._lookup_tokens(ids).tolist()
+        else:
+            tokens = [self.reverse_vocab.get(t, self.unk_token) for t in ids]
+        if drop_bos and tokens and tokens[0] == self.bos_token:
             tokens = tokens[1:]
-        if drop_eos and tokens[-1] == self.eos_token:
+        if drop_eos and tokens and tokens[-1] == self.eos_token:
             tokens = tokens[:-1]
         return tokens
 
+    def _token_table(self):
+        """An object array of the token of every id, the last item is `unk_token` for invalid ids."""
+        table = self.__dict__.get('_token_table_cache')
+        if table is None:
+            size = max(self.reverse_vocab.keys(), default=-1) + 1
+            table = np.empty(size + 1, dtype=object)
+            table[:] = getattr(self, 'unk_token', None)
+            for _id, token in self.reverse_vocab.items():
+                table[_id] = token
+            self._token_table_cache = table
+        return table
+
+    def _lookup_tokens(self, ids):
+        if isinstance(self.reverse_vocab, ReverseCompactVocab):
+            # a table of the whole vocab would build the python strings a compact vocab avoids,
+            # only the distinct ids of the batch are looked up
+            ids = np.asarray(ids)
+            unique, inverse = np.unique(ids, return_inverse=True)
+            tokens = np.empty(len(unique), dtype=object)
+            tokens[:] = [self.reverse_vocab.get(_id, self.unk_token) for _id in unique.tolist()]
+            return tokens[inverse].reshape(ids.shape)
+        table = self._token_table()
+        unk = len(table) - 1
+        ids = np.asarray(ids)
+        return table[np.where((ids >= 0) & (ids < unk), ids, unk)]
+
     def encode(self, inputs, add_bos=False, add_eos=False, **kwargs):
         tokens = self.tokenize(inputs, **kwargs)
         return self.tokens2ids(tokens, add_bos=add_bos, add_eos=add_eos, **kwargs)
 
+    def count_tokens(self, inputs, **kwargs):
+        """Number of tokens of inputs, subclasses may count without building the tokens."""
+        return len(self.tokenize(inputs, **kwargs))
+
     def decode(self, inputs, drop_bos=True, drop_eos=True, **kwargs):
-        ids = [self.reverse_vocab.get(t, self.unk_token) for t in inputs]
-        if not ids:
-            return []
-        return self.ids2tokens(ids, drop_bos=drop_bos, drop_eos=drop_eos, **kwargs)
+        return self.ids2tokens(inputs, drop_bos=drop_bos, drop_eos=drop_eos, **kwargs)
+
+    def _encode_truncated(self, inputs, max_length=None, truncation=True, add_bos=False, add_eos=False, **kwargs):
+        ids = self.encode(inputs, add_bos=False, add_eos=False, **kwargs)
+        if truncation and max_length is not None:
+            budget = max(max_length - int(add_bos) - int(add_eos), 0)
+            ids = ids[:budget]
+        if add_bos:
+            ids = [self.bos_id] + ids
+        if add_eos:
+            ids = ids + [self.eos_id]
+        return ids
+
+    def _encode_chunk(self, chunk, **kwargs):
+        return [self._encode_truncated(x, **kwargs) for x in chunk]
+
+    def encode_batch(self,
+                     inputs,
+                     max_length=None,
+                     padding=PADDING_LONGEST,
+                     truncation=True,
+                     add_bos=False,
+                     add_eos=False,
+                     pad_id=None,
+                     num_workers=None,
+                     executor='thread',
+                     chunk_size=64,
+                     **kwargs):
+        """Encode a batch of inputs into padded `int32` arrays.
+
+        Args:
+            inputs: A list of texts
+            max_length: Max length of the sequences, including bos and eos
+            padding: `longest` pads to the longest sequence, `max_length` pads to `max_length`
+            truncation: Truncate sequences longer than `max_length`, bos and eos are kept
+            add_bos: Add `bos_id` to the start of every sequence
+            add_eos: Add `eos_id` to the end of every sequence
+            pad_id: The id used for padding, defaults to `pad_id` of this tokenizer
+            num_workers: Encode chunks of inputs in a pool of `num_workers` workers if greater than 1
+            executor: `thread`, `process`, or a pool object that has a `map(fn, iterable)` method.
+                A `process` pool sends this tokenizer to every worker once, a custom pool receives
+                this tokenizer along with every chunk.
+            chunk_size: Number of inputs in a chunk sent to a worker
+
+        Returns:
+            An `EncodedBatch` of (ids, mask, lengths)
+        """
+        inputs = list(inputs)
+        encode_kwargs = dict(max_length=max_length, truncation=truncation, add_bos=add_bos, add_eos=add_eos, **kwargs)
+        if isinstance(executor, str) and (not num_workers or num_workers <= 1 or len(inputs) <= chunk_size):
+            sequences = self._encode_chunk(inputs, **encode_kwargs)
+        else:
+            chunks = [inputs[i:i + chunk_size] for i in range(0, len(inputs), chunk_size)]
+            sequences = []
+            for ids in self._map_chunks(chunks, num_workers, executor, encode_kwargs):
+                sequences.extend(ids)
+        pad_id = self.pad_id if pad_id is None else pad_id
+        return pad_sequences(sequences, pad_id=pad_id, max_length=max_length, padding=padding)
+
+    def _map_chunks(self, chunks, num_workers, executor, encode_kwargs):
+        if isinstance(executor, str):
+            with ChunkPool(self._encode_chunk, num_workers, executor=executor) as pool:
+                return pool.map(chunks, **encode_kwargs)
+        return executor.map(functools.partial(self._encode_chunk, **encode_kwargs), chunks)
+
+    def decode_batch(self, inputs, lengths=None, drop_bos=True, drop_eos=True, drop_pad=True, sep=None, **kwargs):
+        """Decode a batch of id sequences, e.g. the `ids` of `encode_batch` or the output of a model.
+
+        The ids are looked up in an array indexed reverse vocab, and the special ids are dropped by a
+        mask over the whole batch, so only the final split into rows is done in Python.
+
+        Args:
+            inputs: A 2-D array or a list of id lists
+            lengths: (`optional`) Valid length of every sequence
+            drop_bos: Drop the bos tokens, wherever they are in a sequence
+            drop_eos: Drop the eos tokens, wherever they are in a sequence
+            drop_pad: Drop the pad tokens
+            sep: (`optional`) Join the tokens of every sequence by `sep` into a string
+
+        Returns:
+            A list of token lists, or a list of strings if `sep` is set
+        """
+        if isinstance(inputs, np.ndarray):
+            ids = inputs
+            if ids.ndim != 2:
+                raise ValueError('inputs must be a 2-D array, got shape {}'.format(ids.shape))
+            valid = np.ones(ids.shape, dtype=bool)
+        else:
+            ids, valid, _ = pad_sequences(inputs, pad_id=-1, dtype=np.int64)
+            valid = valid.astype(bool)
+        if lengths is not None:
+            lengths = np.asarray(lengths)
+            valid &= np.arange(ids.shape[1])[None, :] < lengths[:, None]
+        special_ids = []
+        for drop, name in [(drop_pad, 'pad_id'), (drop_bos, 'bos_id'), (drop_eos, 'eos_id')]:
+            _id = getattr(self, name, None)
+            if drop and _id is not None:
+                special_ids.append(_id)
+        if special_ids:
+            valid &= ~np.isin(ids, special_ids)
+
+        tokens = self._lookup_tokens(ids[valid]).tolist()
+        ends = np.cumsum(valid.sum(axis=1)).tolist()
+        results = []
+        start = 0
+        for end in ends:
+            row = tokens[start:end]
+            results.append(sep.join(row) if sep is not None else row)
+            start = end
+        return results
 
 
 class CustomTokenizer(VocabBasedTokenizer):
@@ -0,0 +1,99 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .abstract_tokenizer import CustomTokenizer, pad_sequences
+from .transformer_tokenizer import TransformerTokenizer
+
+
+class VocabBasedTokenizerTest(unittest.TestCase):
+
+    def testPadSequences(self):
+        batch = pad_sequences([[1, 2, 3], [4], []], pad_id=0)
+        self.assertEqual(np.int32, batch.ids.dtype)
+        self.assertEqual([[1, 2, 3], [4, 0, 0], [0, 0, 0]], batch.ids.tolist())
+        self.assertEqual([[1, 1, 1], [1, 0, 0], [0, 0, 0]], batch.mask.tolist())
+        self.assertEqual([3, 1, 0], batch.lengths.tolist())
+
+        batch = pad_sequences([[1, 2]], pad_id=9, max_length=4, padding='max_length')
+        self.assertEqual([[1, 2, 9, 9]], batch.ids.tolist())
+
+        with self.assertRaises(ValueError):
+            pad_sequences([[1, 2, 3]], max_length=2, padding='max_length')
+        with self.assertRaises(ValueError):
+            pad_sequences([[1, 2, 3]], padding='xxx')
+
+    def testEncodeBatch(self):
+        tokenizer = TransformerTokenizer(vocab_file='testdata/vocab_chinese.txt', bos_token='<S>', eos_token='<T>')
+        texts = ['我在上海工作', 'hello world', '你好', '']
+        expected = [tokenizer.encode(t, add_bos=True, add_eos=True) for t in texts]
+
+        ids, mask, lengths = tokenizer.encode_batch(texts, add_bos=True, add_eos=True)
+        self.assertEqual(np.int32, ids.dtype)
+        self.assertEqual((4, 8), ids.shape)
+        self.assertEqual([len(x) for x in expected], lengths.tolist())
+        for i, e in enumerate(expected):
+            self.assertEqual(e, ids[i, :lengths[i]].tolist())
+            self.assertEqual([tokenizer.pad_id] * (8 - lengths[i]), ids[i, lengths[i]:].tolist())
+        self.assertEqual(lengths.tolist(), mask.sum(axis=1).tolist())
+
+        ids, mask, lengths = tokenizer.encode_batch(
+            texts, max_length=5, padding='max_length', add_bos=True, add_eos=True)
+        self.assertEqual((4, 5), ids.shape)
+        self.assertEqual([min(len(e), 5) for e in expected], lengths.tolist())
+        self.assertEqual(expected[0][:4] + [tokenizer.eos_id], ids[0].tolist())
+
+        batch = tokenizer.encode_batch(texts * 10, num_workers=2, chunk_size=3)
+        self.assertEqual(tokenizer.encode_batch(texts * 10).ids.tolist(), batch.ids.tolist())
+        batch = tokenizer.encode_batch(texts * 10, num_workers=2, chunk_size=3, executor='process')
+        self.assertEqual(tokenizer.encode_batch(texts * 10).ids.tolist(), batch.ids.tolist())
+        with ThreadPoolExecutor(2) as executor:
+            batch = tokenizer.encode_batch(texts * 10, num_workers=2, chunk_size=3, executor=executor)
+        self.assertEqual(tokenizer.encode_batch(texts * 10).ids.tolist(), batch.ids.tolist())
+
+    def testDecodeBatch(self):
+        tokenizer = CustomTokenizer(vocab_file='testdata/vocab_chinese.txt', tokenize_fn=str.split, bos_token='<S>')
+        batch = tokenizer.encode_batch(['a b c', '上 海'], add_bos=True, add_eos=True)
+        self.assertEqual([['a', 'b', 'c'], ['上', '海']], tokenizer.decode_batch(batch.ids))
+        self.assertEqual(
+            [['<S>', 'a', 'b', 'c', '[EOS]'], ['<S>', '上', '海', '[EOS]']],
+            tokenizer.decode_batch(batch.ids, drop_bos=False, drop_eos=False))
+        self.assertEqual([['a'], []], tokenizer.decode_batch(batch.ids, lengths=[2, 1]))
+        self.assertEqual(['a b c', '上 海'], tokenizer.decode_batch(batch.ids, sep=' '))
+
+        ids = [[tokenizer.bos_id, tokenizer.pad_id, 100000, -1, tokenizer.eos_id], [tokenizer.eos_id], []]
+        self.assertEqual([['[UNK]', '[UNK]'], [], []], tokenizer.decode_batch(ids))
+        self.assertEqual([['[UNK]', '[UNK]', '[EOS]'], ['[EOS]'], []], tokenizer.decode_batch(ids, drop_eos=False))
+        self.assertEqual(
+            [['<S>', '[PAD]', '[UNK]', '[UNK]', '[EOS]'], ['[EOS]'], []],
+            tokenizer.decode_batch(ids, drop_bos=False, drop_eos=False, drop_pad=False))
+
+        # a model may emit eos before the end of a row, every special id is dropped
+        a, b = tokenizer.tokens2ids(['a', 'b'])
+        ids = np.array([[a, tokenizer.eos_id, b, tokenizer.bos_id], [tokenizer.bos_id, a, tokenizer.eos_id, b]])
+        self.assertEqual([['a', 'b'], ['a', 'b']], tokenizer.decode_batch(ids))
+        self.assertEqual([['a', '[EOS]', 'b'], ['a', '[EOS]', 'b']], tokenizer.decode_batch(ids, drop_eos=False))
+
+    def testDecodeBatchCompactVocab(self):
+        tokenizer = CustomTokenizer(vocab_file='testdata/vocab_chinese.txt', tokenize_fn=str.split)
+        compact = CustomTokenizer(vocab_file='testdata/vocab_chinese.txt', tokenize_fn=str.split, compact_vocab=True)
+        batch = tokenizer.encode_batch(['a b c', '上 海 a', 'x'], add_bos=True, add_eos=True)
+        ids = np.concatenate([batch.ids, [[100000, -1, tokenizer.unk_id, 0, 0]]])
+        for kwargs in [{}, {'drop_bos': False, 'drop_eos': False, 'drop_pad': False}]:
+            self.assertEqual(tokenizer.decode_batch(ids, **kwargs), compact.decode_batch(ids, **kwargs))
+        self.assertEqual(tokenizer.ids2tokens(ids[1]), compact.ids2tokens(ids[1]))
+        # no table of the whole vocab is cached
+        self.assertNotIn('_token_table_cache', compact.__dict__)
+
+    def testDecode(self):
+        tokenizer = CustomTokenizer(vocab_file='testdata/vocab_chinese.txt', tokenize_fn=str.split)
+        ids = tokenizer.encode('a b c', add_bos=True, add_eos=True)
+        self.assertEqual(['a', 'b', 'c'], tokenizer.decode(ids))
+        self.assertEqual(['a', 'b', 'c'], tokenizer.decode(np.array(ids)))
+        self.assertEqual(['[BOS]', 'a', 'b', 'c', '[EOS]'], tokenizer.ids2tokens(np.array(ids)))
+        self.assertEqual([], tokenizer.decode([]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -33,6 +33,6 @@ class BertTokenizer(TransformerTokenizer):
             do_lower_case=True,
             do_basic_tokenization=True,
             tokenize_chinese_chars=True,
-            never_split=None,
+            never_split=never_split,
             max_input_chars_per_word=100,
             **kwargs)
@@ -0,0 +1,227 @@
+import functools
+import heapq
+import json
+import re
+
+from naivenlp.structures.lru_cache import LRUCache
+
+from .abstract_tokenizer import VocabBasedTokenizer
+from .tokenizer import AddedTokenMatcher
+from .vocab import CompactVocab
+
+_NON_WHITESPACE = re.compile(r'\S+')
+
+# GPT-2 style pre-tokenization: contractions, letters, digits and other symbols with an optional leading space
+_BYTE_LEVEL_PATTERN = re.compile(r"""'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d+| ?(?:[^\s\w]|_)+|\s+(?!\S)|\s+""")
+
+
+@functools.lru_cache(maxsize=None)
+def bytes_to_unicode():
+    """A map of every byte to a printable unicode char, the printable ascii and latin-1 bytes map to themselves.
+
+    Returns:
+        A dict of byte (int) -> char
+    """
+    bs = list(range(ord('!'), ord('~') + 1)) + list(range(ord('¡'), ord('¬') + 1))
+    bs += list(range(ord('®'), ord('ÿ') + 1))
+    cs = bs[:]
+    n = 0
+    for b in range(256):
+        if b not in bs:
+            bs.append(b)
+            cs.append(256 + n)
+            n += 1
+    return dict(zip(bs, [chr(c) for c in cs]))
+
+
+@functools.lru_cache(maxsize=None)
+def _unicode_to_bytes():
+    return {c: b for b, c in bytes_to_unicode().items()}
+
+
+def load_merges(merges_file):
+    """Load a merges file of one `left right` pair per line, a `#version` header line is skipped.
+
+    Returns:
+        A dict of (left, right) -> rank, lower ranks are merged first
+    """
+    ranks = {}
+    with open(merges_file, mode='rt', encoding='utf8') as fin:
+        for line in fin:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#version'):
+                continue
+            parts = line.split()
+            if len(parts) != 2:
+                raise ValueError('Invalid merge in {}: {}'.format(merges_file, line))
+            pair = tuple(parts)
+            if pair not in ranks:
+                ranks[pair] = len(ranks)
+    return ranks
+
+
+class BPETokenizer(VocabBasedTokenizer):
+
+    def __init__(self,
+                 vocab_file,
+                 merges_file,
+                 byte_level=False,
+                 end_of_word_suffix=None,
+                 do_lower_case=False,
+                 cache_size=10000,
+                 pad_token='[PAD]',
+                 unk_token='[UNK]',
+                 bos_token='[BOS]',
+                 eos_token='[EOS]',
+                 **kwargs):
+        """Constructs a BPETokenizer.
+
+        Args:
+            vocab_file: The vocab file, a text file of one token per line, or a json file of token -> id
+            merges_file: The merges file, one `left right` pair per line, in the order they are merged
+            byte_level: Run BPE on the utf-8 bytes of GPT-2 style pre-tokens, every byte is mapped to a
+                printable char, so no input is unknown. Otherwise run BPE on the chars of whitespace
+                separated words.
+            end_of_word_suffix: (`optional`) Suffix of the last char of a word in char-level mode, e.g. `</w>`
+            do_lower_case: Lower case the text before tokenization
+            cache_size: Size of the LRU cache of word -> tokens, disabled if None or 0
+        """
+        super().__init__(
+            vocab_file, pad_token=pad_token, unk_token=unk_token, bos_token=bos_token, eos_token=eos_token, **kwargs)
+        self.merges_file = merges_file
+        self.bpe_ranks = load_merges(merges_file)
+        self.byte_level = byte_level
+        self.end_of_word_suffix = end_of_word_suffix
+        self.do_lower_case = do_lower_case
+        # special tokens in the text are kept intact
+        self.added_tokens = AddedTokenMatcher(v for _, v in self.special_tokens())
+        self.cache = LRUCache(max_size=cache_size) if cache_size else None
+
+    def _build_vocab(self, file):
+        if not file or not str(file).endswith('.json'):
+            return super()._build_vocab(file)
+        with open(file, mode='rt', encoding='utf8') as fin:
+            vocab = json.load(fin)
+        next_id = max(vocab.values(), default=-1) + 1
+        for _, t in self._special_tokens:
+            if t not in vocab:
+                vocab[t] = next_id
+                next_id += 1
+        if self.compact_vocab:
+            return CompactVocab.from_dict(vocab)
+        return vocab
+
+    def tokenize(self, inputs, **kwargs):
+        tokens = []
+        for piece, is_special in self.added_tokens.iter_split(inputs):
+            if is_special:
+                tokens.append(piece)
+                continue
+            # special tokens are matched before lower casing, e.g. `[PAD]`
+            if self.do_lower_case:
+                piece = piece.lower()
+            for word in self._pre_tokenize(piece):
+                tokens.extend(self._word_tokens(word))
+        return tokens
+
+    def _pre_tokenize(self, text):
+        if self.byte_level:
+            byte_encoder = bytes_to_unicode()
+            for m in _BYTE_LEVEL_PATTERN.finditer(text):
+                yield ''.join(byte_encoder[b] for b in m.group().encode('utf8'))
+        else:
+            for m in _NON_WHITESPACE.finditer(text):
+                yield m.group()
+
+    def _word_tokens(self, word):
+        cache = self.cache
+        if cache is None:
+            return self._bpe_word(word)
+        tokens = cache.get(word)
+        if tokens is None:
+            tokens = self._bpe_word(word)
+            cache.put(word, tokens)
+        return tokens
+
+    def _bpe_word(self, word):
+        symbols = list(word)
+        if self.end_of_word_suffix and not self.byte_level:
+            symbols[-1] += self.end_of_word_suffix
+        vocab, unk_token = self.vocab, self.unk_token
+        return tuple(t if t in vocab else unk_token for t in self.bpe(symbols))
+
+    def bpe(self, symbols):
+        """Merge the symbols of a word by the ranks of the merges.
+
+        The adjacent pairs are kept in a heap of (rank, position), so every merge takes O(log n) instead of
+        a scan of all the pairs. Pairs of the same rank are merged from left to right.
+
+        Args:
+            symbols: A list of the initial symbols, e.g. the chars of a word
+
+        Returns:
+            A list of the merged symbols
+        """
+        symbols = list(symbols)
+        n = len(symbols)
+        if n < 2:
+            return symbols
+        ranks = self.bpe_ranks
+        # a doubly linked list of the alive symbols, a merged symbol is kept at its left position
+        prev = list(range(-1, n - 1))
+        nxt = list(range(1, n + 1))
+        nxt[-1] = -1
+        heap = []
+        for i in range(n - 1):
+            rank = ranks.get((symbols[i], symbols[i + 1]))
+            if rank is not None:
+                heap.append((rank, i, symbols[i], symbols[i + 1]))
+        heapq.heapify(heap)
+
+        while heap:
+            _, i, left, right = heapq.heappop(heap)
+            j = nxt[i]
+            # skip pairs whose symbols were merged into other symbols
+            if j < 0 or symbols[i] != left or symbols[j] != right:
+                continue
+            merged = left + right
+            symbols[i] = merged
+            symbols[j] = None
+            k = nxt[j]
+            nxt[i] = k
+            if k >= 0:
+                prev[k] = i
+                rank = ranks.get((merged, symbols[k]))
+                if rank is not None:
+                    heapq.heappush(heap, (rank, i, merged, symbols[k]))
+            p = prev[i]
+            if p >= 0:
+                rank = ranks.get((symbols[p], merged))
+                if rank is not None:
+                    heapq.heappush(heap, (rank, p, symbols[p], merged))
+        return [s for s in symbols if s is not None]
+
+    def convert_tokens_to_string(self, tokens):
+        """Join tokens back into text.
+
+        Byte-level tokens are mapped back to bytes and decoded as utf-8. In char-level mode the
+        `end_of_word_suffix` is replaced by a space, tokens are separated by spaces if there is no suffix.
+        """
+        if self.byte_level:
+            byte_decoder = _unicode_to_bytes()
+            data = bytearray()
+            for token in tokens:
+                if token in self.added_tokens:
+                    data.extend(token.encode('utf8'))
+                    continue
+                data.extend(byte_decoder[c] for c in token if c in byte_decoder)
+            return data.decode('utf8', errors='replace')
+        if self.end_of_word_suffix:
+            return ''.join(tokens).replace(self.end_of_word_suffix, ' ').strip()
+        return ' '.join(tokens)
+
+    def cache_stats(self):
+        """Counters of the word cache, None if the cache is disabled."""
+        if self.cache is None:
+            return None
+        return self.cache.stats()
@@ -0,0 +1,141 @@
+import json
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+from .bpe_tokenizer import BPETokenizer, bytes_to_unicode, load_merges
+
+
+def _greedy_bpe(symbols, ranks):
+    # the reference algorithm, merges all the occurrences of the lowest ranked pair, then rescans
+    symbols = list(symbols)
+    while len(symbols) > 1:
+        pairs = [(ranks[p], p) for p in zip(symbols, symbols[1:]) if p in ranks]
+        if not pairs:
+            break
+        _, (a, b) = min(pairs)
+        merged, i = [], 0
+        while i < len(symbols):
+            if i + 1 < len(symbols) and symbols[i] == a and symbols[i + 1] == b:
+                merged.append(a + b)
+                i += 2
+            else:
+                merged.append(symbols[i])
+                i += 1
+        symbols = merged
+    return symbols
+
+
+class BPETokenizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, lines):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, mode='wt', encoding='utf8') as fout:
+            for line in lines:
+                fout.write(line + '\n')
+        return path
+
+    def _char_level_tokenizer(self, **kwargs):
+        merges = ['#version: 0.2', 'l o', 'lo w</w>', 'e r</w>', 'n e', 'ne w', 'lo w', 'e s', 'es t</w>']
+        vocab = ['[PAD]', '[UNK]', 'l', 'o', 'w', 'e', 'r', 'n', 's', 't', 'w</w>', 'r</w>', 't</w>',
+                 'lo', 'low</w>', 'er</w>', 'ne', 'new', 'low', 'es', 'est</w>']
+        return BPETokenizer(
+            self._write('vocab.txt', vocab), self._write('merges.txt', merges), end_of_word_suffix='</w>', **kwargs)
+
+    def testLoadMerges(self):
+        ranks = load_merges(self._write('merges.txt', ['#version: 0.2', 'a b', '', 'ab c', 'a b']))
+        self.assertEqual({('a', 'b'): 0, ('ab', 'c'): 1}, ranks)
+        with self.assertRaises(ValueError):
+            load_merges(self._write('bad.txt', ['a b c']))
+
+    def testCharLevel(self):
+        tokenizer = self._char_level_tokenizer()
+        tokens = tokenizer.tokenize('low lower newest lowx')
+        self.assertEqual(['low</w>', 'low', 'er</w>', 'new', 'est</w>', 'low', '[UNK]'], tokens)
+        self.assertEqual([14, 18, 15, 17, 20, 18, 1], tokenizer.encode('low lower newest lowx'))
+        self.assertEqual('low lower newest', tokenizer.convert_tokens_to_string(tokens[:5]))
+        # special tokens are kept intact
+        self.assertEqual(['low</w>', '[PAD]', 'low</w>'], tokenizer.tokenize('low[PAD] low'))
+
+    def testLowerCase(self):
+        tokenizer = self._char_level_tokenizer(do_lower_case=True)
+        # special tokens are matched before lower casing
+        self.assertEqual(['low</w>', '[PAD]', 'low</w>'], tokenizer.tokenize('LOW [PAD] Low'))
+        self.assertEqual(['new', 'est</w>', '[UNK]'], tokenizer.tokenize('NEWEST[UNK]'))
+
+    def testCache(self):
+        tokenizer = self._char_level_tokenizer(cache_size=2)
+        for _ in range(3):
+            tokenizer.tokenize('low lower')
+        stats = tokenizer.cache_stats()
+        self.assertEqual(4, stats['hits'])
+        self.assertEqual(2, stats['misses'])
+        tokenizer.tokenize('newest')
+        self.assertEqual(1, tokenizer.cache_stats()['evictions'])
+        self.assertIsNone(self._char_level_tokenizer(cache_size=None).cache_stats())
+
+        restored = pickle.loads(pickle.dumps(tokenizer))
+        self.assertEqual(0, len(restored.cache))
+        self.assertEqual(tokenizer.tokenize('low lower newest'), restored.tokenize('low lower newest'))
+
+    def testHeapMerges(self):
+        rng = random.Random(7)
+        chars = 'abcd'
+        ranks = {}
+        symbols = list(chars)
+        while len(ranks) < 60:
+            pair = rng.choice(symbols), rng.choice(symbols)
+            if pair not in ranks:
+                ranks[pair] = len(ranks)
+                symbols.append(''.join(pair))
+        tokenizer = self._char_level_tokenizer()
+        tokenizer.bpe_ranks = ranks
+        for _ in range(500):
+            word = [rng.choice(chars) for _ in range(rng.randint(0, 30))]
+            self.assertEqual(_greedy_bpe(word, ranks), tokenizer.bpe(word))
+
+    def testByteLevel(self):
+        byte_encoder = bytes_to_unicode()
+        self.assertEqual(256, len(set(byte_encoder.values())))
+        space = byte_encoder[ord(' ')]
+        vocab = {c: i for i, c in enumerate(sorted(byte_encoder.values()))}
+        merges = ['h e', 'l l', 'he ll', 'hell o', space + ' w', space + 'w o', space + 'wo r', space + 'wor l',
+                  space + 'worl d']
+        for merge in merges:
+            vocab[merge.replace(' ', '')] = len(vocab)
+        vocab['<|endoftext|>'] = len(vocab)
+        tokenizer = BPETokenizer(
+            self._write('vocab.json', [json.dumps(vocab)]), self._write('merges.txt', merges), byte_level=True,
+            eos_token='<|endoftext|>')
+        # the missing special tokens are appended
+        self.assertEqual(len(vocab) + 3, tokenizer.vocab_size)
+        self.assertEqual(len(vocab) + 1, tokenizer.unk_id)
+        self.assertEqual(vocab['<|endoftext|>'], tokenizer.eos_id)
+
+        text = "hello world, it's 2020!  你好<|endoftext|>"
+        tokens = tokenizer.tokenize(text)
+        self.assertEqual(['hello', space + 'world', ','], tokens[:3])
+        self.assertEqual('<|endoftext|>', tokens[-1])
+        self.assertNotIn(None, tokenizer.encode(text))
+        self.assertEqual(text, tokenizer.convert_tokens_to_string(tokens))
+        decoded = tokenizer.decode(tokenizer.encode(text), drop_eos=False)
+        self.assertEqual(text, tokenizer.convert_tokens_to_string(decoded))
+
+    def testCompiled(self):
+        tokenizer = self._char_level_tokenizer()
+        path = os.path.join(self.tmp_dir.name, 'bpe.bin')
+        tokenizer.save_compiled(path)
+        restored = BPETokenizer.load_compiled(path)
+        self.assertEqual(tokenizer.encode('low lower newest'), restored.encode('low lower newest'))
+
+
+if __name__ == "__main__":
+    unittest.main()
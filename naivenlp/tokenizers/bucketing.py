@@ -0,0 +1,175 @@
+"""Length-bucketed dynamic batching.
+
+Padding every batch to its longest sequence wastes the compute spent on the padding positions when
+the lengths vary a lot. Here the encoded sequences are sorted by length and cut into batches whose
+padded size, i.e. `batch_size * longest_length`, stays under a token budget, so short sequences are
+batched together in large batches and long sequences in small ones.
+"""
+import collections
+
+import numpy as np
+
+from .abstract_tokenizer import pad_sequences
+
+Bucket = collections.namedtuple('Bucket', ['ids', 'type_ids', 'mask', 'lengths', 'indices'])
+
+
+def truncate_longest_first(length_a, length_b, budget):
+    """Lengths of a pair of sequences after removing one token at a time from the longer one.
+
+    Args:
+        length_a: Length of the first sequence
+        length_b: Length of the second sequence
+        budget: Max total length of the pair
+
+    Returns:
+        A tuple of the truncated lengths
+    """
+    budget = max(budget, 0)
+    excess = length_a + length_b - budget
+    if excess <= 0:
+        return length_a, length_b
+    # trim the longer one down to the shorter one, then trim both in turns, the second one first
+    diff = abs(length_a - length_b)
+    first = min(excess, diff)
+    if length_a > length_b:
+        length_a -= first
+    else:
+        length_b -= first
+    rest = excess - first
+    length_b -= (rest + 1) // 2
+    length_a -= rest // 2
+    return length_a, length_b
+
+
+def _special_ids(tokenizer):
+    cls_id, sep_id = getattr(tokenizer, 'cls_id', None), getattr(tokenizer, 'sep_id', None)
+    if cls_id is not None and sep_id is not None:
+        return cls_id, sep_id
+    return tokenizer.bos_id, tokenizer.eos_id
+
+
+def encode_pair(tokenizer, text, text_pair=None, max_length=None, truncation=True, add_special_tokens=True, **kwargs):
+    """Encode a text, or a pair of texts, into `[CLS] a [SEP]` or `[CLS] a [SEP] b [SEP]`.
+
+    Tokenizers without `cls_token` and `sep_token` use `bos_token` and `eos_token` instead.
+
+    Args:
+        tokenizer: A `VocabBasedTokenizer`, e.g. a `BertTokenizer`
+        text: The first text
+        text_pair: (`optional`) The second text
+        max_length: Max length of the ids, including the special tokens
+        truncation: Truncate the longer text first until the pair fits into `max_length`
+        add_special_tokens: Add the cls and sep tokens
+
+    Returns:
+        A tuple of (ids, type_ids), type ids are 0 for the first text and 1 for the second text
+    """
+    a = tokenizer.encode(text, **kwargs)
+    b = tokenizer.encode(text_pair, **kwargs) if text_pair is not None else None
+    num_special = (3 if b is not None else 2) if add_special_tokens else 0
+    if truncation and max_length is not None:
+        length_a, length_b = truncate_longest_first(len(a), len(b) if b is not None else 0, max_length - num_special)
+        a = a[:length_a]
+        if b is not None:
+            b = b[:length_b]
+
+    if add_special_tokens:
+        cls_id, sep_id = _special_ids(tokenizer)
+        ids = [cls_id] + a + [sep_id]
+    else:
+        ids = list(a)
+    type_ids = [0] * len(ids)
+    if b is not None:
+        second = b + [sep_id] if add_special_tokens else b
+        ids += second
+        type_ids += [1] * len(second)
+    return ids, type_ids
+
+
+def bucket_by_length(tokenizer,
+                     inputs,
+                     inputs_pair=None,
+                     max_tokens=4096,
+                     max_length=512,
+                     max_batch_size=None,
+                     truncation=True,
+                     add_special_tokens=True,
+                     pad_id=None,
+                     **kwargs):
+    """Encode texts, or pairs of texts, into batches of similar lengths under a token budget.
+
+    Args:
+        tokenizer: A `VocabBasedTokenizer`, e.g. a `BertTokenizer`
+        inputs: A list of texts
+        inputs_pair: (`optional`) A list of second texts, of the same size as `inputs`
+        max_tokens: Max number of tokens of a batch, padding included. A sequence longer than
+            `max_tokens` is put into a batch of its own.
+        max_length: Max length of a sequence, including the special tokens
+        max_batch_size: (`optional`) Max number of sequences of a batch
+        truncation: Truncate sequences longer than `max_length`, the longer text of a pair first
+        add_special_tokens: Add the cls and sep tokens
+        pad_id: The id used for padding, defaults to `pad_id` of the tokenizer
+
+    Returns:
+        A tuple of (buckets, permutation). Buckets are `Bucket`s of (ids, type_ids, mask, lengths, indices),
+        `indices` are the positions of the rows in `inputs`. `permutation` is the concatenation of the
+        indices of all buckets, see `restore_order`.
+    """
+    inputs = list(inputs)
+    if inputs_pair is not None:
+        inputs_pair = list(inputs_pair)
+        if len(inputs_pair) != len(inputs):
+            raise ValueError('inputs_pair has {} texts, but inputs has {}.'.format(len(inputs_pair), len(inputs)))
+    if max_tokens <= 0:
+        raise ValueError('max_tokens must be positive, got {}'.format(max_tokens))
+    pad_id = tokenizer.pad_id if pad_id is None else pad_id
+
+    sequences, segments = [], []
+    for i, text in enumerate(inputs):
+        ids, type_ids = encode_pair(
+            tokenizer,
+            text,
+            inputs_pair[i] if inputs_pair is not None else None,
+            max_length=max_length,
+            truncation=truncation,
+            add_special_tokens=add_special_tokens,
+            **kwargs)
+        sequences.append(ids)
+        segments.append(type_ids)
+
+    lengths = np.fromiter((len(x) for x in sequences), dtype=np.int64, count=len(sequences))
+    order = np.argsort(lengths, kind='stable')
+
+    buckets = []
+    start = 0
+    sorted_lengths = lengths[order].tolist()
+    while start < len(order):
+        end = start + 1
+        # lengths are ascending, so the padded size of [start, end) is (end - start) * sorted_lengths[end - 1]
+        while end < len(order) and (end + 1 - start) * sorted_lengths[end] <= max_tokens:
+            if max_batch_size is not None and end - start >= max_batch_size:
+                break
+            end += 1
+        indices = order[start:end]
+        batch = pad_sequences([sequences[i] for i in indices], pad_id=pad_id)
+        type_ids = pad_sequences([segments[i] for i in indices], pad_id=0).ids
+        buckets.append(Bucket(ids=batch.ids, type_ids=type_ids, mask=batch.mask, lengths=batch.lengths, indices=indices))
+        start = end
+    return buckets, order
+
+
+def restore_order(outputs, permutation):
+    """Put the rows of outputs in bucket order back into the order of the inputs.
+
+    Args:
+        outputs: A list, or an array, of per row outputs of all buckets, concatenated in bucket order
+        permutation: The permutation returned by `bucket_by_length`
+
+    Returns:
+        A list, or an array if outputs is an array, in the order of the inputs
+    """
+    inverse = np.argsort(permutation, kind='stable')
+    if isinstance(outputs, np.ndarray):
+        return outputs[inverse]
+    return [outputs[i] for i in inverse.tolist()]
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from .bert_tokenizer import BertTokenizer
+from .bucketing import bucket_by_length, encode_pair, restore_order, truncate_longest_first
+from .transformer_tokenizer import TransformerTokenizer
+
+
+class BucketingTest(unittest.TestCase):
+
+    def testTruncateLongestFirst(self):
+        for la in range(8):
+            for lb in range(8):
+                for budget in range(-1, 17):
+                    a, b = la, lb
+                    while a + b > max(budget, 0):
+                        if a > b:
+                            a -= 1
+                        else:
+                            b -= 1
+                    self.assertEqual((a, b), truncate_longest_first(la, lb, budget))
+
+    def testEncodePair(self):
+        tokenizer = BertTokenizer('testdata/vocab_chinese.txt')
+        a = tokenizer.encode('我爱北京天安门')
+        b = tokenizer.encode('hello')
+        ids, type_ids = encode_pair(tokenizer, '我爱北京天安门', 'hello')
+        self.assertEqual([tokenizer.cls_id] + a + [tokenizer.sep_id] + b + [tokenizer.sep_id], ids)
+        self.assertEqual([0] * (len(a) + 2) + [1] * (len(b) + 1), type_ids)
+
+        ids, type_ids = encode_pair(tokenizer, '我爱北京天安门', 'hello', max_length=8)
+        self.assertEqual([tokenizer.cls_id] + a[:4] + [tokenizer.sep_id] + b[:1] + [tokenizer.sep_id], ids)
+        self.assertEqual([0] * 6 + [1] * 2, type_ids)
+
+        tokenizer = TransformerTokenizer('testdata/vocab_chinese.txt')
+        ids, type_ids = encode_pair(tokenizer, '我爱北京', max_length=4)
+        self.assertEqual([tokenizer.bos_id] + a[:2] + [tokenizer.eos_id], ids)
+        self.assertEqual([0] * 4, type_ids)
+
+    def testBucketByLength(self):
+        tokenizer = BertTokenizer('testdata/vocab_chinese.txt')
+        texts = ['我爱北京天安门' * n for n in [5, 1, 3, 1, 8, 2, 1, 4]]
+        buckets, permutation = bucket_by_length(tokenizer, texts, max_tokens=64, max_length=40)
+        self.assertEqual(sorted(permutation.tolist()), list(range(len(texts))))
+
+        rows = []
+        for bucket in buckets:
+            self.assertEqual(bucket.ids.shape, bucket.type_ids.shape)
+            self.assertTrue(bucket.ids.size <= 64 or len(bucket.indices) == 1)
+            self.assertEqual(bucket.lengths.max(), bucket.ids.shape[1])
+            rows.extend(bucket.ids[i, :n].tolist() for i, n in enumerate(bucket.lengths))
+        expected = [encode_pair(tokenizer, t, max_length=40)[0] for t in texts]
+        self.assertEqual(expected, restore_order(rows, permutation))
+        self.assertEqual(
+            [len(e) for e in expected],
+            restore_order(np.concatenate([b.lengths for b in buckets]), permutation).tolist())
+
+        buckets, _ = bucket_by_length(tokenizer, texts, max_tokens=10000, max_batch_size=3)
+        self.assertEqual([3, 3, 2], [len(b.indices) for b in buckets])
+
+        buckets, permutation = bucket_by_length(tokenizer, texts[:2], inputs_pair=['hello', '世界'], max_tokens=128)
+        self.assertEqual(1, len(buckets))
+        self.assertEqual(1, buckets[0].type_ids.max())
+        with self.assertRaises(ValueError):
+            bucket_by_length(tokenizer, texts, inputs_pair=['hello'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Precompiled tokenizer snapshots.
+
+A snapshot is a single file:
+
+    magic (8 bytes) | version (uint32) | reserved (uint32) | header size (uint64) | header (json)
+    | vocab section (a `CompactVocab`, 8 bytes aligned) | state section (pickle, 8 bytes aligned)
+
+The header records the class of the tokenizer and the offset and size of every section. The vocab
+arrays are used in place from a read-only mmap, the remaining state, e.g. the word piece matcher,
+is restored by a single `pickle.loads`, so nothing is parsed again from the text vocab file.
+
+Loading a snapshot unpickles it, and unpickling can run arbitrary code: only load snapshots from a
+trusted source, e.g. files you saved yourself.
+"""
+import importlib
+import json
+import mmap
+import pickle
+import struct
+
+from .vocab import CompactVocab
+
+MAGIC = b'NNLPTOKC'
+VERSION = 1
+
+_PREFIX = struct.Struct('<8sIIQ')
+
+
+def _align(n, alignment=8):
+    return (n + alignment - 1) // alignment * alignment
+
+
+def save_compiled(tokenizer, path):
+    """Save the ready-to-use state of a `VocabBasedTokenizer` into a snapshot file."""
+    vocab = tokenizer.vocab
+    if not isinstance(vocab, CompactVocab):
+        vocab = CompactVocab.from_dict(vocab)
+    vocab_bytes = vocab.to_bytes()
+    state_bytes = pickle.dumps(tokenizer._compiled_state(), protocol=pickle.HIGHEST_PROTOCOL)
+
+    cls = type(tokenizer)
+    header = {
+        'class': '{}:{}'.format(cls.__module__, cls.__qualname__),
+        'sections': {},
+    }
+    # offsets of the sections are relative to the end of the header
+    pos = 0
+    for name, data in [('vocab', vocab_bytes), ('state', state_bytes)]:
+        header['sections'][name] = [pos, len(data)]
+        pos = _align(pos + len(data))
+    header_bytes = json.dumps(header).encode('utf8')
+    data_start = _align(_PREFIX.size + len(header_bytes))
+
+    with open(path, mode='wb') as fout:
+        fout.write(_PREFIX.pack(MAGIC, VERSION, 0, len(header_bytes)))
+        fout.write(header_bytes)
+        for name, data in [('vocab', vocab_bytes), ('state', state_bytes)]:
+            fout.write(b'\0' * (data_start + header['sections'][name][0] - fout.tell()))
+            fout.write(data)
+
+
+def read_header(buffer):
+    """Read the header of a snapshot, the section offsets are converted to absolute offsets."""
+    magic, version, _, header_size = _PREFIX.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError('Invalid compiled tokenizer: bad magic {}'.format(magic))
+    if version != VERSION:
+        raise ValueError('Unsupported compiled tokenizer version: {}'.format(version))
+    header = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size + header_size]).decode('utf8'))
+    data_start = _align(_PREFIX.size + header_size)
+    for name, (offset, size) in header['sections'].items():
+        header['sections'][name] = [data_start + offset, size]
+    return header
+
+
+def load_compiled(path, base_class=None):
+    """Load a snapshot saved by `save_compiled`.
+
+    The state section is restored by `pickle.loads`, which can run arbitrary code. Never load a
+    snapshot from an untrusted source.
+
+    Args:
+        path: The snapshot file
+        base_class: (`optional`) The loaded tokenizer must be an instance of this class
+
+    Returns:
+        The tokenizer, its vocab is a `CompactVocab` backed by a read-only mmap of the file. The vocab
+        pickles as a reference to the file, so worker processes map the same pages.
+    """
+    with open(path, mode='rb') as fin:
+        buffer = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+    header = read_header(buffer)
+
+    module_name, qualname = header['class'].split(':')
+    cls = importlib.import_module(module_name)
+    for name in qualname.split('.'):
+        cls = getattr(cls, name)
+    if base_class is not None and not issubclass(cls, base_class):
+        raise TypeError('{} is a snapshot of {}, not of {}'.format(path, cls.__name__, base_class.__name__))
+
+    offset, _ = header['sections']['vocab']
+    vocab = CompactVocab.from_buffer(buffer, offset)
+    vocab.path = path
+    vocab.offset = offset
+    offset, size = header['sections']['state']
+    state = pickle.loads(buffer[offset:offset + size])
+
+    tokenizer = cls.__new__(cls)
+    tokenizer._restore_compiled_state(state, vocab)
+    return tokenizer
@@ -0,0 +1,79 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from .abstract_tokenizer import CustomTokenizer, VocabBasedTokenizer
+from .bert_tokenizer import BertTokenizer
+from .compiled import read_header
+from .jieba_tokenizer import JiebaTokenizer
+from .transformer_tokenizer import TransformerTokenizer
+from .vocab import CompactVocab
+
+
+class CompiledTokenizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'tokenizer.bin')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def testBertTokenizer(self):
+        tokenizer = BertTokenizer(vocab_file='testdata/vocab_chinese.txt', bos_token='<S>', eos_token='</S>')
+        tokenizer.save_compiled(self.path)
+        with open(self.path, mode='rb') as fin:
+            header = read_header(fin.read())
+        self.assertEqual('naivenlp.tokenizers.bert_tokenizer:BertTokenizer', header['class'])
+
+        loaded = BertTokenizer.load_compiled(self.path)
+        self.assertIsInstance(loaded, BertTokenizer)
+        self.assertIsInstance(loaded.vocab, CompactVocab)
+        self.assertIs(loaded.vocab, loaded.wordpiece_tokenizer.vocab)
+        for name in ['pad_id', 'unk_id', 'bos_id', 'eos_id', 'cls_id', 'sep_id', 'mask_id', 'vocab_size']:
+            self.assertEqual(getattr(tokenizer, name), getattr(loaded, name))
+        text = 'Hello World, 你好世界! unaffable https://example.com'
+        self.assertEqual(
+            tokenizer.encode(text, add_bos=True, add_eos=True), loaded.encode(text, add_bos=True, add_eos=True))
+        ids = tokenizer.encode(text)
+        self.assertEqual(tokenizer.ids2tokens(ids), loaded.ids2tokens(ids))
+
+        # the mapped vocab pickles as a reference to the snapshot
+        self.assertEqual(self.path, loaded.vocab.path)
+        self.assertLess(len(pickle.dumps(loaded.vocab)), 1024)
+        unpickled = pickle.loads(pickle.dumps(loaded))
+        self.assertEqual(self.path, unpickled.vocab.path)
+        self.assertEqual(loaded.encode(text), unpickled.encode(text))
+
+        self.assertIsInstance(VocabBasedTokenizer.load_compiled(self.path), BertTokenizer)
+        with self.assertRaises(TypeError):
+            JiebaTokenizer.load_compiled(self.path)
+
+    def testOtherTokenizers(self):
+        tokenizer = TransformerTokenizer(vocab_file='testdata/vocab_chinese.txt', wordpiece_cache_size=10)
+        tokenizer.tokenize('hello world')
+        tokenizer.save_compiled(self.path)
+        loaded = TransformerTokenizer.load_compiled(self.path)
+        self.assertEqual(0, loaded.wordpiece_cache_stats()['size'])
+        self.assertEqual(tokenizer.tokenize('hello world'), loaded.tokenize('hello world'))
+
+        tokenizer = JiebaTokenizer(vocab_file='testdata/vocab_chinese.txt')
+        tokenizer.save_compiled(self.path)
+        loaded = JiebaTokenizer.load_compiled(self.path)
+        self.assertEqual(tokenizer.encode('我在上海工作'), loaded.encode('我在上海工作'))
+
+        tokenizer = CustomTokenizer(vocab_file='testdata/vocab_chinese.txt', tokenize_fn=str.split)
+        tokenizer.save_compiled(self.path)
+        loaded = CustomTokenizer.load_compiled(self.path)
+        self.assertEqual(tokenizer.encode('上 海 x'), loaded.encode('上 海 x'))
+
+    def testInvalidFile(self):
+        with open(self.path, mode='wb') as fout:
+            fout.write(b'x' * 64)
+        with self.assertRaises(ValueError):
+            BertTokenizer.load_compiled(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
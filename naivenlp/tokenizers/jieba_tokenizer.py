@@ -3,6 +3,8 @@ import os
 
 import jieba
 
+from naivenlp.utils.parallel import ChunkPool
+
 from .abstract_tokenizer import AbstractTokenizer, VocabBasedTokenizer
 
 ACCURATE_MODE = 0
@@ -15,11 +17,22 @@ class JiebaTokenizer(VocabBasedTokenizer):
     def __init__(self,
                  vocab_file,
                  userdict_files=None,
+                 dictionary=None,
                  pad_token='[PAD]',
                  unk_token='[UNK]',
                  bos_token='[BOS]',
                  eos_token='[EOS]',
                  **kwargs):
+        """Constructs a JiebaTokenizer.
+
+        Every instance owns a private `jieba.Tokenizer`, so instances with different dictionaries
+        do not interfere with each other or with jieba's global tokenizer.
+
+        Args:
+            vocab_file: The vocab file
+            userdict_files: (`optional`) User dict files loaded into the private jieba tokenizer
+            dictionary: (`optional`) The main dictionary of jieba, defaults to jieba's built-in dictionary
+        """
         super().__init__(
             vocab_file,
             pad_token=pad_token,
@@ -27,22 +40,92 @@ class JiebaTokenizer(VocabBasedTokenizer):
             bos_token=bos_token,
             eos_token=eos_token,
             **kwargs)
-        jieba.initialize()
-        if userdict_files:
-            for f in userdict_files:
+        self.userdict_files = userdict_files
+        self.dictionary = dictionary
+        self._pool = None
+        self.jieba = self._build_jieba()
+
+    def _build_jieba(self):
+        tokenizer = jieba.Tokenizer(dictionary=self.dictionary)
+        # the dictionary model is cached on disk by jieba, later instances load it from the cache
+        tokenizer.initialize()
+        if self.userdict_files:
+            for f in self.userdict_files:
                 if not os.path.exists(f):
                     logging.warning('Load userdict: {} failed. File does not exist. Skipped.'.format(f))
                     continue
                 with open(f, mode='rt', encoding='utf8') as fin:
-                    jieba.load_userdict(fin)
+                    tokenizer.load_userdict(fin)
                     logging.info('Load userdict: {} finished.'.format(f))
+        return tokenizer
 
     def tokenize(self, inputs, mode=ACCURATE_MODE, hmm=True, **kwargs):
         if mode == ACCURATE_MODE:
-            return [t for t in jieba.cut(inputs, cut_all=False, HMM=hmm)]
+            return [t for t in self.jieba.cut(inputs, cut_all=False, HMM=hmm)]
         elif mode == FULL_MODE:
-            return [t for t in jieba.cut(inputs, cut_all=True, HMM=hmm)]
+            return [t for t in self.jieba.cut(inputs, cut_all=True, HMM=hmm)]
         elif mode == SEARCH_MODE:
-            return [t for t in jieba.cut_for_search(inputs, HMM=hmm)]
+            return [t for t in self.jieba.cut_for_search(inputs, HMM=hmm)]
         else:
             raise ValueError('Invalid mode: {}'.format(mode))
+
+    def tokenize_batch(self, inputs, mode=ACCURATE_MODE, hmm=True, num_workers=None, chunk_size=64, **kwargs):
+        """Tokenize a batch of inputs.
+
+        Args:
+            inputs: A list of texts
+            mode: Tokenization mode, one of `ACCURATE_MODE`, `FULL_MODE` and `SEARCH_MODE`
+            hmm: Use HMM for unknown words
+            num_workers: Segment in a pool of `num_workers` processes if greater than 1. The pool is
+                created on first use and reused by later calls, call `close()` or use this tokenizer as a
+                context manager to shut it down.
+            chunk_size: Number of inputs in a chunk sent to a worker
+
+        Returns:
+            A list of token lists
+        """
+        inputs = list(inputs)
+        if not num_workers or num_workers <= 1 or len(inputs) <= chunk_size:
+            return [self.tokenize(x, mode=mode, hmm=hmm, **kwargs) for x in inputs]
+        if mode not in [ACCURATE_MODE, FULL_MODE, SEARCH_MODE]:
+            raise ValueError('Invalid mode: {}'.format(mode))
+        pool = self._get_pool(num_workers)
+        chunks = [inputs[i:i + chunk_size] for i in range(0, len(inputs), chunk_size)]
+        results = []
+        for tokens in pool.map(chunks, mode=mode, hmm=hmm, **kwargs):
+            results.extend(tokens)
+        return results
+
+    def _tokenize_chunk(self, chunk, **kwargs):
+        return [self.tokenize(x, **kwargs) for x in chunk]
+
+    def _get_pool(self, num_workers):
+        if self._pool is not None and self._pool.num_workers != num_workers:
+            self.close()
+        if self._pool is None:
+            # the workers receive this tokenizer once, the pool is terminated when this tokenizer is collected
+            self._pool = ChunkPool(self._tokenize_chunk, num_workers)
+        return self._pool
+
+    def close(self):
+        """Shut down the worker pool of `tokenize_batch`, if any."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # jieba tokenizers hold locks, and pools can not be shared, both are rebuilt by the receiver
+        state.pop('jieba', None)
+        state['_pool'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.jieba = self._build_jieba()
@@ -1,3 +1,6 @@
+import os
+import pickle
+import tempfile
 import unittest
 
 import jieba
@@ -5,6 +8,12 @@ import jieba
 from .jieba_tokenizer import ACCURATE_MODE, FULL_MODE, SEARCH_MODE, JiebaTokenizer
 
 
+class _CutAllTokenizer(JiebaTokenizer):
+
+    def tokenize(self, inputs, cut_all=False, **kwargs):
+        return list(self.jieba.cut(inputs, cut_all=cut_all))
+
+
 class JiebaTokenizerTest(unittest.TestCase):
 
     def testTokenize(self):
@@ -42,6 +51,44 @@ class JiebaTokenizerTest(unittest.TestCase):
                 [t for t in jieba.cut_for_search(sent, HMM=False)],
                 tokenizer.tokenize(sent, mode=SEARCH_MODE, hmm=False))
 
+    def testPrivateDictionaries(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            userdict = os.path.join(tmp_dir, 'userdict.txt')
+            with open(userdict, mode='wt', encoding='utf8') as fout:
+                fout.write('拍卖完了 100000\n')
+            custom = JiebaTokenizer(vocab_file='testdata/vocab_chinese.txt', userdict_files=[userdict])
+            default = JiebaTokenizer(vocab_file='testdata/vocab_chinese.txt')
+            # the receiver loads the user dicts again
+            unpickled = pickle.loads(pickle.dumps(custom))
+
+        sent = '乒乓球拍卖完了'
+        self.assertIn('拍卖完了', custom.tokenize(sent))
+        self.assertNotIn('拍卖完了', default.tokenize(sent))
+        self.assertEqual([t for t in jieba.cut(sent)], default.tokenize(sent))
+        self.assertEqual(custom.tokenize(sent), unpickled.tokenize(sent))
+
+    def testTokenizeBatch(self):
+        tokenizer = JiebaTokenizer(vocab_file='testdata/vocab_chinese.txt')
+        sentences = ['我在上海工作', '我来到北京清华大学', '乒乓球拍卖完了', '中国科学技术大学'] * 10
+        try:
+            for mode in [ACCURATE_MODE, FULL_MODE, SEARCH_MODE]:
+                expected = [tokenizer.tokenize(s, mode=mode) for s in sentences]
+                self.assertEqual(expected, tokenizer.tokenize_batch(sentences, mode=mode))
+                self.assertEqual(expected, tokenizer.tokenize_batch(sentences, mode=mode, num_workers=2, chunk_size=4))
+        finally:
+            tokenizer.close()
+
+    def testTokenizeBatchKwargs(self):
+        sentences = ['我在上海工作', '乒乓球拍卖完了'] * 10
+        with _CutAllTokenizer(vocab_file='testdata/vocab_chinese.txt') as tokenizer:
+            expected = [tokenizer.tokenize(s, cut_all=True) for s in sentences]
+            self.assertNotEqual([tokenizer.tokenize(s) for s in sentences], expected)
+            # keyword arguments reach the workers
+            self.assertEqual(expected, tokenizer.tokenize_batch(sentences, num_workers=2, chunk_size=4, cut_all=True))
+            pool = tokenizer._pool
+        self.assertIsNone(tokenizer._pool)
+        self.assertFalse(pool._finalizer.alive)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,123 @@
+"""Linear-time WordPiece matching.
+
+Implements the LinMaxMatch algorithm of `Fast WordPiece Tokenization` (Song et al., 2021).
+The vocab is compiled into two tries, one for the tokens at the start of a word and one for
+the suffix tokens (without the `##` indicator), and every node gets a failure link and the
+tokens to pop when following it. Matching a word then visits every character a constant
+number of times (amortized), while giving the same result as the greedy longest-match-first
+algorithm of `WordpieceTokenizer`.
+"""
+import collections
+
+ROOT = 0
+SUFFIX_ROOT = 1
+_NULL = -1
+
+
+class LinMaxMatcher(object):
+    """Compiled WordPiece matcher."""
+
+    def __init__(self, vocab, suffix_indicator='##'):
+        self.suffix_indicator = suffix_indicator
+        # node 0 is the root of the prefix trie, node 1 is the root of the suffix trie
+        self.children = [{}, {}]
+        self.tokens = [None, None]
+
+        for token in vocab:
+            if not token:
+                continue
+            if token.startswith(suffix_indicator):
+                # the suffix indicator itself is never matched by the greedy algorithm
+                if len(token) > len(suffix_indicator):
+                    self._insert(SUFFIX_ROOT, token[len(suffix_indicator):], token)
+            else:
+                self._insert(ROOT, token, token)
+
+        self.fail = [_NULL] * len(self.children)
+        self.pops = [()] * len(self.children)
+        self._build_failure_links()
+
+    def _insert(self, root, chars, token):
+        node = root
+        for c in chars:
+            nxt = self.children[node].get(c)
+            if nxt is None:
+                nxt = len(self.children)
+                self.children.append({})
+                self.tokens.append(None)
+                self.children[node][c] = nxt
+            node = nxt
+        self.tokens[node] = token
+
+    def _build_failure_links(self):
+        children, tokens, fail, pops = self.children, self.tokens, self.fail, self.pops
+        queue = collections.deque([ROOT, SUFFIX_ROOT])
+        while queue:
+            u = queue.popleft()
+            for c, v in children[u].items():
+                queue.append(v)
+                if tokens[v] is not None:
+                    fail[v] = SUFFIX_ROOT
+                    pops[v] = (tokens[v],)
+                    continue
+                z = fail[u]
+                popped = pops[u]
+                while z != _NULL and c not in children[z]:
+                    popped = popped + pops[z]
+                    z = fail[z]
+                pops[v] = popped
+                if z != _NULL:
+                    fail[v] = children[z][c]
+
+    @property
+    def num_nodes(self):
+        return len(self.children)
+
+    def match(self, word):
+        """Split a word into word pieces.
+
+        Args:
+            word: A single word, without whitespaces
+
+        Returns:
+            A list of word pieces, or None if the word can not be tokenized by the vocab.
+        """
+        children, fail, pops = self.children, self.fail, self.pops
+        output = []
+        u = ROOT
+        for c in word:
+            nxt = children[u].get(c)
+            while nxt is None:
+                if fail[u] == _NULL:
+                    return None
+                output.extend(pops[u])
+                u = fail[u]
+                nxt = children[u].get(c)
+            u = nxt
+        while u != SUFFIX_ROOT:
+            if fail[u] == _NULL:
+                return None
+            output.extend(pops[u])
+            u = fail[u]
+        return output
+
+    def count(self, word):
+        """Number of word pieces of a word, None if the word can not be tokenized by the vocab."""
+        children, fail, pops = self.children, self.fail, self.pops
+        count = 0
+        u = ROOT
+        for c in word:
+            nxt = children[u].get(c)
+            while nxt is None:
+                if fail[u] == _NULL:
+                    return None
+                count += len(pops[u])
+                u = fail[u]
+                nxt = children[u].get(c)
+            u = nxt
+        while u != SUFFIX_ROOT:
+            if fail[u] == _NULL:
+                return None
+            count += len(pops[u])
+            u = fail[u]
+        return count
@@ -0,0 +1,49 @@
+import random
+import unittest
+
+from .linmaxmatch import LinMaxMatcher
+from .tokenizer import WordpieceTokenizer, load_vocab
+
+
+class LinMaxMatcherTest(unittest.TestCase):
+
+    def testMatch(self):
+        matcher = LinMaxMatcher(['a', 'abcdx', '##b', '##bc', '##c', '##cdy', '##dz', '##z'])
+        self.assertEqual(['a', '##bc', '##dz'], matcher.match('abcdz'))
+        self.assertEqual(['a', '##bc', '##z'], matcher.match('abcz'))
+        self.assertEqual(['a', '##bc'], matcher.match('abc'))
+        self.assertEqual(['abcdx'], matcher.match('abcdx'))
+        self.assertIsNone(matcher.match('abcd'))
+        self.assertIsNone(matcher.match('b'))
+        self.assertEqual(3, matcher.count('abcdz'))
+        self.assertIsNone(matcher.count('abcd'))
+
+    def testSameAsGreedy(self):
+        rnd = random.Random(42)
+        for _ in range(200):
+            vocab = set()
+            for _ in range(rnd.randint(1, 12)):
+                token = ''.join(rnd.choice('ab#') for _ in range(rnd.randint(1, 4)))
+                vocab.add('##' + token if rnd.random() < 0.5 else token)
+            fast = WordpieceTokenizer(vocab, '[UNK]', fast=True)
+            greedy = WordpieceTokenizer(vocab, '[UNK]', fast=False)
+            for _ in range(100):
+                word = ''.join(rnd.choice('ab#') for _ in range(rnd.randint(1, 10)))
+                self.assertEqual(greedy.tokenize(word), fast.tokenize(word), msg='{} {}'.format(vocab, word))
+                self.assertEqual(len(greedy.tokenize(word)), fast.count(word))
+                self.assertEqual(len(greedy.tokenize(word)), greedy.count(word))
+
+    def testChineseVocab(self):
+        vocab = set(load_vocab('testdata/vocab_chinese.txt').keys())
+        fast = WordpieceTokenizer(vocab, '[UNK]', fast=True)
+        greedy = WordpieceTokenizer(vocab, '[UNK]', fast=False)
+        rnd = random.Random(42)
+        chars = 'abcdefghijklmnopqrstuvwxyz0123456789#上海市中国'
+        for _ in range(2000):
+            word = ''.join(rnd.choice(chars) for _ in range(rnd.randint(1, 30)))
+            self.assertEqual(greedy.tokenize(word), fast.tokenize(word))
+        self.assertEqual(['[UNK]'], fast.tokenize('a' * 101))
+
+
+if __name__ == "__main__":
+    unittest.main()
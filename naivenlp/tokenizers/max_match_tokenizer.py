@@ -0,0 +1,252 @@
+import logging
+import os
+import re
+import string
+
+from naivenlp.structures.trie import TrieMap
+
+from naivenlp.utils.parallel import ChunkPool
+
+from .abstract_tokenizer import VocabBasedTokenizer
+
+FORWARD_MODE = 0
+BACKWARD_MODE = 1
+BIDIRECTIONAL_MODE = 2
+
+_NON_WHITESPACE = re.compile(r'\S+')
+# ascii letters and digits, a run of them is not split unless a dictionary word covers the whole run
+_ALNUM = frozenset(string.ascii_letters + string.digits)
+
+
+def _read_words(file):
+    # one word per line, e.g. the output of `datasource.sogou.collect`, jieba style `word freq tag` lines also work
+    with open(file, mode='rt', encoding='utf8') as fin:
+        for line in fin:
+            parts = line.split()
+            if parts:
+                yield parts[0]
+
+
+class MaxMatchTokenizer(VocabBasedTokenizer):
+
+    def __init__(self,
+                 vocab_file,
+                 dictionary=None,
+                 userdict_files=None,
+                 trie=None,
+                 pad_token='[PAD]',
+                 unk_token='[UNK]',
+                 bos_token='[BOS]',
+                 eos_token='[EOS]',
+                 **kwargs):
+        """Constructs a MaxMatchTokenizer.
+
+        Text is segmented by maximum matching against the words of a `TrieMap`. Chars that do not start
+        or end a word are single tokens, runs of ascii letters and digits are kept whole, whitespaces
+        are dropped.
+
+        Args:
+            vocab_file: The vocab file
+            dictionary: (`optional`) A word list file, one word per line, defaults to `vocab_file`
+            userdict_files: (`optional`) More word list files
+            trie: (`optional`) A prebuilt `TrieMap` or `Trie` of words, used instead of `dictionary`. A trie
+                opened by `TrieMap.open` is shared with the workers of `tokenize_batch` through the mapped file.
+        """
+        super().__init__(
+            vocab_file,
+            pad_token=pad_token,
+            unk_token=unk_token,
+            bos_token=bos_token,
+            eos_token=eos_token,
+            **kwargs)
+        self.dictionary = dictionary
+        self.userdict_files = userdict_files
+        self._pool = None
+        self.trie = trie if trie is not None else self._build_trie()
+
+    def _build_trie(self):
+        trie = TrieMap()
+        files = [self.dictionary or self.vocab_file] + list(self.userdict_files or [])
+        for f in files:
+            if not f:
+                continue
+            if not os.path.exists(f):
+                logging.warning('Load dictionary: {} failed. File does not exist. Skipped.'.format(f))
+                continue
+            for word in _read_words(f):
+                trie.put(word)
+        return trie
+
+    def add_word(self, word):
+        """Add a word to the dictionary."""
+        self.trie.put(word)
+
+    def tokenize(self, inputs, mode=BIDIRECTIONAL_MODE, **kwargs):
+        if mode not in [FORWARD_MODE, BACKWARD_MODE, BIDIRECTIONAL_MODE]:
+            raise ValueError('Invalid mode: {}'.format(mode))
+        tokens = []
+        for m in _NON_WHITESPACE.finditer(inputs):
+            text = m.group()
+            if mode == FORWARD_MODE:
+                tokens.extend(self._forward(text))
+                continue
+            longest, earliest = self._scan(text)
+            backward = self._backward(text, earliest)
+            if mode == BACKWARD_MODE:
+                tokens.extend(backward)
+                continue
+            forward = self._forward(text, longest)
+            tokens.extend(self._choose(forward, backward))
+        return tokens
+
+    def _match(self, text, i):
+        """End of the longest word starting at i, 0 if there is none."""
+        n = len(text)
+        # a word does not start or end in the middle of a run of letters and digits
+        if i > 0 and text[i] in _ALNUM and text[i - 1] in _ALNUM:
+            return 0
+        for end in reversed(self._prefix_ends(text, i)):
+            if end == n or text[end - 1] not in _ALNUM or text[end] not in _ALNUM:
+                return end
+        return 0
+
+    def _prefix_ends(self, text, i):
+        root = getattr(self.trie, 'root', None)
+        if root is None:
+            return self.trie.prefix_ends(text, i)
+        node, ends = root, []
+        for j in range(i, len(text)):
+            node = node.children.get(text[j])
+            if node is None:
+                break
+            if node.terminal:
+                ends.append(j + 1)
+        return ends
+
+    def _scan(self, text):
+        """Ends of the longest words from every start, and starts of the longest words to every end.
+
+        A single left to right scan finds all the words of the text, which serves both directions.
+        The nodes of a `TrieMap` or `Trie` are walked inline, other tries, e.g. a `DoubleArrayTrie` opened
+        from a file, are walked by their `prefix_ends`.
+        """
+        n = len(text)
+        root = getattr(self.trie, 'root', None)
+        prefix_ends = self.trie.prefix_ends if root is None else None
+        longest = [0] * n
+        earliest = [-1] * (n + 1)
+        for i in range(n):
+            if i > 0 and text[i] in _ALNUM and text[i - 1] in _ALNUM:
+                continue
+            if root is None:
+                for end in prefix_ends(text, i):
+                    if end == n or text[end - 1] not in _ALNUM or text[end] not in _ALNUM:
+                        longest[i] = end
+                        if earliest[end] < 0:
+                            earliest[end] = i
+                continue
+            node = root
+            for j in range(i, n):
+                node = node.children.get(text[j])
+                if node is None:
+                    break
+                if node.terminal and (j + 1 == n or text[j] not in _ALNUM or text[j + 1] not in _ALNUM):
+                    longest[i] = j + 1
+                    # starts are scanned in ascending order, the first start of an end is the earliest one
+                    if earliest[j + 1] < 0:
+                        earliest[j + 1] = i
+        return longest, earliest
+
+    def _forward(self, text, longest=None):
+        n = len(text)
+        tokens = []
+        i = 0
+        while i < n:
+            j = longest[i] if longest is not None else self._match(text, i)
+            if not j:
+                j = i + 1
+                if text[i] in _ALNUM:
+                    while j < n and text[j] in _ALNUM:
+                        j += 1
+            tokens.append(text[i:j])
+            i = j
+        return tokens
+
+    def _backward(self, text, earliest):
+        tokens = []
+        j = len(text)
+        while j > 0:
+            i = earliest[j]
+            if i < 0:
+                i = j - 1
+                if text[i] in _ALNUM:
+                    while i > 0 and text[i - 1] in _ALNUM:
+                        i -= 1
+            tokens.append(text[i:j])
+            j = i
+        tokens.reverse()
+        return tokens
+
+    @staticmethod
+    def _choose(forward, backward):
+        # fewer words first, then fewer single chars, backward matching is more accurate for chinese on ties
+        if len(forward) != len(backward):
+            return forward if len(forward) < len(backward) else backward
+        singles_forward = sum(1 for t in forward if len(t) == 1)
+        singles_backward = sum(1 for t in backward if len(t) == 1)
+        return forward if singles_forward < singles_backward else backward
+
+    def tokenize_batch(self, inputs, mode=BIDIRECTIONAL_MODE, num_workers=None, chunk_size=64, **kwargs):
+        """Tokenize a batch of inputs.
+
+        Args:
+            inputs: A list of texts
+            mode: Matching mode, one of `FORWARD_MODE`, `BACKWARD_MODE` and `BIDIRECTIONAL_MODE`
+            num_workers: Segment in a pool of `num_workers` processes if greater than 1. The pool is
+                created on first use and reused by later calls, call `close()` or use this tokenizer as a
+                context manager to shut it down.
+            chunk_size: Number of inputs in a chunk sent to a worker
+
+        Returns:
+            A list of token lists
+        """
+        inputs = list(inputs)
+        if not num_workers or num_workers <= 1 or len(inputs) <= chunk_size:
+            return [self.tokenize(x, mode=mode, **kwargs) for x in inputs]
+        if mode not in [FORWARD_MODE, BACKWARD_MODE, BIDIRECTIONAL_MODE]:
+            raise ValueError('Invalid mode: {}'.format(mode))
+        pool = self._get_pool(num_workers)
+        chunks = [inputs[i:i + chunk_size] for i in range(0, len(inputs), chunk_size)]
+        results = []
+        for tokens in pool.map(chunks, mode=mode, **kwargs):
+            results.extend(tokens)
+        return results
+
+    def _tokenize_chunk(self, chunk, **kwargs):
+        return [self.tokenize(x, **kwargs) for x in chunk]
+
+    def _get_pool(self, num_workers):
+        if self._pool is not None and self._pool.num_workers != num_workers:
+            self.close()
+        if self._pool is None:
+            # the workers receive this tokenizer once, the pool is terminated when this tokenizer is collected
+            self._pool = ChunkPool(self._tokenize_chunk, num_workers)
+        return self._pool
+
+    def close(self):
+        """Shut down the worker pool of `tokenize_batch`, if any."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # pools can not be shared
+        state['_pool'] = None
+        return state
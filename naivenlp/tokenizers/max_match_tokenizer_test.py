@@ -0,0 +1,89 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from naivenlp.structures.double_array_trie import DoubleArrayTrie
+from naivenlp.structures.trie import Trie, TrieMap
+
+from .max_match_tokenizer import BACKWARD_MODE, BIDIRECTIONAL_MODE, FORWARD_MODE, MaxMatchTokenizer
+
+
+class MaxMatchTokenizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dictionary = os.path.join(self.tmp_dir.name, 'words.txt')
+        words = ['研究', '研究生', '生命', '的', '起源', '结婚', '结婚的', '和尚', '尚未', '上海', '上海市', 'A股', 'hello']
+        with open(self.dictionary, mode='wt', encoding='utf8') as fout:
+            for w in words:
+                fout.write(w + '\n')
+        self.tokenizer = MaxMatchTokenizer(vocab_file='testdata/vocab_chinese.txt', dictionary=self.dictionary)
+
+    def tearDown(self):
+        self.tokenizer.close()
+        self.tmp_dir.cleanup()
+
+    def testModes(self):
+        sent = '研究生命的起源'
+        self.assertEqual(['研究生', '命', '的', '起源'], self.tokenizer.tokenize(sent, mode=FORWARD_MODE))
+        self.assertEqual(['研究', '生命', '的', '起源'], self.tokenizer.tokenize(sent, mode=BACKWARD_MODE))
+        self.assertEqual(['研究', '生命', '的', '起源'], self.tokenizer.tokenize(sent, mode=BIDIRECTIONAL_MODE))
+
+        sent = '结婚的和尚未结婚的'
+        self.assertEqual(['结婚的', '和尚', '未', '结婚的'], self.tokenizer.tokenize(sent, mode=FORWARD_MODE))
+        self.assertEqual(['结婚的', '和', '尚未', '结婚的'], self.tokenizer.tokenize(sent, mode=BACKWARD_MODE))
+        self.assertEqual(['结婚的', '和', '尚未', '结婚的'], self.tokenizer.tokenize(sent))
+
+        with self.assertRaises(ValueError):
+            self.tokenizer.tokenize(sent, mode=3)
+
+    def testAlnumRuns(self):
+        for mode in [FORWARD_MODE, BACKWARD_MODE, BIDIRECTIONAL_MODE]:
+            self.assertEqual(
+                ['上海市', 'A股', '涨', '了', '3', '%', 'hello', 'helloworld', 'QA', '股'],
+                self.tokenizer.tokenize('上海市A股涨了3% hello  helloworld QA股', mode=mode))
+
+    def testTrie(self):
+        trie = Trie()
+        trie.put('上海')
+        tokenizer = MaxMatchTokenizer(vocab_file='testdata/vocab_chinese.txt', trie=trie)
+        self.assertEqual(['上海', '市'], tokenizer.tokenize('上海市'))
+        tokenizer.add_word('海市')
+        self.assertEqual(['上', '海市'], tokenizer.tokenize('上海市', mode=BACKWARD_MODE))
+        # tokens not in the vocab are unknown
+        self.assertEqual(tokenizer.tokens2ids(['上', '海市']), tokenizer.encode('上海市', mode=BACKWARD_MODE))
+
+    def testTokenizeBatch(self):
+        sentences = ['研究生命的起源', '结婚的和尚未结婚的', '上海市A股'] * 10
+        expected = [self.tokenizer.tokenize(x) for x in sentences]
+        self.assertEqual(expected, self.tokenizer.tokenize_batch(sentences))
+        self.assertEqual(expected, self.tokenizer.tokenize_batch(sentences, num_workers=2, chunk_size=4))
+
+        unpickled = pickle.loads(pickle.dumps(self.tokenizer))
+        self.assertEqual(expected, [unpickled.tokenize(x) for x in sentences])
+
+    def testMappedTrie(self):
+        path = os.path.join(self.tmp_dir.name, 'words.dat')
+        self.tokenizer.trie.save(path)
+        tokenizer = MaxMatchTokenizer(vocab_file='testdata/vocab_chinese.txt', trie=TrieMap.open(path))
+        self.assertIsInstance(tokenizer.trie, DoubleArrayTrie)
+        sentences = ['研究生命的起源', '结婚的和尚未结婚的', '上海市A股涨了3% hello  helloworld QA股'] * 10
+        for mode in [FORWARD_MODE, BACKWARD_MODE, BIDIRECTIONAL_MODE]:
+            self.assertEqual(
+                [self.tokenizer.tokenize(x, mode=mode) for x in sentences],
+                [tokenizer.tokenize(x, mode=mode) for x in sentences])
+
+        # the mapped trie is pickled as its path, workers map the same file instead of rebuilding the trie
+        unpickled = pickle.loads(pickle.dumps(tokenizer))
+        self.assertEqual(path, unpickled.trie.path)
+        self.assertLess(len(pickle.dumps(tokenizer.trie)), 1024)
+        expected = [self.tokenizer.tokenize(x) for x in sentences]
+        try:
+            self.assertEqual(expected, tokenizer.tokenize_batch(sentences, num_workers=2, chunk_size=4))
+        finally:
+            tokenizer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
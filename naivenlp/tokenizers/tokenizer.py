@@ -15,10 +15,14 @@
 
 
 import collections
+import itertools
 import logging
 import os
+import re
 import unicodedata
 
+from .linmaxmatch import LinMaxMatcher
+
 
 def load_vocab(vocab_file):
     """Loads a vocabulary file into a dictionary."""
@@ -43,25 +47,27 @@ def whitespace_tokenize(text):
 class BasicTokenizer(object):
     """Runs basic tokenization (punctuation splitting, lower casing, etc.)."""
 
-    def __init__(self, do_lower_case=True, never_split=None, tokenize_chinese_chars=True):
+    def __init__(self, do_lower_case=True, never_split=None, tokenize_chinese_chars=True, fast=True):
         """ Constructs a BasicTokenizer.
 
         Args:
             **do_lower_case**: Whether to lower case the input.
             **never_split**: (`optional`) list of str
-                Kept for backward compatibility purposes.
-                Now implemented directly at the base class level (see :func:`PreTrainedTokenizer.tokenize`)
-                List of token not to split.
+                List of token not to split. They are compiled into an `AddedTokenMatcher` once, and
+                kept intact wherever they appear in the text, e.g. `[MASK]` in `x[MASK]`.
             **tokenize_chinese_chars**: (`optional`) boolean (default True)
                 Whether to tokenize Chinese characters.
                 This should likely be deactivated for Japanese:
                 see: https://github.com/huggingface/pytorch-pretrained-BERT/issues/328
+            **fast**: (`optional`) boolean (default True)
+                Whether to clean, split and lower case the text in a single pass driven by
+                precomputed character classes. The output is the same as the multi-pass version.
         """
-        if never_split is None:
-            never_split = []
         self.do_lower_case = do_lower_case
-        self.never_split = never_split
+        self.never_split = set(never_split) if never_split is not None else set()
+        self.never_split_matcher = AddedTokenMatcher(self.never_split)
         self.tokenize_chinese_chars = tokenize_chinese_chars
+        self.fast = fast
 
     def tokenize(self, text, never_split=None):
         """ Basic Tokenization of a piece of text.
@@ -69,11 +75,182 @@ class BasicTokenizer(object):
 
         Args:
             **never_split**: (`optional`) list of str
-                Kept for backward compatibility purposes.
-                Now implemented directly at the base class level (see :func:`PreTrainedTokenizer.tokenize`)
-                List of token not to split.
+                List of token not to split, in addition to the ones of the constructor. A matcher
+                is compiled on every call, so register the tokens in the constructor if possible.
+        """
+        if never_split:
+            never_split = self.never_split.union(never_split)
+            matcher = AddedTokenMatcher(never_split)
+        else:
+            never_split = self.never_split
+            matcher = self.never_split_matcher
+        if not matcher:
+            return self._tokenize_text(text, never_split)
+        output = []
+        for piece, protected in matcher.split(text):
+            if protected:
+                output.append(piece)
+            else:
+                output.extend(self._tokenize_text(piece, never_split))
+        return output
+
+    def iter_tokenize(self, text, never_split=None, chunk_size=1024):
+        """Lazy version of `tokenize`, the text is tokenized chunk by chunk as the tokens are consumed.
+
+        Chunks end right before a whitespace (or a Chinese character if `tokenize_chinese_chars`),
+        where a token always ends, so the tokens are the same as `tokenize`.
+
+        Args:
+            **never_split**: (`optional`) list of str, see `tokenize`
+            **chunk_size**: Number of characters tokenized at a time
+        """
+        if never_split:
+            never_split = self.never_split.union(never_split)
+            matcher = AddedTokenMatcher(never_split)
+        else:
+            never_split = self.never_split
+            matcher = self.never_split_matcher
+        for piece, protected in matcher.iter_split(text):
+            if protected:
+                yield piece
+                continue
+            for chunk in self._iter_chunks(piece, chunk_size):
+                yield from self._tokenize_text(chunk, never_split)
+
+    def tokenize_with_offsets(self, text, never_split=None):
+        """Tokenize text, and map every token back to the text.
+
+        Returns:
+            A tuple of (tokens, spans), `text[start:end]` is the source of a token for (start, end) in spans.
         """
-        never_split = self.never_split + (never_split if never_split is not None else [])
+        tokens, spans = [], []
+        for token, starts, ends in self._tokenize_with_char_maps(text, never_split=never_split):
+            tokens.append(token)
+            spans.append((starts[0], ends[-1]))
+        return tokens, spans
+
+    def _tokenize_with_char_maps(self, text, never_split=None):
+        """Yields (token, starts, ends), `starts[i]` and `ends[i]` are the span in the text of the i-th char of
+        the token. Chars of tokens normalized by context sensitive lower casing are mapped to the whole word."""
+        if never_split:
+            never_split = self.never_split.union(never_split)
+            matcher = AddedTokenMatcher(never_split)
+        else:
+            never_split = self.never_split
+            matcher = self.never_split_matcher
+        pos = 0
+        for start, end in itertools.chain(matcher.finditer(text), [(len(text), len(text))]):
+            if start > pos:
+                yield from self._offsets_tokenize(text[pos:start], pos, never_split)
+            if end > start:
+                yield text[start:end], list(range(start, end)), list(range(start + 1, end + 1))
+            pos = end
+
+    def _offsets_tokenize(self, text, base, never_split):
+        """`_fast_tokenize` that keeps the positions of the chars."""
+        flags_table = _CHAR_FLAGS
+        output = []
+        word, positions = [], []
+        for i, char in enumerate(text):
+            flags = flags_table.get(char)
+            if flags is None:
+                flags = _char_flags(char)
+            if flags & _DROP:
+                continue
+            if flags & _SPACE or (self.tokenize_chinese_chars and flags & _CJK):
+                if word:
+                    self._offsets_process_word(word, positions, never_split, output)
+                    word, positions = [], []
+                if flags & _SPACE:
+                    continue
+                if never_split or flags & _LOWER_COMPLEX:
+                    self._offsets_process_word((char,), (base + i,), never_split, output)
+                else:
+                    output.append((_LOWERED[char] if self.do_lower_case else char, [base + i], [base + i + 1]))
+                continue
+            word.append(char)
+            positions.append(base + i)
+        if word:
+            self._offsets_process_word(word, positions, never_split, output)
+        return output
+
+    def _offsets_process_word(self, chars, positions, never_split, output):
+        """`_fast_process_word` that appends (token, starts, ends) to `output`."""
+        tokens = []
+        self._fast_process_word(chars, never_split, tokens)
+        flags_table = _CHAR_FLAGS
+        if self.do_lower_case:
+            forms = [_LOWERED[c] for c in chars]
+            punc_flag = _LOWER_PUNCT
+            if any(flags_table[c] & _LOWER_COMPLEX for c in chars):
+                forms = None
+        else:
+            forms = chars
+            punc_flag = _PUNCT
+        word_start, word_end = positions[0], positions[-1] + 1
+        if forms is not None and len("".join(forms)) == len(chars) and sum(len(t) for t in tokens) == len(chars):
+            # every char has a single char form and no char is dropped, the chars of the tokens are in order
+            offset = 0
+            for token in tokens:
+                starts = positions[offset:offset + len(token)]
+                output.append((token, starts, [p + 1 for p in starts]))
+                offset += len(token)
+            return
+        if forms is None or (len(tokens) == 1 and tokens[0] == "".join(chars)):
+            # the multi-pass path, or a never split word, map every char to the whole word if not sure
+            for token in tokens:
+                if token == "".join(chars):
+                    output.append((token, [p for p in positions], [p + 1 for p in positions]))
+                else:
+                    output.append((token, [word_start] * len(token), [word_end] * len(token)))
+            return
+
+        # same splitting as `_fast_process_word`, every piece comes from a range of chars
+        ranges = []
+        start = 0
+        for i, char in enumerate(chars):
+            if flags_table[char] & punc_flag:
+                if i > start:
+                    ranges.append((start, i))
+                ranges.append((i, i + 1))
+                start = i + 1
+        if start < len(chars):
+            ranges.append((start, len(chars)))
+        pieces = []
+        for a, b in ranges:
+            token = "".join(forms[a:b])
+            if not token:
+                continue
+            starts, ends = [], []
+            for k in range(a, b):
+                starts.extend([positions[k]] * len(forms[k]))
+                ends.extend([positions[k] + 1] * len(forms[k]))
+            pieces.append((token, starts, ends))
+        if [t for t, _, _ in pieces] != tokens:
+            # e.g. a lower cased never split word, which is not split
+            pieces = [(t, [word_start] * len(t), [word_end] * len(t)) for t in tokens]
+        output.extend(pieces)
+
+    def _iter_chunks(self, text, chunk_size):
+        boundary = _SPACE | _CJK if self.tokenize_chinese_chars else _SPACE
+        flags_table = _CHAR_FLAGS
+        n = len(text)
+        start = 0
+        while start < n:
+            end = start + chunk_size
+            while end < n:
+                flags = flags_table.get(text[end])
+                if flags is None:
+                    flags = _char_flags(text[end])
+                if flags & boundary:
+                    break
+                end += 1
+            yield text[start:end]
+            start = end
+
+    def _tokenize_text(self, text, never_split):
+        if self.fast:
+            return self._fast_tokenize(text, never_split)
         text = self._clean_text(text)
         # This was added on November 1st, 2018 for the multilingual and Chinese
         # models. This is also applied to the English models now, but it doesn't
@@ -94,16 +271,85 @@ class BasicTokenizer(object):
         output_tokens = whitespace_tokenize(" ".join(split_tokens))
         return output_tokens
 
-    def _run_strip_accents(self, text):
-        """Strips accents from a piece of text."""
-        text = unicodedata.normalize("NFD", text)
+    def _fast_tokenize(self, text, never_split):
+        """Single pass version of `tokenize`, whitespace tokens are processed as soon as they end."""
+        flags_table = _CHAR_FLAGS
+        lowered_table = _LOWERED
+        do_lower_case = self.do_lower_case
+        tokenize_chinese_chars = self.tokenize_chinese_chars
         output = []
+        word = []
         for char in text:
-            cat = unicodedata.category(char)
-            if cat == "Mn":
+            flags = flags_table.get(char)
+            if flags is None:
+                flags = _char_flags(char)
+            if flags & _DROP:
                 continue
-            output.append(char)
-        return "".join(output)
+            if flags & _SPACE:
+                if word:
+                    self._fast_process_word(word, never_split, output)
+                    word = []
+                continue
+            if tokenize_chinese_chars and flags & _CJK:
+                if word:
+                    self._fast_process_word(word, never_split, output)
+                    word = []
+                if never_split or flags & _LOWER_COMPLEX:
+                    self._fast_process_word((char,), never_split, output)
+                else:
+                    output.append(lowered_table[char] if do_lower_case else char)
+                continue
+            word.append(char)
+        if word:
+            self._fast_process_word(word, never_split, output)
+        return output
+
+    def _fast_process_word(self, chars, never_split, output):
+        """Lower cases a whitespace token and splits it on punctuation, appending the pieces to `output`."""
+        if never_split:
+            token = "".join(chars)
+            if token in never_split:
+                output.append(token)
+                return
+        flags_table = _CHAR_FLAGS
+        if self.do_lower_case:
+            lowered_table = _LOWERED
+            forms = []
+            for char in chars:
+                if flags_table[char] & _LOWER_COMPLEX:
+                    # context sensitive lower casing or normalization, use the multi-pass version
+                    token = self._run_strip_accents("".join(chars).lower())
+                    for piece in self._run_split_on_punc(token, never_split):
+                        output.extend(piece.split())
+                    return
+                forms.append(lowered_table[char])
+            if never_split:
+                token = "".join(forms)
+                if token in never_split:
+                    output.append(token)
+                    return
+            punc_flag = _LOWER_PUNCT
+        else:
+            forms = chars
+            punc_flag = _PUNCT
+
+        start = 0
+        for i, char in enumerate(chars):
+            if flags_table[char] & punc_flag:
+                if i > start:
+                    piece = "".join(forms[start:i])
+                    if piece:
+                        output.append(piece)
+                output.append(forms[i])
+                start = i + 1
+        if start < len(chars):
+            piece = "".join(forms[start:])
+            if piece:
+                output.append(piece)
+
+    def _run_strip_accents(self, text):
+        """Strips accents from a piece of text."""
+        return _strip_accents(text)
 
     def _run_split_on_punc(self, text, never_split=None):
         """Splits punctuation on a piece of text."""
@@ -142,27 +388,7 @@ class BasicTokenizer(object):
 
     def _is_chinese_char(self, cp):
         """Checks whether CP is the codepoint of a CJK character."""
-        # This defines a "chinese character" as anything in the CJK Unicode block:
-        #   https://en.wikipedia.org/wiki/CJK_Unified_Ideographs_(Unicode_block)
-        #
-        # Note that the CJK Unicode block is NOT all Japanese and Korean characters,
-        # despite its name. The modern Korean Hangul alphabet is a different block,
-        # as is Japanese Hiragana and Katakana. Those alphabets are used to write
-        # space-separated words, so they are not treated specially and handled
-        # like the all of the other languages.
-        if (
-            (cp >= 0x4E00 and cp <= 0x9FFF)
-            or (cp >= 0x3400 and cp <= 0x4DBF)
-            or (cp >= 0x20000 and cp <= 0x2A6DF)  #
-            or (cp >= 0x2A700 and cp <= 0x2B73F)  #
-            or (cp >= 0x2B740 and cp <= 0x2B81F)  #
-            or (cp >= 0x2B820 and cp <= 0x2CEAF)  #
-            or (cp >= 0xF900 and cp <= 0xFAFF)
-            or (cp >= 0x2F800 and cp <= 0x2FA1F)  #
-        ):  #
-            return True
-
-        return False
+        return _is_chinese_char(cp)
 
     def _clean_text(self, text):
         """Performs invalid character removal and whitespace cleanup on text."""
@@ -181,10 +407,21 @@ class BasicTokenizer(object):
 class WordpieceTokenizer(object):
     """Runs WordPiece tokenization."""
 
-    def __init__(self, vocab, unk_token, max_input_chars_per_word=100):
+    def __init__(self, vocab, unk_token, max_input_chars_per_word=100, fast=True):
+        """ Constructs a WordpieceTokenizer.
+
+        Args:
+            **vocab**: A container of word pieces, supports `in`
+            **unk_token**: The token for words that can not be tokenized
+            **max_input_chars_per_word**: Words longer than this are mapped to `unk_token`
+            **fast**: (`optional`) boolean (default True)
+                Whether to compile the vocab into a `LinMaxMatcher`, which runs in time linear
+                in the word length and gives the same output as the greedy algorithm.
+        """
         self.vocab = vocab
         self.unk_token = unk_token
         self.max_input_chars_per_word = max_input_chars_per_word
+        self.matcher = LinMaxMatcher(vocab) if fast else None
 
     def tokenize(self, text):
         """Tokenizes a piece of text into its word pieces.
@@ -206,37 +443,160 @@ class WordpieceTokenizer(object):
 
         output_tokens = []
         for token in whitespace_tokenize(text):
-            chars = list(token)
-            if len(chars) > self.max_input_chars_per_word:
+            if len(token) > self.max_input_chars_per_word:
                 output_tokens.append(self.unk_token)
                 continue
 
-            is_bad = False
-            start = 0
-            sub_tokens = []
-            while start < len(chars):
-                end = len(chars)
-                cur_substr = None
-                while start < end:
-                    substr = "".join(chars[start:end])
-                    if start > 0:
-                        substr = "##" + substr
-                    if substr in self.vocab:
-                        cur_substr = substr
-                        break
-                    end -= 1
-                if cur_substr is None:
-                    is_bad = True
-                    break
-                sub_tokens.append(cur_substr)
-                start = end
+            # words starting with the suffix indicator are rare, and they are
+            # ambiguous for the matcher, so they always take the greedy path.
+            if self.matcher is not None and not token.startswith(self.matcher.suffix_indicator):
+                sub_tokens = self.matcher.match(token)
+            else:
+                sub_tokens = self._greedy_match(token)
 
-            if is_bad:
+            if sub_tokens is None:
                 output_tokens.append(self.unk_token)
             else:
                 output_tokens.extend(sub_tokens)
         return output_tokens
 
+    def count(self, text):
+        """Number of word pieces of text, without building the word pieces if possible."""
+        return sum(self.count_word(token) for token in whitespace_tokenize(text))
+
+    def count_word(self, token):
+        """Number of word pieces of a single token without whitespaces."""
+        if len(token) > self.max_input_chars_per_word:
+            return 1
+        if self.matcher is not None and not token.startswith(self.matcher.suffix_indicator):
+            n = self.matcher.count(token)
+        else:
+            sub_tokens = self._greedy_match(token)
+            n = len(sub_tokens) if sub_tokens is not None else None
+        # words that can not be tokenized are a single unk token
+        return n if n is not None else 1
+
+    def _greedy_match(self, token):
+        chars = list(token)
+        start = 0
+        sub_tokens = []
+        while start < len(chars):
+            end = len(chars)
+            cur_substr = None
+            while start < end:
+                substr = "".join(chars[start:end])
+                if start > 0:
+                    substr = "##" + substr
+                if substr in self.vocab:
+                    cur_substr = substr
+                    break
+                end -= 1
+            if cur_substr is None:
+                return None
+            sub_tokens.append(cur_substr)
+            start = end
+        return sub_tokens
+
+
+class AddedTokenMatcher(object):
+    """Leftmost-longest matcher of protected tokens in raw text, e.g. special tokens and domain terms.
+
+    The tokens are compiled into a trie once. Candidate start positions are found by a regex of the
+    first characters of all tokens, which runs in C, and the trie is walked from every candidate, so
+    the cost of a text depends on the text and the longest token, not on the number of tokens.
+
+    A token that starts (or ends) with a letter or a digit only matches where it does not continue
+    a word, e.g. `ai` does not match inside `rain`. Chinese characters have no such boundaries.
+    """
+
+    def __init__(self, tokens=None):
+        self.tokens = set()
+        self.trie = {}
+        self._first_chars = None
+        for token in tokens or []:
+            self.add(token)
+
+    def add(self, token):
+        if not token or token in self.tokens:
+            return
+        self.tokens.add(token)
+        node = self.trie
+        for char in token:
+            node = node.setdefault(char, {})
+        node[_END] = token
+        self._first_chars = None
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __contains__(self, token):
+        return token in self.tokens
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+    def _first_chars_regex(self):
+        if self._first_chars is None:
+            chars = sorted(c for c in self.trie.keys() if c is not _END)
+            self._first_chars = re.compile('[' + ''.join(re.escape(c) for c in chars) + ']')
+        return self._first_chars
+
+    def finditer(self, text):
+        """Yields (start, end) of the non-overlapping leftmost-longest matches in text."""
+        if not self.tokens:
+            return
+        search = self._first_chars_regex().search
+        trie = self.trie
+        n = len(text)
+        pos = 0
+        while True:
+            m = search(text, pos)
+            if m is None:
+                return
+            start = m.start()
+            end = -1
+            if not (start > 0 and _is_word_char(text[start]) and _is_word_char(text[start - 1])):
+                node = trie
+                i = start
+                while i < n:
+                    node = node.get(text[i])
+                    if node is None:
+                        break
+                    i += 1
+                    if _END in node and not (i < n and _is_word_char(text[i - 1]) and _is_word_char(text[i])):
+                        end = i
+            if end > 0:
+                yield start, end
+                pos = end
+            else:
+                pos = start + 1
+
+    def split(self, text):
+        """Split text around the matches.
+
+        Returns:
+            A list of (piece, protected) tuples, `protected` is True for the matched tokens.
+            Empty pieces are skipped.
+        """
+        return list(self.iter_split(text))
+
+    def iter_split(self, text):
+        """Lazy version of `split`."""
+        pos = 0
+        for start, end in self.finditer(text):
+            if start > pos:
+                yield text[pos:start], False
+            yield text[start:end], True
+            pos = end
+        if pos < len(text):
+            yield text[pos:], False
+
+    def __getstate__(self):
+        # the regex is compiled again on first use
+        state = self.__dict__.copy()
+        state['_first_chars'] = None
+        return state
+
 
 def _is_whitespace(char):
     """Checks whether `chars` is a whitespace character."""
@@ -275,3 +635,92 @@ def _is_punctuation(char):
     if cat.startswith("P"):
         return True
     return False
+
+
+def _strip_accents(text):
+    """Strips accents from a piece of text."""
+    text = unicodedata.normalize("NFD", text)
+    output = []
+    for char in text:
+        cat = unicodedata.category(char)
+        if cat == "Mn":
+            continue
+        output.append(char)
+    return "".join(output)
+
+
+def _is_chinese_char(cp):
+    """Checks whether CP is the codepoint of a CJK character."""
+    # This defines a "chinese character" as anything in the CJK Unicode block:
+    #   https://en.wikipedia.org/wiki/CJK_Unified_Ideographs_(Unicode_block)
+    #
+    # Note that the CJK Unicode block is NOT all Japanese and Korean characters,
+    # despite its name. The modern Korean Hangul alphabet is a different block,
+    # as is Japanese Hiragana and Katakana. Those alphabets are used to write
+    # space-separated words, so they are not treated specially and handled
+    # like the all of the other languages.
+    if (
+        (cp >= 0x4E00 and cp <= 0x9FFF)
+        or (cp >= 0x3400 and cp <= 0x4DBF)
+        or (cp >= 0x20000 and cp <= 0x2A6DF)  #
+        or (cp >= 0x2A700 and cp <= 0x2B73F)  #
+        or (cp >= 0x2B740 and cp <= 0x2B81F)  #
+        or (cp >= 0x2B820 and cp <= 0x2CEAF)  #
+        or (cp >= 0xF900 and cp <= 0xFAFF)
+        or (cp >= 0x2F800 and cp <= 0x2FA1F)  #
+    ):  #
+        return True
+
+    return False
+
+
+# key of the token ending at a trie node of `AddedTokenMatcher`, characters are always str
+_END = None
+
+
+def _is_word_char(char):
+    return char.isalnum() and not _is_chinese_char(ord(char))
+
+
+# Character classes used by the single pass `BasicTokenizer`.
+_DROP = 1  # removed by `_clean_text`
+_SPACE = 2  # splits whitespace tokens
+_CJK = 4  # surrounded by spaces by `_tokenize_chinese_chars`
+_PUNCT = 8  # split by `_run_split_on_punc`
+_LOWER_PUNCT = 16  # the lower cased and accents stripped form is a punctuation
+_LOWER_COMPLEX = 32  # the lower cased form depends on the context, or mixes punctuations with other characters
+
+_CHAR_FLAGS = {}
+_LOWERED = {}
+
+
+def _char_flags(char):
+    """Computes the classes of the 256 codepoints block that contains `char`, and caches them."""
+    start = ord(char) & ~0xFF
+    for cp in range(start, min(start + 0x100, 0x110000)):
+        c = chr(cp)
+        flags = 0
+        if cp == 0 or cp == 0xFFFD or _is_control(c):
+            flags |= _DROP
+        elif _is_whitespace(c) or c.isspace():
+            flags |= _SPACE
+        if _is_chinese_char(cp):
+            flags |= _CJK
+        if _is_punctuation(c):
+            flags |= _PUNCT
+
+        lowered = _strip_accents(c.lower())
+        # canonical reordering only moves combining marks, the ones that are not stripped make the
+        # normalization of a token differ from the concatenation of its normalized characters.
+        reorder = any(
+            unicodedata.combining(x) and unicodedata.category(x) != "Mn"
+            for x in unicodedata.normalize("NFD", c.lower()))
+        # Final_Sigma is the only context sensitive mapping of str.lower
+        if cp == 0x03A3 or reorder or any(x.isspace() for x in lowered):
+            flags |= _LOWER_COMPLEX
+        elif any(_is_punctuation(x) for x in lowered):
+            flags |= _LOWER_PUNCT if len(lowered) == 1 else _LOWER_COMPLEX
+
+        _LOWERED[c] = lowered
+        _CHAR_FLAGS[c] = flags
+    return _CHAR_FLAGS[char]
@@ -0,0 +1,69 @@
+import random
+import unittest
+
+from .tokenizer import AddedTokenMatcher, BasicTokenizer
+
+
+class BasicTokenizerTest(unittest.TestCase):
+
+    def testTokenize(self):
+        tokenizer = BasicTokenizer()
+        self.assertEqual(
+            ['hello', 'world', ',', '你', '好', '世', '界', '!', 'cafe'],
+            tokenizer.tokenize(' Hello\tWorld, 你好世界!\x00 Café'))
+        tokenizer = BasicTokenizer(do_lower_case=False, never_split=['[MASK]'])
+        self.assertEqual(['Hello', '[MASK]', 'x', '[MASK]'], tokenizer.tokenize('Hello [MASK] x[MASK]'))
+        self.assertEqual(['x', '[MASK]', 'y'], tokenizer.tokenize('x[MASK]y'))
+
+    def testFastSameAsMultiPass(self):
+        rnd = random.Random(42)
+        pools = [
+            'abcXYZ 012,.!?-\'"[]#', '上海市中国你好，。！？', 'ÀÉõüçñΣσςİß', '\t\n\r\x00\x01\x1c 　� ',
+            '́̈ͅ\U0001d165', '豈⾀`΅', 'ﬁ①',
+        ]
+        for do_lower_case in [True, False]:
+            for tokenize_chinese_chars in [True, False]:
+                for never_split in [None, ['[MASK]', '[mask]', '上']]:
+                    fast = BasicTokenizer(do_lower_case, never_split, tokenize_chinese_chars, fast=True)
+                    slow = BasicTokenizer(do_lower_case, never_split, tokenize_chinese_chars, fast=False)
+                    for _ in range(500):
+                        text = ''.join(rnd.choice(rnd.choice(pools)) for _ in range(rnd.randint(0, 30)))
+                        text += rnd.choice(['', ' [MASK]x[MASK] ', chr(rnd.randint(0, 0x2FFFF))])
+                        self.assertEqual(slow.tokenize(text), fast.tokenize(text), msg=repr(text))
+                        self.assertEqual(
+                            fast.tokenize(text), list(fast.iter_tokenize(text, chunk_size=3)), msg=repr(text))
+                        tokens, spans = fast.tokenize_with_offsets(text)
+                        self.assertEqual(fast.tokenize(text), tokens, msg=repr(text))
+                        self.assertTrue(all(0 <= a < b <= len(text) for a, b in spans), msg=repr(text))
+
+    def testTokenizeWithOffsets(self):
+        tokenizer = BasicTokenizer(never_split=['[MASK]'])
+        text = 'Hello, Wörld! 你好 x[MASK]'
+        tokens, spans = tokenizer.tokenize_with_offsets(text)
+        self.assertEqual(['hello', ',', 'world', '!', '你', '好', 'x', '[MASK]'], tokens)
+        self.assertEqual(['Hello', ',', 'Wörld', '!', '你', '好', 'x', '[MASK]'], [text[a:b] for a, b in spans])
+
+
+class AddedTokenMatcherTest(unittest.TestCase):
+
+    def testSplit(self):
+        matcher = AddedTokenMatcher(['[MASK]', 'ai', 'c++', '北京', '北京大学', ''])
+        self.assertEqual(5, len(matcher))
+        self.assertEqual(
+            [('rain ', False), ('ai', True), (' ', False), ('[MASK]', True), ('c++', True), ('在', False), ('北京大学', True)],
+            matcher.split('rain ai [MASK]c++在北京大学'))
+        self.assertEqual([('abc++', False)], matcher.split('abc++'))
+        self.assertEqual([('北京', True), ('大', False)], matcher.split('北京大'))
+        self.assertEqual([], AddedTokenMatcher().split(''))
+        self.assertEqual([('x', False)], AddedTokenMatcher().split('x'))
+
+    def testManyTokens(self):
+        words = ['term{}x'.format(i) for i in range(5000)]
+        matcher = AddedTokenMatcher(words)
+        self.assertEqual(
+            [('a ', False), ('term42x', True), (' b ', False), ('term4999x', True), (' term42xy', False)],
+            matcher.split('a term42x b term4999x term42xy'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,18 @@
+import collections
+import copy
+import itertools
+import re
+
+import numpy as np
+
+from naivenlp.structures.lru_cache import LRUCache
+
 from .abstract_tokenizer import VocabBasedTokenizer
-from .tokenizer import BasicTokenizer, WordpieceTokenizer
+from .tokenizer import AddedTokenMatcher, BasicTokenizer, WordpieceTokenizer
+
+_NON_WHITESPACE = re.compile(r'\S+')
+
+Window = collections.namedtuple('Window', ['ids', 'offset', 'spans', 'char_start', 'char_end'])
 
 
 class TransformerTokenizer(VocabBasedTokenizer):
@@ -15,37 +28,245 @@ class TransformerTokenizer(VocabBasedTokenizer):
                  tokenize_chinese_chars=True,
                  never_split=None,
                  max_input_chars_per_word=100,
+                 wordpiece_cache_size=None,
+                 split_special_tokens=False,
                  **kwargs):
+        """Constructs a TransformerTokenizer.
+
+        Args:
+            vocab_file: The vocab file
+            never_split: (`optional`) Tokens kept intact and not split into word pieces, e.g. domain terms
+            wordpiece_cache_size: (`optional`) Size of the LRU cache of basic token -> word pieces
+            split_special_tokens: Tokenize special tokens in the text like other text, by default they
+                are kept intact, e.g. `[MASK]` in `x[MASK]y`
+        """
         super().__init__(
             vocab_file, pad_token=pad_token, unk_token=unk_token, bos_token=bos_token, eos_token=eos_token, **kwargs)
         self.do_lower_case = do_lower_case
         self.do_basic_tokenization = do_basic_tokenization
         self.tokenize_chinese_chars = tokenize_chinese_chars
-        self.never_split = never_split
+        self.never_split = set(never_split) if never_split is not None else set()
         self.max_input_chars_per_word = max_input_chars_per_word
+        self.split_special_tokens = split_special_tokens
 
+        # special tokens and the protected tokens of the vocab are matched in the raw text once, and emitted
+        # as is. Protected tokens that are not in the vocab are tokenized like any other text.
+        protected = set(t for t in self.never_split if t in self.vocab)
+        if not split_special_tokens:
+            protected.update(v for _, v in self.special_tokens())
+        self._atomic_tokens = protected
         if self.do_basic_tokenization:
             self.basic_tokenizer = BasicTokenizer(
                 do_lower_case=do_lower_case,
                 tokenize_chinese_chars=tokenize_chinese_chars,
-                never_split=never_split,
+                never_split=protected,
             )
+            self.added_tokens = self.basic_tokenizer.never_split_matcher
         else:
             self.basic_tokenizer = None
+            self.added_tokens = AddedTokenMatcher(protected)
 
+        # the matcher is a dict trie of the whole vocab, larger than the dict a compact vocab replaces,
+        # so a compact vocab is matched greedily by lookups into its arrays
         self.wordpiece_tokenizer = WordpieceTokenizer(
-            vocab=set(self.vocab.keys()),
+            vocab=self.vocab,
             unk_token=self.unk_token,
-            max_input_chars_per_word=self.max_input_chars_per_word)
+            max_input_chars_per_word=self.max_input_chars_per_word,
+            fast=not self.compact_vocab)
+
+        # cache of basic token -> word pieces, disabled if size is None or 0
+        self.wordpiece_cache = LRUCache(max_size=wordpiece_cache_size) if wordpiece_cache_size else None
 
-    def tokenize(self, inputs, never_split=None, **kwargs):
-        tokens = []
-        never_split = never_split + self.never_split if never_split is not None else self.never_split
+    def tokenize(self, inputs, never_split=None, max_tokens=None, **kwargs):
+        """Tokenize a text into word pieces.
+
+        Args:
+            inputs: The text
+            never_split: (`optional`) Tokens not to split, in addition to the ones of the constructor
+            max_tokens: (`optional`) Stop after this many tokens, the rest of the text is not tokenized
+
+        Returns:
+            A list of tokens
+        """
+        tokens = self.iter_tokenize(inputs, never_split=never_split)
+        if max_tokens is not None:
+            tokens = itertools.islice(tokens, max(max_tokens, 0))
+        return list(tokens)
+
+    def _protected(self, never_split=None):
+        """The protected tokens of a call that are in the vocab, the others are tokenized like other text.
+
+        A protected token that is not in the vocab is neither kept whole, e.g. its chinese chars are split
+        by the basic tokenizer, nor mapped to the unk token.
+        """
+        if not never_split:
+            return None
+        return [t for t in never_split if t in self.vocab] or None
+
+    def _atomic(self, never_split=None):
+        """Tokens emitted as is: special tokens, and the protected tokens that are in the vocab."""
+        if not never_split:
+            return self._atomic_tokens
+        return self._atomic_tokens.union(never_split)
+
+    def iter_tokenize(self, inputs, never_split=None, **kwargs):
+        """Lazy version of `tokenize`, the text is tokenized as the tokens are consumed."""
+        never_split = self._protected(never_split)
+        atomic = self._atomic(never_split)
         if self.do_basic_tokenization:
-            for token in self.basic_tokenizer.tokenize(inputs, never_split=never_split):
-                for t in self.wordpiece_tokenizer.tokenize(token):
-                    tokens.append(t)
+            for token in self.basic_tokenizer.iter_tokenize(inputs, never_split=never_split):
+                if token in atomic:
+                    yield token
+                else:
+                    yield from self._wordpieces(token)
         else:
-            tokens = self.wordpiece_tokenizer.tokenize(inputs)
+            matcher = self.added_tokens
+            if never_split:
+                matcher = AddedTokenMatcher(self.added_tokens.tokens.union(never_split))
+            for piece, is_protected in matcher.iter_split(inputs):
+                if is_protected and piece in atomic:
+                    yield piece
+                    continue
+                for m in _NON_WHITESPACE.finditer(piece):
+                    yield from self.wordpiece_tokenizer.tokenize(m.group())
+
+    def _wordpieces(self, token):
+        cache = self.wordpiece_cache
+        if cache is None:
+            return self.wordpiece_tokenizer.tokenize(token)
+        pieces = cache.get(token)
+        if pieces is None:
+            pieces = tuple(self.wordpiece_tokenizer.tokenize(token))
+            cache.put(token, pieces)
+        return pieces
+
+    def count_tokens(self, inputs, never_split=None, max_tokens=None, **kwargs):
+        """Number of tokens of a text, the word pieces are counted without building them.
+
+        Args:
+            inputs: The text
+            never_split: (`optional`) Tokens not to split, in addition to the ones of the constructor
+            max_tokens: (`optional`) Stop counting at this many tokens, i.e. returns `min(count, max_tokens)`
+        """
+        if not self.do_basic_tokenization:
+            tokens = self.iter_tokenize(inputs, never_split=never_split)
+            if max_tokens is not None:
+                tokens = itertools.islice(tokens, max(max_tokens, 0))
+            return sum(1 for _ in tokens)
+        never_split = self._protected(never_split)
+        atomic = self._atomic(never_split)
+        cache = self.wordpiece_cache
+        count = 0
+        if max_tokens is not None and max_tokens <= 0:
+            return 0
+        for token in self.basic_tokenizer.iter_tokenize(inputs, never_split=never_split):
+            if token in atomic:
+                count += 1
+            else:
+                pieces = cache.get(token) if cache is not None else None
+                count += len(pieces) if pieces is not None else self.wordpiece_tokenizer.count_word(token)
+            if max_tokens is not None and count >= max_tokens:
+                return max_tokens
+        return count
+
+    def tokenize_with_offsets(self, inputs, never_split=None, **kwargs):
+        """Tokenize a text into word pieces, and map every word piece back to the text.
+
+        Returns:
+            A tuple of (tokens, spans), spans is an `int64` array of shape [num_tokens, 2], the source
+            of the i-th token is `inputs[spans[i, 0]:spans[i, 1]]`
+        """
+        never_split = self._protected(never_split)
+        atomic = self._atomic(never_split)
+        tokens, spans = [], []
+        if self.do_basic_tokenization:
+            words = self.basic_tokenizer._tokenize_with_char_maps(inputs, never_split=never_split)
+        else:
+            words = self._words_with_char_maps(inputs, never_split=never_split)
+        for word, starts, ends in words:
+            pieces = [word] if word in atomic else self._wordpieces(word)
+            if len(pieces) == 1:
+                tokens.append(pieces[0])
+                spans.append((starts[0], ends[-1]))
+                continue
+            offset = 0
+            exact = sum(len(p) - 2 if i else len(p) for i, p in enumerate(pieces)) == len(word)
+            for i, piece in enumerate(pieces):
+                tokens.append(piece)
+                if not exact:
+                    spans.append((starts[0], ends[-1]))
+                    continue
+                size = len(piece) - 2 if i else len(piece)
+                spans.append((starts[offset], ends[offset + size - 1]))
+                offset += size
+        return tokens, np.array(spans, dtype=np.int64).reshape(-1, 2)
+
+    def _words_with_char_maps(self, inputs, never_split=None):
+        matcher = AddedTokenMatcher(self.added_tokens.tokens.union(never_split)) if never_split else self.added_tokens
+        pos = 0
+        for start, end in itertools.chain(matcher.finditer(inputs), [(len(inputs), len(inputs))]):
+            for m in _NON_WHITESPACE.finditer(inputs, pos, start):
+                yield m.group(), list(range(m.start(), m.end())), list(range(m.start() + 1, m.end() + 1))
+            if end > start:
+                yield inputs[start:end], list(range(start, end)), list(range(start + 1, end + 1))
+            pos = end
+
+    def encode_windows(self, inputs, max_length, stride, never_split=None, **kwargs):
+        """Tokenize a long text once, and split the ids into overlapping windows.
+
+        Args:
+            inputs: The text
+            max_length: Max number of tokens of a window
+            stride: Number of tokens between the starts of two windows, windows overlap if it is less than
+                `max_length`. The last window always ends at the last token.
+            never_split: (`optional`) Tokens not to split, in addition to the ones of the constructor
+
+        Returns:
+            A list of `Window`s of (ids, offset, spans, char_start, char_end). `ids` and `spans` are views
+            into one `int32` id array and one span array of the whole text, `offset` is the index of the
+            first token of the window, `spans` are the character spans of the tokens, and the window
+            covers `inputs[char_start:char_end]`.
+        """
+        if max_length <= 0:
+            raise ValueError('max_length must be positive, got {}'.format(max_length))
+        if stride <= 0 or stride > max_length:
+            raise ValueError('stride must be in [1, max_length], got {}'.format(stride))
+        tokens, spans = self.tokenize_with_offsets(inputs, never_split=never_split)
+        ids = np.array(self.tokens2ids(tokens), dtype=np.int32)
+        n = len(ids)
+        starts = list(range(0, max(n - max_length, 0) + 1, stride))
+        if starts[-1] + max_length < n:
+            starts.append(n - max_length)
+        windows = []
+        for start in starts:
+            end = min(start + max_length, n)
+            char_start = int(spans[start, 0]) if end > start else 0
+            char_end = int(spans[start:end, 1].max()) if end > start else 0
+            windows.append(Window(
+                ids=ids[start:end], offset=start, spans=spans[start:end], char_start=char_start, char_end=char_end))
+        return windows
+
+    def _encode_truncated(self, inputs, max_length=None, truncation=True, add_bos=False, add_eos=False, **kwargs):
+        # stop tokenizing once the truncated length is reached
+        if truncation and max_length is not None and kwargs.get('max_tokens') is None:
+            kwargs['max_tokens'] = max(max_length - int(add_bos) - int(add_eos), 0)
+        return super()._encode_truncated(
+            inputs, max_length=max_length, truncation=truncation, add_bos=add_bos, add_eos=add_eos, **kwargs)
+
+    def _compiled_state(self):
+        state = super()._compiled_state()
+        # the word piece tokenizer shares the vocab, which is saved separately
+        wordpiece_tokenizer = copy.copy(self.wordpiece_tokenizer)
+        wordpiece_tokenizer.vocab = None
+        state['wordpiece_tokenizer'] = wordpiece_tokenizer
+        return state
+
+    def _restore_compiled_state(self, state, vocab):
+        super()._restore_compiled_state(state, vocab)
+        self.wordpiece_tokenizer.vocab = self.vocab
 
-        return tokens
+    def wordpiece_cache_stats(self):
+        """Counters of the word piece cache, None if the cache is disabled."""
+        if self.wordpiece_cache is None:
+            return None
+        return self.wordpiece_cache.stats()
@@ -21,6 +21,89 @@ class TransformerTokenizerTest(unittest.TestCase):
         self.assertEqual(21127, tokenizer.bos_id)
         self.assertEqual(21128, tokenizer.eos_id)
 
+    def testWordpieceCache(self):
+        tokenizer = TransformerTokenizer(vocab_file='testdata/vocab_chinese.txt')
+        cached = TransformerTokenizer(vocab_file='testdata/vocab_chinese.txt', wordpiece_cache_size=3)
+        self.assertIsNone(tokenizer.wordpiece_cache_stats())
+
+        text = 'hello world, hello naivenlp! 你好世界'
+        self.assertEqual(tokenizer.tokenize(text), cached.tokenize(text))
+        self.assertEqual(tokenizer.tokenize(text), cached.tokenize(text))
+        stats = cached.wordpiece_cache_stats()
+        self.assertEqual(3, stats['size'])
+        self.assertEqual(2 * len(tokenizer.basic_tokenizer.tokenize(text)), stats['hits'] + stats['misses'])
+        self.assertGreater(stats['hits'], 0)
+        self.assertGreater(stats['evictions'], 0)
+
+    def testMaxTokens(self):
+        tokenizer = TransformerTokenizer(vocab_file='testdata/vocab_chinese.txt', wordpiece_cache_size=16)
+        text = 'hello world, naivenlp tokenization! 你好世界 [UNK] ' * 100
+        tokens = tokenizer.tokenize(text)
+        for max_tokens in [0, 1, 7, 100, len(tokens), len(tokens) + 1]:
+            self.assertEqual(tokens[:max_tokens], tokenizer.tokenize(text, max_tokens=max_tokens))
+            self.assertEqual(min(max_tokens, len(tokens)), tokenizer.count_tokens(text, max_tokens=max_tokens))
+        self.assertEqual(len(tokens), tokenizer.count_tokens(text))
+        self.assertEqual(tokens, list(tokenizer.iter_tokenize(text)))
+
+        batch = tokenizer.encode_batch([text, 'hello'], max_length=10, add_bos=True, add_eos=True)
+        self.assertEqual(
+            [tokenizer.bos_id] + tokenizer.tokens2ids(tokens[:8]) + [tokenizer.eos_id], batch.ids[0].tolist())
+
+        tokenizer = TransformerTokenizer(vocab_file='testdata/vocab_chinese.txt', do_basic_tokenization=False)
+        tokens = tokenizer.tokenize('hello world naivenlp')
+        self.assertEqual(tokens[:2], tokenizer.tokenize('hello world naivenlp', max_tokens=2))
+        self.assertEqual(len(tokens), tokenizer.count_tokens('hello world naivenlp'))
+
+    def testEncodeWindows(self):
+        tokenizer = TransformerTokenizer(vocab_file='testdata/vocab_chinese.txt', mask_token='[MASK]')
+        text = 'Hello, Wörld! 你好 unaffable x[MASK]y'
+        tokens, spans = tokenizer.tokenize_with_offsets(text)
+        self.assertEqual(tokenizer.tokenize(text), tokens)
+        self.assertEqual(
+            ['Hello', ',', 'Wörld', '!', '你', '好', 'u', 'na', 'ff', 'able', 'x', '[MASK]', 'y'],
+            [text[a:b] for a, b in spans])
+
+        text = text * 5
+        ids = tokenizer.encode(text)
+        windows = tokenizer.encode_windows(text, max_length=8, stride=5)
+        self.assertEqual(list(range(0, len(ids) - 8, 5)) + [len(ids) - 8], [w.offset for w in windows])
+        for w in windows:
+            self.assertEqual(ids[w.offset:w.offset + 8], w.ids.tolist())
+            self.assertIs(windows[0].ids.base, w.ids.base)
+            self.assertEqual(w.char_start, w.spans[0, 0])
+            self.assertEqual(w.char_end, w.spans[-1, 1])
+
+        self.assertEqual(1, len(tokenizer.encode_windows('hello', max_length=8, stride=8)))
+        self.assertEqual(0, len(tokenizer.encode_windows('', max_length=8, stride=8)[0].ids))
+        with self.assertRaises(ValueError):
+            tokenizer.encode_windows(text, max_length=8, stride=9)
+
+    def testProtectedTokens(self):
+        tokenizer = TransformerTokenizer(
+            vocab_file='testdata/vocab_chinese.txt', mask_token='[MASK]', never_split=['[unused1]', '天安门'])
+        self.assertEqual(
+            ['hello', '[MASK]', '[unused1]', '!', '我', '爱', 'x', '[MASK]', 's'],
+            tokenizer.tokenize('hello[MASK] [unused1]!我爱x[MASK]s'))
+        self.assertEqual(['[UNK]', 'is', 'good'], tokenizer.tokenize('[UNK] is good'))
+        self.assertEqual(['[unused1]', 'a'], tokenizer.tokenize('[unused1]a'))
+        self.assertEqual(['hello', '[MASK]'], tokenizer.tokenize('hello [MASK]', never_split=['hello']))
+
+        # a protected term that is not in the vocab is tokenized like other text, as if it was not protected
+        self.assertEqual(['我', '爱', '天', '安', '门'], tokenizer.tokenize('我爱天安门'))
+        self.assertEqual([2768, 4262, 1920, 2127, 7304], tokenizer.encode('我爱天安门'))
+        self.assertEqual(['我', '爱', '天'], tokenizer.tokenize('我爱天', never_split=['我爱']))
+        tokens, _ = tokenizer.tokenize_with_offsets('我爱天安门')
+        self.assertEqual(['我', '爱', '天', '安', '门'], tokens)
+        self.assertEqual(5, tokenizer.count_tokens('我爱天安门'))
+
+        tokenizer = TransformerTokenizer(vocab_file='testdata/vocab_chinese.txt', split_special_tokens=True)
+        self.assertEqual(['[', 'u', '##nk', ']'], tokenizer.tokenize('[UNK]'))
+
+        tokenizer = TransformerTokenizer(
+            vocab_file='testdata/vocab_chinese.txt', do_basic_tokenization=False, never_split=['[unused1]', '天安门'])
+        self.assertEqual(['[UNK]', '[unused1]', '我'], tokenizer.tokenize('[UNK][unused1] 我'))
+        self.assertEqual(['[UNK]', '天', '##安', '##门', '我'], tokenizer.tokenize('[UNK]天安门 我'))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,245 @@
+import collections.abc
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'NNLPVOCB'
+VERSION = 1
+
+# magic, version, number of tokens, size of the id table, size of the hash table, size of the blob
+_HEADER = struct.Struct('<8sIIIIQ')
+
+
+def _align(n, alignment=8):
+    return (n + alignment - 1) // alignment * alignment
+
+
+class CompactVocab(collections.abc.Mapping):
+    """Immutable token -> id mapping, stored in a few flat arrays instead of Python objects.
+
+    Layout:
+        blob: utf-8 bytes of all tokens in sorted order
+        offsets: uint32, token i of the sorted order is blob[offsets[i]:offsets[i + 1]]
+        ids: int32, id of token i of the sorted order
+        index_of_id: int32, sorted index of every id, -1 if the id is not used
+        table: int32, open addressing hash table (crc32, linear probing) of sorted indexes
+
+    The arrays can be saved into one file and loaded with mmap, so that processes loading the
+    same file share the pages.
+    """
+
+    def __init__(self, blob, offsets, ids, index_of_id, table, blob_start=0):
+        # path of the mapped file and the offset of the vocab in it, if loaded by `load`
+        self.path = None
+        self.offset = 0
+        self._blob = blob
+        self._blob_start = blob_start
+        self.offsets = offsets
+        self.ids = ids
+        self.index_of_id = index_of_id
+        self.table = table
+        self._mask = len(table) - 1
+        # memoryviews index into the arrays much faster than numpy scalars
+        self._offsets_view = memoryview(offsets)
+        self._ids_view = memoryview(ids)
+        self._index_of_id_view = memoryview(index_of_id)
+        self._table_view = memoryview(table)
+
+    @classmethod
+    def from_dict(cls, vocab):
+        """Build from a token -> id dict."""
+        items = sorted((token.encode('utf8'), _id) for token, _id in vocab.items())
+        lengths = np.fromiter((len(t) for t, _ in items), dtype=np.int64, count=len(items))
+        offsets = np.zeros(len(items) + 1, dtype=np.uint32)
+        np.cumsum(lengths, out=offsets[1:])
+        blob = b''.join(t for t, _ in items)
+        ids = np.array([_id for _, _id in items], dtype=np.int32)
+
+        size = int(ids.max()) + 1 if len(ids) else 0
+        index_of_id = np.full(size, -1, dtype=np.int32)
+        index_of_id[ids] = np.arange(len(ids), dtype=np.int32)
+
+        table_size = 1
+        while table_size < 2 * len(items):
+            table_size *= 2
+        table = np.full(table_size, -1, dtype=np.int32)
+        mask = table_size - 1
+        for i, (t, _) in enumerate(items):
+            slot = zlib.crc32(t) & mask
+            while table[slot] >= 0:
+                slot = (slot + 1) & mask
+            table[slot] = i
+        return cls(blob, offsets, ids, index_of_id, table)
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        """Build from a list of tokens, the id of a token is its index, the last one wins for duplicates."""
+        return cls.from_dict({t: i for i, t in enumerate(tokens)})
+
+    def _token_bytes(self, index):
+        start = self._blob_start
+        return self._blob[start + self._offsets_view[index]:start + self._offsets_view[index + 1]]
+
+    def _index_of(self, token):
+        key = token.encode('utf8')
+        table = self._table_view
+        mask = self._mask
+        slot = zlib.crc32(key) & mask
+        while True:
+            index = table[slot]
+            if index < 0:
+                return -1
+            if self._token_bytes(index) == key:
+                return index
+            slot = (slot + 1) & mask
+
+    def __getitem__(self, token):
+        if not isinstance(token, str):
+            raise KeyError(token)
+        index = self._index_of(token)
+        if index < 0:
+            raise KeyError(token)
+        return self._ids_view[index]
+
+    def get(self, token, default=None):
+        if not isinstance(token, str):
+            return default
+        index = self._index_of(token)
+        if index < 0:
+            return default
+        return self._ids_view[index]
+
+    def __contains__(self, token):
+        return isinstance(token, str) and self._index_of(token) >= 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        """Tokens in the order of ids."""
+        index_of_id = self._index_of_id_view
+        for _id in range(len(index_of_id)):
+            index = index_of_id[_id]
+            if index >= 0:
+                yield self._token_bytes(index).decode('utf8')
+
+    def token_of(self, _id, default=None):
+        """The token of id, or `default` if the id is not used."""
+        if not isinstance(_id, (int, np.integer)) or _id < 0 or _id >= len(self._index_of_id_view):
+            return default
+        index = self._index_of_id_view[_id]
+        if index < 0:
+            return default
+        return self._token_bytes(index).decode('utf8')
+
+    def reverse(self):
+        """An id -> token mapping that shares the arrays of this vocab."""
+        return ReverseCompactVocab(self)
+
+    def to_bytes(self):
+        blob = bytes(self._token_bytes_range())
+        header = _HEADER.pack(MAGIC, VERSION, len(self.ids), len(self.index_of_id), len(self.table), len(blob))
+        parts = [header]
+        size = len(header)
+        for array in [self.offsets, self.ids, self.index_of_id, self.table]:
+            padding = _align(size) - size
+            parts.append(b'\0' * padding)
+            parts.append(array.tobytes())
+            size += padding + array.nbytes
+        parts.append(blob)
+        return b''.join(parts)
+
+    def _token_bytes_range(self):
+        start = self._blob_start
+        return self._blob[start:start + self._offsets_view[len(self.ids)]]
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        """Load from a buffer, e.g. a `bytes` or a `mmap`, without copying the arrays."""
+        magic, version, n, id_table_size, table_size, blob_size = _HEADER.unpack_from(buffer, offset)
+        if magic != MAGIC:
+            raise ValueError('Invalid compact vocab: bad magic {}'.format(magic))
+        if version != VERSION:
+            raise ValueError('Unsupported compact vocab version: {}'.format(version))
+        pos = offset + _HEADER.size
+        arrays = []
+        for dtype, count in [(np.uint32, n + 1), (np.int32, n), (np.int32, id_table_size), (np.int32, table_size)]:
+            pos = offset + _align(pos - offset)
+            arrays.append(np.frombuffer(buffer, dtype=dtype, count=count, offset=pos))
+            pos += arrays[-1].nbytes
+        offsets, ids, index_of_id, table = arrays
+        return cls(buffer, offsets, ids, index_of_id, table, blob_start=pos)
+
+    def save(self, path):
+        with open(path, mode='wb') as fout:
+            fout.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path, use_mmap=True, offset=0):
+        """Load a saved vocab. With `use_mmap`, the file is mapped read-only and shared between processes.
+
+        Args:
+            path: The file
+            use_mmap: Map the file instead of reading it
+            offset: Offset of the vocab in the file, e.g. the vocab section of a compiled tokenizer
+        """
+        with open(path, mode='rb') as fin:
+            if not use_mmap:
+                fin.seek(offset)
+                return cls.from_buffer(fin.read())
+            if os.fstat(fin.fileno()).st_size == 0:
+                raise ValueError('Empty compact vocab file: {}'.format(path))
+            buffer = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        vocab = cls.from_buffer(buffer, offset)
+        vocab.path = path
+        vocab.offset = offset
+        return vocab
+
+    def __getstate__(self):
+        # a mapped vocab is mapped again by the receiver, e.g. a worker process, so the pages are shared
+        if self.path is not None:
+            return {'path': self.path, 'offset': self.offset}
+        return {'bytes': self.to_bytes()}
+
+    def __setstate__(self, state):
+        if 'path' in state:
+            other = CompactVocab.load(state['path'], offset=state.get('offset', 0))
+        else:
+            other = CompactVocab.from_buffer(state['bytes'])
+        self.__dict__.update(other.__dict__)
+
+    @staticmethod
+    def is_compact_file(path):
+        if not path or not os.path.isfile(path):
+            return False
+        with open(path, mode='rb') as fin:
+            return fin.read(len(MAGIC)) == MAGIC
+
+
+class ReverseCompactVocab(collections.abc.Mapping):
+    """Id -> token view of a `CompactVocab`."""
+
+    def __init__(self, vocab):
+        self.vocab = vocab
+
+    def __getitem__(self, _id):
+        token = self.vocab.token_of(_id)
+        if token is None:
+            raise KeyError(_id)
+        return token
+
+    def get(self, _id, default=None):
+        return self.vocab.token_of(_id, default)
+
+    def __contains__(self, _id):
+        return self.vocab.token_of(_id) is not None
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def __iter__(self):
+        index_of_id = self.vocab.index_of_id
+        return iter(np.nonzero(index_of_id >= 0)[0].tolist())
@@ -0,0 +1,78 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from .bert_tokenizer import BertTokenizer
+from .tokenizer import load_vocab
+from .vocab import CompactVocab
+
+
+class CompactVocabTest(unittest.TestCase):
+
+    def testCompactVocab(self):
+        d = load_vocab('testdata/vocab_chinese.txt')
+        vocab = CompactVocab.from_dict(d)
+        self.assertEqual(len(d), len(vocab))
+        for token, _id in d.items():
+            self.assertEqual(_id, vocab[token])
+            self.assertEqual(token, vocab.token_of(_id))
+        self.assertEqual(list(d.keys()), list(vocab))
+        self.assertIsNone(vocab.get('not-in-vocab'))
+        self.assertNotIn('not-in-vocab', vocab)
+        self.assertNotIn(1, vocab)
+        with self.assertRaises(KeyError):
+            vocab['not-in-vocab']
+
+        reverse = vocab.reverse()
+        self.assertEqual('[UNK]', reverse[100])
+        self.assertEqual('x', reverse.get(len(d), 'x'))
+        self.assertEqual(len(d), len(reverse))
+
+        empty = CompactVocab.from_dict({})
+        self.assertEqual(0, len(empty))
+        self.assertNotIn('a', empty)
+
+    def testSaveAndLoad(self):
+        vocab = CompactVocab.from_tokens(['a', 'b', '你好', '##c'])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'vocab.bin')
+            vocab.save(path)
+            self.assertTrue(CompactVocab.is_compact_file(path))
+            for use_mmap in [True, False]:
+                loaded = CompactVocab.load(path, use_mmap=use_mmap)
+                self.assertEqual(dict(vocab.items()), dict(loaded.items()))
+                self.assertEqual(2, loaded['你好'])
+                self.assertEqual('##c', loaded.token_of(3))
+                unpickled = pickle.loads(pickle.dumps(loaded))
+                self.assertEqual(dict(vocab.items()), dict(unpickled.items()))
+            self.assertEqual(path, pickle.loads(pickle.dumps(CompactVocab.load(path))).path)
+
+    def testTokenizer(self):
+        tokenizer = BertTokenizer(vocab_file='testdata/vocab_chinese.txt', bos_token='<S>', eos_token='</S>')
+        compact = BertTokenizer(
+            vocab_file='testdata/vocab_chinese.txt', bos_token='<S>', eos_token='</S>', compact_vocab=True)
+        self.assertIsInstance(compact.vocab, CompactVocab)
+        self.assertEqual(tokenizer.eos_id, compact.eos_id)
+        self.assertEqual(tokenizer.vocab_size, compact.vocab_size)
+        text = 'Hello World, 你好世界! unaffable'
+        ids = tokenizer.encode(text)
+        self.assertEqual(ids, compact.encode(text))
+        self.assertEqual(tokenizer.ids2tokens(ids), compact.ids2tokens(ids))
+        # no matcher trie over the whole vocab, the compact vocab is matched greedily
+        self.assertIsNotNone(tokenizer.wordpiece_tokenizer.matcher)
+        self.assertIsNone(compact.wordpiece_tokenizer.matcher)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'vocab.bin')
+            compact.vocab.save(path)
+            loaded = BertTokenizer(vocab_file=path, bos_token='<S>', eos_token='</S>', compact_vocab=True)
+            self.assertEqual(path, loaded.vocab.path)
+            self.assertEqual(ids, loaded.encode(text))
+            extended = BertTokenizer(vocab_file=path, bos_token='<S>', eos_token='<E>', compact_vocab=True)
+            self.assertEqual(tokenizer.vocab_size + 1, extended.vocab_size)
+            self.assertEqual(tokenizer.vocab_size, extended.eos_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,308 @@
+"""Train a WordPiece vocab from a text corpus.
+
+The corpus is pre-tokenized by a `BasicTokenizer` and the words are counted in a pool of worker
+processes (map), the per chunk counts are summed up in the main process (reduce). Every word is then
+split into chars, the first char as is and the following ones with the `##` suffix indicator, and the
+most frequent pair of adjacent pieces is merged into a new piece until the vocab is full.
+
+The pair counts are updated incrementally: a merge only visits the words that contain the merged
+pair, and the max pair is taken from a lazy heap whose stale entries are fixed when they are popped.
+
+The vocab file has one token per line, so it loads in `TransformerTokenizer` and `BertTokenizer`.
+
+Usage:
+    python -m naivenlp.tokenizers.wordpiece_trainer \\
+        --input_files corpus-0.txt corpus-1.txt --vocab_file vocab.txt --vocab_size 30000 --num_workers 8
+"""
+import argparse
+import collections
+import heapq
+import logging
+import os
+
+from naivenlp.utils.parallel import ChunkPool, read_chunks
+
+from .tokenizer import BasicTokenizer
+
+DEFAULT_SPECIAL_TOKENS = ('[PAD]', '[UNK]', '[BOS]', '[EOS]', '[CLS]', '[SEP]', '[MASK]')
+
+
+class _ChunkCounter(object):
+
+    def __init__(self, basic_tokenizer):
+        self.basic_tokenizer = basic_tokenizer
+
+    def __call__(self, lines):
+        counts = collections.Counter()
+        for line in lines:
+            counts.update(self.basic_tokenizer.tokenize(line))
+        return counts
+
+
+def count_words(input_files, basic_tokenizer=None, num_workers=None, chunk_size=10000, max_pending_chunks=None):
+    """Count the words of text files, pre-tokenized by a `BasicTokenizer`.
+
+    Args:
+        input_files: A list of text files
+        basic_tokenizer: (`optional`) A `BasicTokenizer`, defaults to a lower casing one
+        num_workers: Number of worker processes, defaults to the number of CPUs. 1 counts in this process.
+        chunk_size: Number of lines in a chunk of work
+        max_pending_chunks: Max number of chunks in flight, defaults to 2 * num_workers
+
+    Returns:
+        A `collections.Counter` of word -> frequency
+    """
+    basic_tokenizer = basic_tokenizer or BasicTokenizer()
+    num_workers = num_workers or os.cpu_count() or 1
+    max_pending_chunks = max_pending_chunks or 2 * num_workers
+    counter = _ChunkCounter(basic_tokenizer)
+    chunks = read_chunks(input_files, chunk_size)
+
+    counts = collections.Counter()
+    if num_workers <= 1:
+        for chunk in chunks:
+            counts.update(counter(chunk))
+        return counts
+
+    with ChunkPool(counter, num_workers) as pool:
+        for chunk_counts in pool.imap(chunks, max_pending=max_pending_chunks):
+            counts.update(chunk_counts)
+    return counts
+
+
+class _PairStats(object):
+    """Counts of adjacent piece pairs, and the words they occur in."""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.counts = collections.defaultdict(int)
+        self.where = collections.defaultdict(set)
+        self.heap = []
+        self.new_pairs = set()
+
+    def add_word(self, index, word, freq):
+        for pair in zip(word, word[1:]):
+            self.counts[pair] += freq
+            self.where[pair].add(index)
+
+    def push(self, pair):
+        a, b = pair
+        # ties are broken by the pieces, so the merges do not depend on the order of the words
+        heapq.heappush(self.heap, (-self.counts[pair], self.pieces[a], self.pieces[b], a, b))
+
+    def pop(self):
+        """The most frequent pair and its count, or None if there are no pairs left."""
+        while self.heap:
+            neg_count, _, _, a, b = heapq.heappop(self.heap)
+            count = self.counts.get((a, b), 0)
+            if count and count == -neg_count:
+                return (a, b), count
+            # a stale entry, put it back with the current count
+            if count > 0:
+                self.push((a, b))
+        return None
+
+    def merge(self, index, word, positions, piece, freq):
+        """Merge the pairs of word that start at `positions` into `piece`, returns the merged word.
+
+        Only the pairs that overlap a merged pair change, the new pairs are recorded in `new_pairs`.
+        """
+        counts = self.counts
+        last = -1
+        for i in positions:
+            for j in range(max(i - 1, last + 1, 0), min(i + 2, len(word) - 1)):
+                pair = word[j], word[j + 1]
+                count = counts[pair] - freq
+                if count:
+                    counts[pair] = count
+                else:
+                    del counts[pair]
+                last = j
+
+        merged, start = [], 0
+        for i in positions:
+            merged.extend(word[start:i])
+            merged.append(piece)
+            start = i + 2
+        merged.extend(word[start:])
+
+        last = -1
+        for k, i in enumerate(positions):
+            p = i - k
+            for j in range(max(p - 1, last + 1, 0), min(p + 1, len(merged) - 1)):
+                pair = merged[j], merged[j + 1]
+                counts[pair] += freq
+                self.where[pair].add(index)
+                self.new_pairs.add(pair)
+                last = j
+        return merged
+
+
+def _find_pairs(word, a, b):
+    """Start positions of the `a b`s of word, matched from left to right without overlaps."""
+    positions, i, end = [], 0, len(word) - 1
+    while True:
+        try:
+            i = word.index(a, i, end)
+        except ValueError:
+            return positions
+        if word[i + 1] == b:
+            positions.append(i)
+            i += 2
+        else:
+            i += 1
+
+
+def train_wordpiece(word_counts,
+                    vocab_size=30000,
+                    min_frequency=2,
+                    special_tokens=DEFAULT_SPECIAL_TOKENS,
+                    suffix_indicator='##',
+                    max_input_chars_per_word=100):
+    """Learn a WordPiece vocab from word counts.
+
+    Args:
+        word_counts: A dict of word -> frequency, e.g. the output of `count_words`
+        vocab_size: Size of the vocab, including the special tokens and all the chars.
+            The chars are always kept, so the vocab can be larger than this.
+        min_frequency: Stop merging when the most frequent pair occurs less than this
+        special_tokens: Tokens put at the start of the vocab
+        suffix_indicator: Prefix of the pieces that continue a word
+        max_input_chars_per_word: Skip longer words, the tokenizers map them to the unk token
+
+    Returns:
+        A list of tokens, the index of a token is its id
+    """
+    words, freqs = [], []
+    char_counts = collections.Counter()
+    for word, freq in word_counts.items():
+        if not word or len(word) > max_input_chars_per_word or word in special_tokens:
+            continue
+        words.append(word)
+        freqs.append(freq)
+        char_counts[word[0]] += freq
+        for c in word[1:]:
+            char_counts[suffix_indicator + c] += freq
+
+    tokens = list(special_tokens)
+    index = {t: i for i, t in enumerate(tokens)}
+    for piece, _ in sorted(char_counts.items(), key=lambda x: (-x[1], x[0])):
+        if piece not in index:
+            index[piece] = len(tokens)
+            tokens.append(piece)
+
+    # ids of the pieces, a piece can be merged from different pairs, e.g. `ab` + `##c` and `a` + `##bc`
+    pieces, piece_ids = [], {}
+
+    def _piece_id(piece):
+        if piece not in piece_ids:
+            piece_ids[piece] = len(pieces)
+            pieces.append(piece)
+        return piece_ids[piece]
+
+    stats = _PairStats(pieces)
+    sequences = []
+    for i, (word, freq) in enumerate(zip(words, freqs)):
+        seq = [_piece_id(word[0])] + [_piece_id(suffix_indicator + c) for c in word[1:]]
+        sequences.append(seq)
+        stats.add_word(i, seq, freq)
+    for pair in stats.counts:
+        stats.push(pair)
+
+    num_merges = 0
+    while len(tokens) < vocab_size:
+        top = stats.pop()
+        if top is None or top[1] < min_frequency:
+            break
+        (a, b), _ = top
+        piece = pieces[a] + pieces[b][len(suffix_indicator):]
+        c = _piece_id(piece)
+        if piece not in index:
+            index[piece] = len(tokens)
+            tokens.append(piece)
+
+        for i in stats.where.pop((a, b), ()):
+            positions = _find_pairs(sequences[i], a, b)
+            # empty if the pair was merged away by an earlier merge
+            if positions:
+                sequences[i] = stats.merge(i, sequences[i], positions, c, freqs[i])
+        # only the pairs of the new piece get larger counts, the other pairs are fixed lazily
+        for pair in stats.new_pairs:
+            stats.push(pair)
+        stats.new_pairs.clear()
+        num_merges += 1
+
+    logging.info('Learned %d merges from %d words, vocab size: %d', num_merges, len(words), len(tokens))
+    return tokens
+
+
+def save_vocab(tokens, vocab_file):
+    """Write tokens into a vocab file, one token per line."""
+    output_dir = os.path.dirname(os.path.abspath(vocab_file))
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with open(vocab_file, mode='wt', encoding='utf8') as fout:
+        for token in tokens:
+            fout.write(token + '\n')
+
+
+def train_vocab(input_files,
+                vocab_file,
+                vocab_size=30000,
+                min_frequency=2,
+                special_tokens=DEFAULT_SPECIAL_TOKENS,
+                do_lower_case=True,
+                tokenize_chinese_chars=True,
+                num_workers=None,
+                chunk_size=10000,
+                **kwargs):
+    """Count the words of text files, learn a WordPiece vocab and write it into `vocab_file`.
+
+    Args:
+        input_files: A list of text files
+        vocab_file: The output vocab file
+        vocab_size: Size of the vocab, see `train_wordpiece`
+        min_frequency: Min frequency of a merged pair
+        special_tokens: Tokens put at the start of the vocab
+        do_lower_case: Lower case the texts, must match the tokenizer that loads the vocab
+        tokenize_chinese_chars: Split chinese chars, must match the tokenizer that loads the vocab
+        num_workers: Number of worker processes to count the words
+        chunk_size: Number of lines in a chunk of work
+        kwargs: Other args of `train_wordpiece`
+
+    Returns:
+        A list of tokens of the vocab
+    """
+    basic_tokenizer = BasicTokenizer(
+        do_lower_case=do_lower_case, never_split=special_tokens, tokenize_chinese_chars=tokenize_chinese_chars)
+    word_counts = count_words(input_files, basic_tokenizer, num_workers=num_workers, chunk_size=chunk_size)
+    tokens = train_wordpiece(
+        word_counts, vocab_size=vocab_size, min_frequency=min_frequency, special_tokens=special_tokens, **kwargs)
+    save_vocab(tokens, vocab_file)
+    return tokens
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train a WordPiece vocab from text files.')
+    parser.add_argument('--input_files', type=str, nargs='+', required=True)
+    parser.add_argument('--vocab_file', type=str, required=True)
+    parser.add_argument('--vocab_size', type=int, default=30000)
+    parser.add_argument('--min_frequency', type=int, default=2)
+    parser.add_argument('--num_workers', type=int, default=None)
+    parser.add_argument('--chunk_size', type=int, default=10000)
+    parser.add_argument('--no_lower_case', action='store_true')
+    args = parser.parse_args(argv)
+
+    tokens = train_vocab(
+        args.input_files,
+        args.vocab_file,
+        vocab_size=args.vocab_size,
+        min_frequency=args.min_frequency,
+        do_lower_case=not args.no_lower_case,
+        num_workers=args.num_workers,
+        chunk_size=args.chunk_size)
+    print('Saved {} tokens to {}'.format(len(tokens), args.vocab_file))
+
+
+if __name__ == "__main__":
+    main()
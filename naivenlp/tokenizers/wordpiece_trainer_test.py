@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+from .transformer_tokenizer import TransformerTokenizer
+from .wordpiece_trainer import count_words, main, train_vocab, train_wordpiece
+
+
+class WordpieceTrainerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_files = []
+        lines = ['The lower, the lowest and the newest!', '我在上海工作 newer wider', 'low LOW lower [MASK] new'] * 20
+        for i in range(2):
+            path = os.path.join(self.tmp_dir.name, 'corpus-{}.txt'.format(i))
+            with open(path, mode='wt', encoding='utf8') as fout:
+                for line in lines:
+                    fout.write(line + '\n\n')
+            self.input_files.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def testCountWords(self):
+        for num_workers in [1, 2]:
+            counts = count_words(self.input_files, num_workers=num_workers, chunk_size=7)
+            self.assertEqual(120, counts['the'])
+            self.assertEqual(80, counts['low'])
+            self.assertEqual(40, counts['上'])
+            self.assertEqual(80, counts['lower'])
+            self.assertEqual(40, counts[','])
+
+    def testTrainWordpiece(self):
+        counts = {'low': 5, 'lower': 2, 'newest': 6, 'widest': 3}
+        tokens = train_wordpiece(counts, vocab_size=100, min_frequency=2, special_tokens=['[PAD]', '[UNK]'])
+        self.assertEqual(['[PAD]', '[UNK]'], tokens[:2])
+        self.assertEqual(len(tokens), len(set(tokens)))
+        # all the chars are kept
+        for piece in ['l', 'n', 'w', '##o', '##w', '##e', '##r', '##s', '##t', '##i', '##d']:
+            self.assertIn(piece, tokens)
+        # the most frequent pairs are merged first, ties are broken by the pieces
+        merges = tokens[tokens.index('##r') + 1:]
+        self.assertEqual(['##es', '##est', '##ow', 'low', '##ew', '##ewest', 'newest'], merges[:7])
+        self.assertEqual('lower', tokens[-1])
+
+        short = train_wordpiece(counts, vocab_size=len(tokens) - 3, min_frequency=2, special_tokens=[])
+        self.assertEqual(len(tokens) - 3, len(short))
+        self.assertEqual(tokens[2:len(short) + 2], short)
+
+        # merging the same pair repeatedly
+        tokens = train_wordpiece({'aaaa': 3}, vocab_size=100, min_frequency=1, special_tokens=[])
+        self.assertEqual(['##a', 'a', '##aa', '##aaa', 'aaaa'], tokens)
+
+    def testTrainVocab(self):
+        vocab_file = os.path.join(self.tmp_dir.name, 'out', 'vocab.txt')
+        tokens = train_vocab(self.input_files, vocab_file, vocab_size=40, min_frequency=2, num_workers=2, chunk_size=5)
+        self.assertEqual(40, len(tokens))
+
+        tokenizer = TransformerTokenizer(vocab_file, cls_token='[CLS]', sep_token='[SEP]', mask_token='[MASK]')
+        self.assertEqual(40, tokenizer.vocab_size)
+        self.assertEqual(0, tokenizer.pad_id)
+        self.assertEqual(1, tokenizer.unk_id)
+        words = count_words(self.input_files, tokenizer.basic_tokenizer, num_workers=1)
+        for word in words:
+            self.assertNotIn(tokenizer.unk_token, tokenizer.tokenize(word))
+        self.assertEqual(['the', 'low', '##est', '[MASK]', '上', '海'], tokenizer.tokenize('The lowest [MASK] 上海'))
+
+    def testMain(self):
+        vocab_file = os.path.join(self.tmp_dir.name, 'vocab.txt')
+        main(['--input_files'] + self.input_files +
+             ['--vocab_file', vocab_file, '--vocab_size', '30', '--num_workers', '1'])
+        with open(vocab_file, mode='rt', encoding='utf8') as fin:
+            self.assertEqual(30, len(fin.read().splitlines()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import importlib
+import sys
+
+
+def lazy_module_attributes(package_name, package_globals, attributes, submodules=()):
+    """Build the module level `__getattr__` and `__dir__` (PEP 562) of a package that imports lazily.
+
+    Args:
+        package_name: `__name__` of the package
+        package_globals: `globals()` of the package, resolved attributes are cached into it
+        attributes: A dict of attribute name -> module, relative modules are resolved against the package
+        submodules: Names of the subpackages or modules that are imported on first access
+
+    Python 3.6 does not call a module level `__getattr__`, so there the attributes are imported eagerly,
+    as the packages did before they imported lazily.
+
+    Returns:
+        A tuple of (__getattr__, __dir__)
+    """
+
+    def __getattr__(name):
+        if name in attributes:
+            module = importlib.import_module(attributes[name], package_name)
+            value = getattr(module, name)
+        elif name in submodules:
+            value = importlib.import_module('.' + name, package_name)
+        else:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(package_name, name))
+        package_globals[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(package_globals.keys()) | set(attributes.keys()) | set(submodules))
+
+    if sys.version_info < (3, 7):
+        for name in attributes:
+            __getattr__(name)
+    return __getattr__, __dir__
@@ -0,0 +1,131 @@
+"""Map a function over chunks of work in a pool of threads or processes.
+
+Used by the tokenizers, the data loader, the corpus encoder and the trainers, which all cut their
+inputs into chunks of lines and collect the results of the chunks in order.
+"""
+import collections
+import functools
+import multiprocessing
+import multiprocessing.pool
+import weakref
+
+_worker_fn = None
+
+
+def init_worker(holder):
+    """Initializer of a process pool, keeps the function `holder[0]` in the worker, so it is sent once."""
+    global _worker_fn
+    _worker_fn = holder[0] if holder else None
+
+
+def call_worker_fn(chunk, **kwargs):
+    """Apply the function kept by `init_worker` to a chunk, in a worker process."""
+    if _worker_fn is None:
+        raise RuntimeError('The worker was restarted after its pool was started, it has no function to apply.')
+    return _worker_fn(chunk, **kwargs)
+
+
+def read_chunks(files, chunk_size, skip_empty_lines=True):
+    """Read the lines of text files in chunks of `chunk_size` lines, without the line breaks.
+
+    Args:
+        files: A text file, or a list of text files read one after another
+        chunk_size: Number of lines of a chunk, the last chunk may be shorter
+        skip_empty_lines: Skip blank lines
+
+    Returns:
+        A generator of lists of lines
+    """
+    if isinstance(files, str):
+        files = [files]
+    chunk = []
+    for f in files:
+        with open(f, mode='rt', encoding='utf8') as fin:
+            for line in fin:
+                line = line.rstrip('\r\n')
+                if skip_empty_lines and not line.strip():
+                    continue
+                chunk.append(line)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+def _terminate(pool):
+    pool.terminate()
+    pool.join()
+
+
+class ChunkPool(object):
+    """A pool of threads or processes that applies a function to chunks, the results keep the order of the chunks.
+
+    A process pool sends the function, e.g. a bound method of a tokenizer, to every worker once. The
+    pool is terminated by `close`, or when it is garbage collected.
+
+    Usage:
+        with ChunkPool(tokenizer.tokenize_batch, num_workers=4) as pool:
+            for tokens in pool.imap(read_chunks('corpus.txt', 1000)):
+                ...
+    """
+
+    def __init__(self, fn, num_workers, executor='process'):
+        """Constructs a ChunkPool.
+
+        Args:
+            fn: A function that takes a chunk and keyword arguments, it must be picklable for a `process` pool
+            num_workers: Number of workers
+            executor: `thread` or `process`
+        """
+        if num_workers < 1:
+            raise ValueError('num_workers must be positive, got {}'.format(num_workers))
+        if executor == 'process':
+            holder = [fn]
+            self._pool = multiprocessing.Pool(num_workers, initializer=init_worker, initargs=(holder,))
+            # the workers have received the function, the pool must not keep it: when fn is a method of
+            # the object that owns this pool, the finalizer below would keep the owner alive forever
+            holder.clear()
+            self._fn = call_worker_fn
+        elif executor == 'thread':
+            self._pool = multiprocessing.pool.ThreadPool(num_workers)
+            self._fn = fn
+        else:
+            raise ValueError('Invalid executor: {}'.format(executor))
+        self.num_workers = num_workers
+        self.executor = executor
+        self._finalizer = weakref.finalize(self, _terminate, self._pool)
+
+    def map(self, chunks, **kwargs):
+        """Apply the function to every chunk, returns a list of the results."""
+        return self._pool.map(functools.partial(self._fn, **kwargs), chunks)
+
+    def imap(self, chunks, max_pending=None, **kwargs):
+        """Apply the function to every chunk lazily, with a bounded number of chunks in flight.
+
+        Args:
+            chunks: An iterable of chunks, read only as fast as the results are consumed
+            max_pending: Max number of chunks in flight, defaults to 2 * num_workers
+            kwargs: Keyword arguments of the function
+
+        Returns:
+            A generator of the results, in the order of the chunks
+        """
+        max_pending = max_pending or 2 * self.num_workers
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(self._pool.apply_async(self._fn, (chunk,), kwargs))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def close(self):
+        """Terminate the workers, chunks in flight are dropped."""
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
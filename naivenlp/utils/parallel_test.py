@@ -0,0 +1,57 @@
+import gc
+import os
+import tempfile
+import unittest
+
+from .parallel import ChunkPool, read_chunks
+
+
+def _scale(chunk, factor=1):
+    return [x * factor for x in chunk]
+
+
+class _Owner(object):
+
+    def __init__(self, executor):
+        self.pool = ChunkPool(self.scale, 2, executor=executor)
+
+    def scale(self, chunk):
+        return _scale(chunk, 3)
+
+
+class ParallelTest(unittest.TestCase):
+
+    def testReadChunks(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files = []
+            for i, text in enumerate(['a\r\nb\n\r\nc\n', 'd\n  \ne']):
+                files.append(os.path.join(tmp_dir, '{}.txt'.format(i)))
+                with open(files[-1], mode='wt', encoding='utf8') as fout:
+                    fout.write(text)
+            self.assertEqual([['a', 'b'], ['c', 'd'], ['e']], list(read_chunks(files, 2)))
+            self.assertEqual([['a', 'b', '', 'c']], list(read_chunks(files[0], 4, skip_empty_lines=False)))
+
+    def testChunkPool(self):
+        chunks = [list(range(i, i + 3)) for i in range(0, 30, 3)]
+        for executor in ['thread', 'process']:
+            with ChunkPool(_scale, 2, executor=executor) as pool:
+                self.assertEqual([_scale(c, 2) for c in chunks], pool.map(chunks, factor=2))
+                self.assertEqual(chunks, list(pool.imap(iter(chunks), max_pending=3)))
+        with self.assertRaises(ValueError):
+            ChunkPool(_scale, 2, executor='fork')
+        with self.assertRaises(ValueError):
+            ChunkPool(_scale, 0)
+
+    def testCollectedPool(self):
+        for executor in ['thread', 'process']:
+            # the pool applies a method of its owner, the workers are terminated when the owner is collected
+            owner = _Owner(executor)
+            self.assertEqual([[3, 6]], owner.pool.map([[1, 2]]))
+            finalizer = owner.pool._finalizer
+            del owner
+            gc.collect()
+            self.assertFalse(finalizer.alive)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1 @@
+python benchmarks/tokenizer_benchmark.py --output benchmark-$(git rev-parse --short HEAD).json "$@"